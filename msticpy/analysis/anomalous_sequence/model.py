@@ -5,12 +5,32 @@
 # --------------------------------------------------------------------------
 """Module for Model class for modelling sessions data."""
 
+import json
 from collections import defaultdict
-from typing import List, Union, Dict
+from pathlib import Path
+from typing import Any, Callable, List, Tuple, Union, Dict
 
+import numpy as np
+
+from .utils.compiled_model import CompiledModel
 from .utils.data_structures import Cmd
 from .utils import cmds_only, cmds_params_only, cmds_params_values, probabilities
 from ...common.exceptions import MsticpyException
+from ...common.utility import process_chunks
+
+# minimum number of sessions to split across worker processes
+_MIN_PARALLEL_SESSIONS = 10000
+
+# the non laplace smoothed count attributes for each type of session
+_COUNT_ATTRS = (
+    "_seq1_counts",
+    "_seq2_counts",
+    "_param_counts",
+    "_cmd_param_counts",
+    "_value_counts",
+    "_param_value_counts",
+)
+_SAVE_FORMAT_VERSION = 1
 
 
 # pylint: disable=too-many-instance-attributes
@@ -19,7 +39,10 @@ class Model:
     """Class for modelling sessions data."""
 
     def __init__(
-        self, sessions: List[List[Union[str, Cmd]]], modellable_params: set = None
+        self,
+        sessions: List[List[Union[str, Cmd]]],
+        modellable_params: set = None,
+        n_jobs: int = None,
     ):
         """
         Instantiate the Model class.
@@ -57,28 +80,32 @@ class Model:
             params and values. If your sessions include commands, params and values and
             this argument is not set, then some rough heuristics will be used to determine
             which params have values which are suitable for modelling.
+        n_jobs: int, optional
+            The number of worker processes to use to compute the counts and
+            to score the sessions, by default None (use the current process).
+            Use -1 to use one process per CPU. The sessions are only split
+            across processes if there are enough sessions to make this
+            worthwhile.
 
         """
-        if not isinstance(sessions, list):
-            raise MsticpyException("`sessions` should be a list")
-        if len(sessions) == 0:
-            raise MsticpyException("`sessions` should not be an empty list")
-        for i, ses in enumerate(sessions):
-            if not isinstance(ses, list):
-                raise MsticpyException("each session in `sessions` should be a list")
-            if len(ses) == 0:
-                raise MsticpyException(
-                    "session at index {} of `sessions` is empty. Each session "
-                    "should contain at least one command".format(i)
-                )
+        _check_sessions(sessions)
+        self._init_attributes(sessions, modellable_params, n_jobs)
+        self._asses_input()
 
+    def _init_attributes(
+        self,
+        sessions: List[List[Union[str, Cmd]]],
+        modellable_params: set = None,
+        n_jobs: int = None,
+    ):
+        """Initialize the model attributes."""
         self.start_token = "##START##"
         self.end_token = "##END##"
         self.unk_token = "##UNK##"
 
         self.sessions = sessions
         self.session_type = None
-        self._asses_input()
+        self.n_jobs = n_jobs
 
         # non laplace smoothed counts
         self._seq1_counts = None
@@ -97,6 +124,8 @@ class Model:
         self.param_value_counts = None
 
         self.modellable_params = modellable_params
+        # derive the modellable params from the counts if not supplied
+        self._derive_modellable_params = modellable_params is None
 
         self.prior_probs = None
         self.trans_probs = None
@@ -107,7 +136,10 @@ class Model:
 
         self.set_params_cond_cmd_probs = dict()  # type: Dict[str, Dict[str, float]]
 
+        self.compiled_model = None  # type: CompiledModel
+
         self.session_likelihoods = None
+        self.session_log_likelihoods = None
         self.session_geomean_likelihoods = None
 
         self.rare_windows = dict()  # type: Dict[int, list]
@@ -127,6 +159,7 @@ class Model:
         self._compute_counts()
         self._laplace_smooth_counts()
         self._compute_probs()
+        self._compile()
 
     def compute_scores(self, use_start_end_tokens: bool):
         """
@@ -187,28 +220,15 @@ class Model:
         if self.session_type is None:
             raise MsticpyException("session_type attribute should not be None")
 
+        counts = self._count_sessions(self.sessions)
+
         if self.session_type == SessionType.cmds_only:
-            seq1_counts, seq2_counts = cmds_only.compute_counts(
-                sessions=self.sessions,
-                start_token=self.start_token,
-                end_token=self.end_token,
-                unk_token=self.unk_token,
-            )
+            seq1_counts, seq2_counts = counts
             self._seq1_counts = seq1_counts
             self._seq2_counts = seq2_counts
 
         elif self.session_type == SessionType.cmds_params_only:
-            (
-                seq1_counts,
-                seq2_counts,
-                param_counts,
-                cmd_param_counts,
-            ) = cmds_params_only.compute_counts(
-                sessions=self.sessions,
-                start_token=self.start_token,
-                end_token=self.end_token,
-            )
-
+            seq1_counts, seq2_counts, param_counts, cmd_param_counts = counts
             self._seq1_counts = seq1_counts
             self._seq2_counts = seq2_counts
             self._param_counts = param_counts
@@ -222,11 +242,7 @@ class Model:
                 cmd_param_counts,
                 value_counts,
                 param_value_counts,
-            ) = cmds_params_values.compute_counts(
-                sessions=self.sessions,
-                start_token=self.start_token,
-                end_token=self.end_token,
-            )
+            ) = counts
 
             if self.modellable_params is None:
                 modellable_params = cmds_params_values.get_params_to_model_values(
@@ -446,47 +462,15 @@ class Model:
                 "please train the model first before using this method"
             )
 
-        result = []
-
-        for sess in self.sessions:
-            if self.session_type == SessionType.cmds_only:
-                tmp = cmds_only.compute_likelihood_window(
-                    window=sess,
-                    prior_probs=self.prior_probs,
-                    trans_probs=self.trans_probs,
-                    use_start_token=use_start_end_tokens,
-                    use_end_token=use_start_end_tokens,
-                    start_token=self.start_token,
-                    end_token=self.end_token,
-                )
-            elif self.session_type == SessionType.cmds_params_only:
-                tmp = cmds_params_only.compute_likelihood_window(
-                    window=sess,
-                    prior_probs=self.prior_probs,
-                    trans_probs=self.trans_probs,
-                    param_cond_cmd_probs=self.param_cond_cmd_probs,
-                    use_start_token=use_start_end_tokens,
-                    use_end_token=use_start_end_tokens,
-                    start_token=self.start_token,
-                    end_token=self.end_token,
-                )
-            else:
-                tmp = cmds_params_values.compute_likelihood_window(
-                    window=sess,
-                    prior_probs=self.prior_probs,
-                    trans_probs=self.trans_probs,
-                    param_cond_cmd_probs=self.param_cond_cmd_probs,
-                    value_cond_param_probs=self.value_cond_param_probs,
-                    modellable_params=self.modellable_params,
-                    use_start_token=use_start_end_tokens,
-                    use_end_token=use_start_end_tokens,
-                    start_token=self.start_token,
-                    end_token=self.end_token,
-                )
-
-            result.append(tmp)
-
-        self.session_likelihoods = result
+        if self.compiled_model is None:
+            self._compile()
+        log_liks = np.concatenate(
+            self._map_sessions(
+                self.compiled_model.log_likelihoods, use_start_end_tokens
+            )
+        )
+        self.session_log_likelihoods = log_liks.tolist()
+        self.session_likelihoods = np.exp(log_liks).tolist()
 
     def compute_geomean_lik_of_sessions(self):
         """
@@ -505,15 +489,14 @@ class Model:
         lengths.
 
         """
-        if self.session_likelihoods is None:
+        if self.session_log_likelihoods is None:
             self.compute_likelihoods_of_sessions()
-        result = []
-        for i in range(len(self.sessions)):
-            lik = self.session_likelihoods[i]
-            k = len(self.sessions[i])
-            result.append(lik ** (1 / k))
-
-        self.session_geomean_likelihoods = result
+        # computed from the log likelihoods so that the geometric means
+        # of long sessions do not underflow to 0
+        ses_lens = np.array([len(ses) for ses in self.sessions])
+        self.session_geomean_likelihoods = np.exp(
+            np.array(self.session_log_likelihoods) / ses_lens
+        ).tolist()
 
     def compute_rarest_windows(
         self,
@@ -561,61 +544,280 @@ class Model:
                 "please train the model first before using this method"
             )
 
-        if self.session_type == SessionType.cmds_only:
-            rare_tuples = [
-                cmds_only.rarest_window_session(
-                    session=ses,
-                    prior_probs=self.prior_probs,
-                    trans_probs=self.trans_probs,
-                    window_len=window_len,
-                    use_start_end_tokens=use_start_end_tokens,
-                    start_token=self.start_token,
-                    end_token=self.end_token,
-                    use_geo_mean=use_geo_mean,
-                )
-                for ses in self.sessions
-            ]
-        elif self.session_type == SessionType.cmds_params_only:
-            rare_tuples = [
-                cmds_params_only.rarest_window_session(
-                    session=ses,
-                    prior_probs=self.prior_probs,
-                    trans_probs=self.trans_probs,
-                    param_cond_cmd_probs=self.param_cond_cmd_probs,
-                    window_len=window_len,
-                    use_start_end_tokens=use_start_end_tokens,
-                    start_token=self.start_token,
-                    end_token=self.end_token,
-                    use_geo_mean=use_geo_mean,
-                )
-                for ses in self.sessions
-            ]
+        if self.compiled_model is None:
+            self._compile()
+        results = self._map_sessions(
+            self.compiled_model.rarest_window_indices,
+            window_len,
+            use_start_end_tokens,
+            use_geo_mean,
+        )
+        indices = np.concatenate([result[0] for result in results]).tolist()
+        log_liks = np.concatenate([result[1] for result in results])
+        windows = [
+            ses[ind : ind + window_len] if ind >= 0 else []  # noqa: E203
+            for ses, ind in zip(self.sessions, indices)
+        ]
+        if use_geo_mean:
+            self.rare_windows_geo[window_len] = windows
+            self.rare_window_likelihoods_geo[window_len] = np.exp(log_liks).tolist()
         else:
-            rare_tuples = [
-                cmds_params_values.rarest_window_session(
-                    session=ses,
-                    prior_probs=self.prior_probs,
-                    trans_probs=self.trans_probs,
-                    param_cond_cmd_probs=self.param_cond_cmd_probs,
-                    value_cond_param_probs=self.value_cond_param_probs,
-                    modellable_params=self.modellable_params,
-                    window_len=window_len,
-                    use_start_end_tokens=use_start_end_tokens,
-                    start_token=self.start_token,
-                    end_token=self.end_token,
-                    use_geo_mean=use_geo_mean,
+            self.rare_windows[window_len] = windows
+            self.rare_window_likelihoods[window_len] = np.exp(log_liks).tolist()
+
+    def partial_fit(self, sessions: List[List[Union[str, Cmd]]]):
+        """
+        Update the model with the counts from additional sessions.
+
+        The counts of the new sessions are added to the (non laplace
+        smoothed) counts of the model, then the laplace smoothing and
+        probabilities are recomputed. The `sessions` attribute is set
+        to the new sessions, so that they can be scored with the
+        updated model.
+
+        Parameters
+        ----------
+        sessions: List[List[Union[str, Cmd]]]
+            list of sessions, in the same format as the sessions
+            used to train the model.
+
+        """
+        _check_sessions(sessions)
+        session_type = self.session_type
+        prev_sessions = self.sessions
+        self.sessions = sessions
+        self._asses_input()
+        if session_type is not None and self.session_type != session_type:
+            self.session_type = session_type
+            self.sessions = prev_sessions
+            raise MsticpyException(
+                "`sessions` should be of the same type as the model sessions: "
+                + session_type
+            )
+        self._clear_scores()
+        if self._seq1_counts is None:
+            self.train()
+            return
+
+        new_counts = self._count_sessions(sessions)
+        for attr, counts in zip(_COUNT_ATTRS, new_counts):
+            _merge_counts(getattr(self, attr), counts)
+        if (
+            self.session_type == SessionType.cmds_params_values
+            and self._derive_modellable_params
+        ):
+            self.modellable_params = cmds_params_values.get_params_to_model_values(
+                param_counts=self._param_counts,
+                param_value_counts=self._param_value_counts,
+            )
+        self._laplace_smooth_counts()
+        self._compute_probs()
+        self._compile()
+
+    def save(self, path: Union[str, Path]):
+        """
+        Save the trained model to a file.
+
+        The (non laplace smoothed) counts are stored as integer arrays,
+        indexed into a table of the command, param and value names, in
+        a compressed NumPy (.npz) file. The laplace smoothed counts and
+        the probabilities are recomputed from these counts when the
+        model is loaded.
+
+        Parameters
+        ----------
+        path: Union[str, Path]
+            path of the file. The ".npz" extension is added if
+            the path does not have it.
+
+        Notes
+        -----
+        The names of commands, params and values should be strings.
+        The sessions are not saved.
+
+        """
+        if self._seq1_counts is None:
+            raise MsticpyException(
+                "please train the model first before using this method"
+            )
+        counts = [getattr(self, attr) for attr in _COUNT_ATTRS]
+        counts = [count for count in counts if count is not None]
+        names: Dict[str, int] = {}
+        arrays: Dict[str, np.ndarray] = {}
+        for idx, count in enumerate(counts):
+            arrays.update(_counts_to_arrays(count, names, "counts{}".format(idx)))
+        if not all(isinstance(name, str) for name in names):
+            raise MsticpyException(
+                "only models with string commands, params and values can be saved"
+            )
+        metadata = {
+            "format_version": _SAVE_FORMAT_VERSION,
+            "session_type": self.session_type,
+            "start_token": self.start_token,
+            "end_token": self.end_token,
+            "unk_token": self.unk_token,
+            "modellable_params": (
+                sorted(self.modellable_params)
+                if self.modellable_params is not None
+                else None
+            ),
+            "derive_modellable_params": self._derive_modellable_params,
+            "num_counts": len(counts),
+        }
+        np.savez_compressed(
+            path,
+            metadata=np.array(json.dumps(metadata)),
+            names=np.array(list(names), dtype=str),
+            **arrays,
+        )
+
+    @classmethod
+    def load(cls, path: Union[str, Path], n_jobs: int = None) -> "Model":
+        """
+        Load a model saved with `save`.
+
+        Parameters
+        ----------
+        path: Union[str, Path]
+            path of the file
+        n_jobs: int, optional
+            The number of worker processes to use to update the
+            counts and score sessions, by default None
+
+        Returns
+        -------
+        Model
+            the trained model. The `sessions` attribute is an empty
+            list - set this to the sessions that you want to score
+            or use `partial_fit` to update the model with new sessions.
+
+        """
+        with np.load(path, allow_pickle=False) as data:
+            metadata = json.loads(str(data["metadata"]))
+            if metadata.get("format_version") != _SAVE_FORMAT_VERSION:
+                raise MsticpyException(
+                    "unsupported model file format: {}".format(
+                        metadata.get("format_version")
+                    )
                 )
-                for ses in self.sessions
+            names = data["names"].tolist()
+            saved_counts = [
+                _arrays_to_counts(data, names, "counts{}".format(idx))
+                for idx in range(metadata["num_counts"])
             ]
 
-        if use_geo_mean:
-            self.rare_windows_geo[window_len] = [rare[0] for rare in rare_tuples]
-            self.rare_window_likelihoods_geo[window_len] = [
-                rare[1] for rare in rare_tuples
-            ]
-        else:
-            self.rare_windows[window_len] = [rare[0] for rare in rare_tuples]
-            self.rare_window_likelihoods[window_len] = [rare[1] for rare in rare_tuples]
+        model = cls.__new__(cls)
+        modellable_params = metadata["modellable_params"]
+        # pylint: disable=protected-access
+        model._init_attributes(
+            sessions=[],
+            modellable_params=(
+                set(modellable_params) if modellable_params is not None else None
+            ),
+            n_jobs=n_jobs,
+        )
+        model.session_type = metadata["session_type"]
+        model.start_token = metadata["start_token"]
+        model.end_token = metadata["end_token"]
+        model.unk_token = metadata["unk_token"]
+        model._derive_modellable_params = metadata["derive_modellable_params"]
+        # merge the saved counts into (default)dicts of the expected types
+        counts = _compute_counts(
+            [], model.session_type, model.start_token, model.end_token, model.unk_token
+        )
+        for attr, total, partial in zip(_COUNT_ATTRS, counts, saved_counts):
+            _merge_counts(total, partial)
+            setattr(model, attr, total)
+        model._laplace_smooth_counts()
+        model._compute_probs()
+        model._compile()
+        # pylint: enable=protected-access
+        return model
+
+    def _clear_scores(self):
+        """Remove the scores computed for the previous sessions."""
+        self.set_params_cond_cmd_probs = dict()
+        self.session_likelihoods = None
+        self.session_log_likelihoods = None
+        self.session_geomean_likelihoods = None
+        self.rare_windows = dict()
+        self.rare_window_likelihoods = dict()
+        self.rare_windows_geo = dict()
+        self.rare_window_likelihoods_geo = dict()
+
+    def _count_sessions(
+        self, sessions: List[List[Union[str, Cmd]]]
+    ) -> Tuple[Dict[str, Any], ...]:
+        """Return the (non laplace smoothed) counts for `sessions`."""
+        # count each chunk of sessions separately and merge the counts
+        chunk_counts = self._map_sessions(
+            _compute_counts,
+            self.session_type,
+            self.start_token,
+            self.end_token,
+            self.unk_token,
+            sessions=sessions,
+        )
+        counts = _compute_counts(
+            [], self.session_type, self.start_token, self.end_token, self.unk_token
+        )
+        for partial_counts in chunk_counts:
+            for total, partial in zip(counts, partial_counts):
+                _merge_counts(total, partial)
+        return counts
+
+    def _map_sessions(
+        self,
+        func: Callable,
+        *args,
+        sessions: List[List[Union[str, Cmd]]] = None,
+    ) -> List[Any]:
+        """
+        Apply `func` to chunks of the sessions.
+
+        If `n_jobs` is greater than 1 and there are enough sessions, the
+        sessions are split into chunks which are processed in worker
+        processes. Otherwise `func` is called once with all of the sessions.
+
+        Parameters
+        ----------
+        func: Callable
+            picklable function which takes a list of sessions followed
+            by `args`
+        args:
+            additional arguments for `func`
+        sessions: List[List[Union[str, Cmd]]], optional
+            the sessions to process, by default the `sessions` attribute
+
+        Returns
+        -------
+        List[Any]
+            the results of `func` for each chunk, in session order
+
+        """
+        if sessions is None:
+            sessions = self.sessions
+        return process_chunks(
+            func,
+            sessions,
+            *args,
+            n_jobs=self.n_jobs,
+            min_items=_MIN_PARALLEL_SESSIONS,
+            min_chunk_size=_MIN_PARALLEL_SESSIONS // 2,
+        )
+
+    def _compile(self):
+        """Compile the probabilities into arrays for scoring the sessions."""
+        self.compiled_model = CompiledModel(
+            prior_probs=self.prior_probs,
+            trans_probs=self.trans_probs,
+            start_token=self.start_token,
+            end_token=self.end_token,
+            unk_token=self.unk_token,
+            param_cond_cmd_probs=self.param_cond_cmd_probs,
+            value_cond_param_probs=self.value_cond_param_probs,
+            modellable_params=self.modellable_params,
+        )
 
     def _compute_probs_cmds(self):
         """Compute the individual and transition command probabilties."""
@@ -705,6 +907,139 @@ class Model:
         return False
 
 
+def _check_sessions(sessions: List[List[Union[str, Cmd]]]):
+    """Check that `sessions` is a non-empty list of non-empty sessions."""
+    if not isinstance(sessions, list):
+        raise MsticpyException("`sessions` should be a list")
+    if len(sessions) == 0:
+        raise MsticpyException("`sessions` should not be an empty list")
+    for i, ses in enumerate(sessions):
+        if not isinstance(ses, list):
+            raise MsticpyException("each session in `sessions` should be a list")
+        if len(ses) == 0:
+            raise MsticpyException(
+                "session at index {} of `sessions` is empty. Each session "
+                "should contain at least one command".format(i)
+            )
+
+
+def _compute_counts(
+    sessions: List[List[Union[str, Cmd]]],
+    session_type: str,
+    start_token: str,
+    end_token: str,
+    unk_token: str,
+) -> Tuple[Dict[str, Any], ...]:
+    """
+    Compute the counts for the sessions.
+
+    Parameters
+    ----------
+    sessions: List[List[Union[str, Cmd]]]
+        list of sessions
+    session_type: str
+        the type of the sessions (one of the SessionType values)
+    start_token: str
+        dummy command to signify the start of a session (e.g. "##START##")
+    end_token: str
+        dummy command to signify the end of a session (e.g. "##END##")
+    unk_token: str
+        dummy command to signify an unseen command (e.g. "##UNK##")
+
+    Returns
+    -------
+    Tuple[Dict[str, Any], ...]
+        the counts returned by the `compute_counts` function for the
+        session type. The counts for non-empty `sessions` are converted
+        to (picklable) dicts so that they can be returned from worker
+        processes.
+
+    """
+    if session_type == SessionType.cmds_only:
+        counts = cmds_only.compute_counts(
+            sessions=sessions,
+            start_token=start_token,
+            end_token=end_token,
+            unk_token=unk_token,
+        )
+    elif session_type == SessionType.cmds_params_only:
+        counts = cmds_params_only.compute_counts(
+            sessions=sessions, start_token=start_token, end_token=end_token
+        )
+    else:
+        counts = cmds_params_values.compute_counts(
+            sessions=sessions, start_token=start_token, end_token=end_token
+        )
+    if not sessions:
+        return counts
+    return tuple(_to_dict(count) for count in counts)
+
+
+def _to_dict(counts: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert nested defaultdict counts to dicts."""
+    return {
+        key: _to_dict(val) if isinstance(val, dict) else val
+        for key, val in counts.items()
+    }
+
+
+def _merge_counts(total: Dict[str, Any], partial: Dict[str, Any]):
+    """Add the nested `partial` counts to the `total` (default)dicts."""
+    for key, val in partial.items():
+        if isinstance(val, dict):
+            _merge_counts(total[key], val)
+        else:
+            total[key] += val
+
+
+def _counts_to_arrays(
+    counts: Dict[str, Any], names: Dict[str, int], prefix: str
+) -> Dict[str, np.ndarray]:
+    """
+    Convert counts to integer arrays.
+
+    The keys of the counts are added to `names` (mapping each name
+    to its index). Flat counts are converted to arrays of key indexes
+    and counts. Nested counts are converted to arrays of outer key
+    indexes, inner key indexes and counts.
+
+    """
+    keys: List[int] = []
+    inner_keys: List[int] = []
+    values: List[int] = []
+    nested = any(isinstance(val, dict) for val in counts.values())
+    for key, val in counts.items():
+        key_idx = names.setdefault(key, len(names))
+        if nested:
+            for inner_key, count in val.items():
+                keys.append(key_idx)
+                inner_keys.append(names.setdefault(inner_key, len(names)))
+                values.append(count)
+        else:
+            keys.append(key_idx)
+            values.append(val)
+    arrays = {
+        prefix + "_keys": np.array(keys, dtype=np.int64),
+        prefix + "_counts": np.array(values, dtype=np.int64),
+    }
+    if nested:
+        arrays[prefix + "_inner_keys"] = np.array(inner_keys, dtype=np.int64)
+    return arrays
+
+
+def _arrays_to_counts(data: Any, names: List[str], prefix: str) -> Dict[str, Any]:
+    """Convert arrays created by `_counts_to_arrays` back to (nested) dicts."""
+    keys = [names[idx] for idx in data[prefix + "_keys"].tolist()]
+    values = data[prefix + "_counts"].tolist()
+    if prefix + "_inner_keys" not in data:
+        return dict(zip(keys, values))
+    counts: Dict[str, Dict[str, int]] = {}
+    inner_keys = data[prefix + "_inner_keys"].tolist()
+    for key, inner_idx, count in zip(keys, inner_keys, values):
+        counts.setdefault(key, {})[names[inner_idx]] = count
+    return counts
+
+
 class SessionType:
     """Class for storing the types of accepted sessions."""
 
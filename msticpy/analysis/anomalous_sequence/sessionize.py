@@ -5,7 +5,7 @@
 # --------------------------------------------------------------------------
 """Module for creating sessions out of raw data."""
 
-from typing import List
+from typing import List, Optional
 
 import numpy as np
 import pandas as pd
@@ -66,6 +66,21 @@ def sessionize_data(
         max_event_separation_mins=max_event_separation_mins,
     )
 
+    return _aggregate_sessions(
+        df_with_sesind=df_with_sesind,
+        user_identifier_cols=user_identifier_cols,
+        time_col=time_col,
+        event_col=event_col,
+    )
+
+
+def _aggregate_sessions(
+    df_with_sesind: pd.DataFrame,
+    user_identifier_cols: List[str],
+    time_col: str,
+    event_col: str,
+) -> pd.DataFrame:
+    """Aggregate events with a "session_ind" column to 1 row per session."""
     # aggregating will not work properly with nans. Temporarily replace nan values with dummy_str.
     for col in user_identifier_cols:
         df_with_sesind[col] = df_with_sesind[col].fillna("dummy_str")
@@ -103,7 +118,6 @@ def sessionize_data(
     return agg_df
 
 
-# pylint: disable=too-many-locals, too-many-branches
 def create_session_col(
     data: pd.DataFrame,
     user_identifier_cols: List[str],
@@ -163,42 +177,251 @@ def create_session_col(
         user_identifier_cols + [time_col]
     ).reset_index(drop=True)
 
-    # initialise first row
-    ses_ind = 0
-    df_with_sesind.loc[0, "time_diff"] = pd.to_timedelta(0)
-    df_with_sesind.loc[0, "cml_time"] = pd.to_timedelta(0)
-    df_with_sesind.loc[0, "session_ind"] = ses_ind
-
-    for i in range(1, len(df_with_sesind)):
-        cur = df_with_sesind.iloc[i]
-        prev = df_with_sesind.iloc[i - 1]
-
-        # if any of the user_identifier_cols values change, a new session should start
-        new_flag = False
-        for col in user_identifier_cols:
-            if cur[col] != prev[col]:
-                new_flag = True
-                break
-
-        dif = cur[time_col] - prev[time_col]
-        cml = prev["cml_time"] + dif
-        # if the max session length is exceeded or the max separation between events is exceeded,
-        # a new session should start
-        if dif > max_sep or cml > max_ses:
-            new_flag = True
-
-        if new_flag:
-            df_with_sesind.loc[i, "time_diff"] = pd.to_timedelta(0)
-            df_with_sesind.loc[i, "cml_time"] = pd.to_timedelta(0)
-            ses_ind += 1
-            df_with_sesind.loc[i, "session_ind"] = ses_ind
-        else:
-            df_with_sesind.loc[i, "time_diff"] = dif
-            df_with_sesind.loc[i, "cml_time"] = cml
-            df_with_sesind.loc[i, "session_ind"] = ses_ind
+    # a new session starts if any of the user_identifier_cols values change
+    new_user = np.zeros(len(df_with_sesind), dtype=bool)
+    new_user[0] = True
+    for col in user_identifier_cols:
+        values = df_with_sesind[col].to_numpy()
+        new_user[1:] |= values[1:] != values[:-1]
+
+    # NaT time stamps are sorted to the end of each user's events and
+    # never start a new session - use the last valid time stamp instead.
+    times = pd.Series(df_with_sesind[time_col].to_numpy(dtype="datetime64[ns]"))
+    if times.isna().any():
+        times = times.groupby(np.cumsum(new_user)).ffill().fillna(pd.Timestamp(0))
+    times_ns = times.to_numpy(dtype="datetime64[ns]").view("int64")
+
+    # or if the max separation between events is exceeded
+    new_segment = new_user.copy()
+    new_segment[1:] |= np.diff(times_ns) > max_sep.value
+
+    # within each of these segments, a new session starts if the
+    # max session length is exceeded
+    session_start = _max_duration_session_starts(times_ns, new_segment, max_ses.value)
+    df_with_sesind["session_ind"] = (np.cumsum(session_start) - 1).astype("float64")
 
     # replace dummy_str with nan values
     for col in user_identifier_cols:
         df_with_sesind[col] = df_with_sesind[col].replace("dummy_str", np.nan)
 
     return df_with_sesind[final_cols]
+
+
+def _max_duration_session_starts(
+    times_ns: np.ndarray, new_segment: np.ndarray, max_ses_ns: int
+) -> np.ndarray:
+    """
+    Return a boolean array marking the first event of each session.
+
+    Parameters
+    ----------
+    times_ns: np.ndarray
+        Event time stamps (int64 nanoseconds), sorted within each segment.
+    new_segment: np.ndarray
+        Boolean array marking the first event of each segment (a sequence
+        of events for a user with no separation larger than the maximum).
+    max_ses_ns: int
+        The maximum session length in nanoseconds.
+
+    Returns
+    -------
+    np.ndarray
+        Boolean array - True for events that start a new session.
+
+    Notes
+    -----
+    A session started at event i ends before the first event j in the
+    same segment with times_ns[j] - times_ns[i] > max_ses_ns, so j starts
+    the next session. We find j for every event with a vectorized binary
+    search, then follow these links from the start of each segment.
+
+    """
+    n_events = len(times_ns)
+    seg_starts = np.flatnonzero(new_segment)
+    seg_ends = np.append(seg_starts[1:], n_events)
+    # end (exclusive) of the segment for each event
+    event_seg_end = np.repeat(seg_ends, np.diff(np.append(seg_starts, n_events)))
+
+    # binary search for the first event in the segment after the max session time
+    limit = times_ns + max_ses_ns
+    low = np.arange(n_events)
+    high = event_seg_end.copy()
+    while True:
+        searching = low < high
+        if not searching.any():
+            break
+        mid = (low + high) // 2
+        mid_after = np.zeros(n_events, dtype=bool)
+        mid_after[searching] = times_ns[mid[searching]] > limit[searching]
+        high = np.where(searching & mid_after, mid, high)
+        low = np.where(searching & ~mid_after, mid + 1, low)
+    next_start = low
+
+    session_start = np.zeros(n_events, dtype=bool)
+    current = seg_starts
+    while current.size:
+        session_start[current] = True
+        following = next_start[current]
+        current = following[following < event_seg_end[current]]
+    return session_start
+
+
+class StreamingSessionizer:
+    """
+    Sessionize data that arrives in successive batches.
+
+    Only the events of the currently open session for each user are kept
+    between batches. Sessions are returned once they are closed - i.e.
+    when a later event starts a new session for the user or when
+    no later event could be part of the session (based on the latest
+    time stamp seen and the `max_event_separation_mins` and
+    `max_session_time_mins` rules).
+
+    Notes
+    -----
+    Batches should be supplied in time order (events within a batch
+    can be in any order). An event that is earlier than the end of an
+    already closed session for the same user will start a new session.
+
+    """
+
+    def __init__(
+        self,
+        user_identifier_cols: List[str],
+        time_col: str,
+        max_session_time_mins: int,
+        max_event_separation_mins: int,
+        event_col: str,
+    ):
+        """
+        Create a streaming sessionizer.
+
+        Parameters
+        ----------
+        user_identifier_cols: List[str]
+            Name of the columns which contain username and/or computer name and/or ip
+            address etc. Each time the value of one of these columns changes, a new
+            session will be started.
+        time_col: str
+            Name of the column which contains a time stamp.
+        max_session_time_mins: int
+            The maximum length of a session in minutes.
+        max_event_separation_mins: int
+            The maximum length in minutes between two events in a session.
+        event_col: str
+            Name of the column which contains the event of interest.
+
+        See Also
+        --------
+        sessionize_data : sessionize a complete DataFrame.
+
+        """
+        self.user_identifier_cols = user_identifier_cols
+        self.time_col = time_col
+        self.max_session_time_mins = max_session_time_mins
+        self.max_event_separation_mins = max_event_separation_mins
+        self.event_col = event_col
+        self.watermark: Optional[pd.Timestamp] = None
+        self._open_events: Optional[pd.DataFrame] = None
+
+    @property
+    def open_events(self) -> int:
+        """Return the number of events held in open sessions."""
+        return 0 if self._open_events is None else len(self._open_events)
+
+    def add_batch(self, data: pd.DataFrame) -> pd.DataFrame:
+        """
+        Add a batch of events and return any sessions that are closed.
+
+        Parameters
+        ----------
+        data: pd.DataFrame
+            The batch of events. This should contain the columns described
+            in `sessionize_data`.
+
+        Returns
+        -------
+        pd.DataFrame
+            The closed sessions (1 row per session), in the same format
+            as the output of `sessionize_data`.
+
+        """
+        return self._sessionize(data, flush=False)
+
+    def flush(self) -> pd.DataFrame:
+        """
+        Close and return all open sessions.
+
+        Returns
+        -------
+        pd.DataFrame
+            The remaining sessions (1 row per session), in the same format
+            as the output of `sessionize_data`.
+
+        """
+        return self._sessionize(None, flush=True)
+
+    def _sessionize(self, data: Optional[pd.DataFrame], flush: bool) -> pd.DataFrame:
+        batches = [
+            batch
+            for batch in (self._open_events, data)
+            if batch is not None and not batch.empty
+        ]
+        if not batches:
+            columns = self.user_identifier_cols + [self.time_col, self.event_col]
+            return self._aggregate(pd.DataFrame(columns=columns + ["session_ind"]))
+        df_with_sesind = create_session_col(
+            data=pd.concat(batches, ignore_index=True),
+            user_identifier_cols=self.user_identifier_cols,
+            time_col=self.time_col,
+            max_session_time_mins=self.max_session_time_mins,
+            max_event_separation_mins=self.max_event_separation_mins,
+        )
+        batch_max_time = df_with_sesind[self.time_col].max()
+        if self.watermark is None or batch_max_time > self.watermark:
+            self.watermark = batch_max_time
+
+        if flush:
+            closed = np.ones(len(df_with_sesind), dtype=bool)
+        else:
+            closed = self._closed_session_events(df_with_sesind)
+        open_events = df_with_sesind[~closed].drop(columns="session_ind")
+        self._open_events = open_events if not open_events.empty else None
+        return self._aggregate(df_with_sesind[closed])
+
+    def _closed_session_events(self, df_with_sesind: pd.DataFrame) -> np.ndarray:
+        """Return a boolean array marking events in closed sessions."""
+        ses_ind = df_with_sesind["session_ind"].to_numpy()
+        # events are sorted by user and time - so the last session for a user
+        # is followed by a session for a different user (or is the last one)
+        user_ids = df_with_sesind[self.user_identifier_cols].fillna("dummy_str")
+        new_user = np.zeros(len(df_with_sesind), dtype=bool)
+        new_user[0] = True
+        for col in self.user_identifier_cols:
+            values = user_ids[col].to_numpy()
+            new_user[1:] |= values[1:] != values[:-1]
+        user_ind = np.cumsum(new_user)
+        last_user_ses = pd.Series(ses_ind).groupby(user_ind).transform("max")
+        # sessions that are not the last session for the user are closed
+        closed = ses_ind != last_user_ses.to_numpy()
+
+        # the last session for each user is closed if an event at or after
+        # the watermark time could not be added to it
+        times = df_with_sesind[self.time_col]
+        by_session = times.groupby(ses_ind)
+        ses_start = by_session.transform("min")
+        ses_end = by_session.transform("max")
+        max_sep = pd.to_timedelta(self.max_event_separation_mins, unit="min")
+        max_ses = pd.to_timedelta(self.max_session_time_mins, unit="min")
+        expired = ((self.watermark - ses_end) > max_sep) | (
+            (self.watermark - ses_start) > max_ses
+        )
+        return closed | expired.to_numpy()
+
+    def _aggregate(self, df_with_sesind: pd.DataFrame) -> pd.DataFrame:
+        return _aggregate_sessions(
+            df_with_sesind=df_with_sesind.copy(),
+            user_identifier_cols=self.user_identifier_cols,
+            time_col=self.time_col,
+            event_col=self.event_col,
+        )
@@ -0,0 +1,411 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# --------------------------------------------------------------------------
+"""
+Array-backed scoring of sessions for a trained model.
+
+The trained probabilities (held as nested StateMatrix dicts) are
+converted to NumPy arrays indexed by integer command ids. The
+likelihoods of the sessions and of all the sliding windows in the
+sessions are then computed in log space - each window likelihood
+is the difference of two cumulative sums, so scoring a session
+is linear in the length of the session (independent of the window
+length) and long sessions do not underflow.
+
+The results follow the same semantics as the `cmds_only`,
+`cmds_params_only` and `cmds_params_values` modules.
+"""
+
+import math
+from typing import Any, Dict, Hashable, List, Optional, Tuple, Union
+
+import numpy as np
+
+from ..utils.data_structures import Cmd, StateMatrix
+from ....common.exceptions import MsticpyException
+
+# Windows with log likelihoods within this tolerance of the minimum
+# are treated as ties (the first is returned as the rarest window).
+_TIE_TOLERANCE = 1e-9
+
+
+# pylint: disable=too-many-instance-attributes
+class CompiledModel:
+    """Array-backed log-space scorer for trained session models."""
+
+    def __init__(
+        self,
+        prior_probs: Union[StateMatrix, dict],
+        trans_probs: Union[StateMatrix, dict],
+        start_token: str,
+        end_token: str,
+        unk_token: str,
+        param_cond_cmd_probs: Optional[Union[StateMatrix, dict]] = None,
+        value_cond_param_probs: Optional[Union[StateMatrix, dict]] = None,
+        modellable_params: Optional[set] = None,
+    ):
+        """
+        Compile the trained probabilities into arrays.
+
+        Parameters
+        ----------
+        prior_probs: Union[StateMatrix, dict]
+            computed probabilities of individual commands
+        trans_probs: Union[StateMatrix, dict]
+            computed probabilities of sequences of commands (length 2)
+        start_token: str
+            dummy command to signify the start of a session (e.g. "##START##")
+        end_token: str
+            dummy command to signify the end of a session (e.g. "##END##")
+        unk_token: str
+            dummy command to signify an unseen command (e.g. "##UNK##")
+        param_cond_cmd_probs: Optional[Union[StateMatrix, dict]]
+            computed probabilities of the params conditional on the commands.
+            Required if the sessions are lists of the Cmd datatype.
+        value_cond_param_probs: Optional[Union[StateMatrix, dict]]
+            computed probabilities of the values conditional on the params.
+            Required if the params of the Cmd datatype are dicts of
+            params and values.
+        modellable_params: Optional[set]
+            set of params for which we will also include the probabilties
+            of their values in the calculation of the likelihood
+
+        """
+        if unk_token not in prior_probs:
+            raise MsticpyException("`unk_token` should be a key in `prior_probs`")
+        self.start_token = start_token
+        self.end_token = end_token
+        self.unk_token = unk_token
+
+        # intern the commands to integer ids
+        self.cmds: List[str] = list(prior_probs.keys())
+        for token in (start_token, end_token):
+            if token not in prior_probs:
+                self.cmds.append(token)
+        self.cmd_ids: Dict[str, int] = {cmd: idx for idx, cmd in enumerate(self.cmds)}
+        self.unk_id = self.cmd_ids[unk_token]
+        self.start_id = self.cmd_ids[start_token]
+        self.end_id = self.cmd_ids[end_token]
+
+        # lookups via the StateMatrix objects so that unseen commands
+        # resolve to the unk_token probabilities
+        self.log_prior = np.log(
+            np.array([prior_probs[cmd] for cmd in self.cmds], dtype=np.float64)
+        )
+        self.log_trans = np.log(
+            np.array(
+                [[trans_probs[prev][cur] for cur in self.cmds] for prev in self.cmds],
+                dtype=np.float64,
+            )
+        )
+
+        # the trained StateMatrix objects are not kept, so that compiled
+        # models can be pickled and sent to worker processes
+        self.has_params = param_cond_cmd_probs is not None
+        self.modellable_params = set(modellable_params or ())
+        # per command: sum of log(1 - p) over the params of the command and
+        # the change in log likelihood if each param is present
+        self._param_base: List[float] = []
+        self._param_delta: List[Dict[str, float]] = []
+        if param_cond_cmd_probs is not None:
+            for cmd in self.cmds:
+                ref = param_cond_cmd_probs[cmd]
+                self._param_base.append(
+                    math.fsum(math.log1p(-prob) for prob in ref.values())
+                )
+                self._param_delta.append(
+                    {
+                        param: math.log(prob) - math.log1p(-prob)
+                        for param, prob in ref.items()
+                    }
+                )
+        # log probabilities of the values of the modellable params
+        self._log_value_probs: Dict[str, Dict[Any, float]] = {}
+        if value_cond_param_probs is not None:
+            for param in self.modellable_params:
+                self._log_value_probs[param] = {
+                    value: math.log(prob)
+                    for value, prob in value_cond_param_probs[param].items()
+                }
+        self._param_cache: Dict[Tuple[int, Hashable], float] = {}
+
+    def encode(self, session: List[Union[str, Cmd]]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Convert a session to arrays of command ids and param log likelihoods.
+
+        Parameters
+        ----------
+        session: List[Union[str, Cmd]]
+            list of commands (strings) or list of the Cmd datatype
+
+        Returns
+        -------
+        Tuple[np.ndarray, np.ndarray]
+            command ids (unseen commands have the id of the `unk_token`),
+            log likelihood of the params (and values) of each command
+            (zeros if the session is a list of strings)
+
+        """
+        cmd_ids = self.cmd_ids
+        unk_id = self.unk_id
+        if not session or isinstance(session[0], str):
+            ids = np.fromiter(
+                (cmd_ids.get(cmd, unk_id) for cmd in session),
+                dtype=np.int64,
+                count=len(session),
+            )
+            return ids, np.zeros(len(session), dtype=np.float64)
+        ids = np.fromiter(
+            (cmd_ids.get(cmd.name, unk_id) for cmd in session),
+            dtype=np.int64,
+            count=len(session),
+        )
+        param_liks = np.fromiter(
+            (
+                self._log_prob_params(cmd_id, cmd.params)
+                for cmd_id, cmd in zip(ids.tolist(), session)
+            ),
+            dtype=np.float64,
+            count=len(session),
+        )
+        return ids, param_liks
+
+    def log_likelihoods(
+        self, sessions: List[List[Union[str, Cmd]]], use_start_end_tokens: bool
+    ) -> np.ndarray:
+        """
+        Compute the log likelihood of each of the sessions.
+
+        Parameters
+        ----------
+        sessions: List[List[Union[str, Cmd]]]
+            list of sessions, where each session is a list of either
+            strings or a list of the Cmd datatype
+        use_start_end_tokens: bool
+            if True, then `start_token` and `end_token` will be prepended
+            and appended to the sessions respectively before the calculations
+            are done
+
+        Returns
+        -------
+        np.ndarray
+            log likelihood of each session (nan for empty sessions)
+
+        """
+        ids, param_liks, starts, lengths = self._encode_all(sessions, False)
+        non_empty = lengths > 0
+        starts, lengths = starts[non_empty], lengths[non_empty]
+        terms = self._trans_terms(ids, param_liks, starts)
+        if use_start_end_tokens:
+            terms[starts] = self.log_trans[self.start_id, ids[starts]]
+        else:
+            terms[starts] = self.log_prior[ids[starts]]
+        terms[starts] += param_liks[starts]
+        result = np.full(len(sessions), np.nan)
+        if len(starts):
+            result[non_empty] = np.add.reduceat(terms, starts)
+            if use_start_end_tokens:
+                result[non_empty] += self.log_trans[
+                    ids[starts + lengths - 1], self.end_id
+                ]
+        return result
+
+    def rarest_windows(
+        self,
+        sessions: List[List[Union[str, Cmd]]],
+        window_len: int,
+        use_start_end_tokens: bool,
+        use_geo_mean: bool = False,
+    ) -> Tuple[List[List[Union[str, Cmd]]], np.ndarray]:
+        """
+        Find the rarest window and its log likelihood for each session.
+
+        Parameters
+        ----------
+        sessions: List[List[Union[str, Cmd]]]
+            list of sessions, where each session is a list of either
+            strings or a list of the Cmd datatype
+        window_len: int
+            length of sliding window for likelihood calculations
+        use_start_end_tokens: bool
+            if True, then `start_token` and `end_token` will be prepended
+            and appended to each session respectively before the calculations
+            are done
+        use_geo_mean: bool
+            if True, then each of the likelihoods of the sliding windows
+            will be raised to the power of (1/`window_len`)
+
+        Returns
+        -------
+        Tuple[List[List[Union[str, Cmd]]], np.ndarray]
+            rarest window of each session (empty list if the session is
+            shorter than `window_len`),
+            log likelihood of each rarest window (nan if the session is
+            shorter than `window_len`)
+
+        """
+        indices, log_liks = self.rarest_window_indices(
+            sessions=sessions,
+            window_len=window_len,
+            use_start_end_tokens=use_start_end_tokens,
+            use_geo_mean=use_geo_mean,
+        )
+        windows = [
+            session[ind : ind + window_len] if ind >= 0 else []  # noqa: E203
+            for session, ind in zip(sessions, indices.tolist())
+        ]
+        return windows, log_liks
+
+    def rarest_window_indices(
+        self,
+        sessions: List[List[Union[str, Cmd]]],
+        window_len: int,
+        use_start_end_tokens: bool,
+        use_geo_mean: bool = False,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the start index and log likelihood of the rarest window of each session.
+
+        Parameters
+        ----------
+        sessions: List[List[Union[str, Cmd]]]
+            list of sessions, where each session is a list of either
+            strings or a list of the Cmd datatype
+        window_len: int
+            length of sliding window for likelihood calculations
+        use_start_end_tokens: bool
+            if True, then `start_token` and `end_token` will be prepended
+            and appended to each session respectively before the calculations
+            are done
+        use_geo_mean: bool
+            if True, then each of the likelihoods of the sliding windows
+            will be raised to the power of (1/`window_len`)
+
+        Returns
+        -------
+        Tuple[np.ndarray, np.ndarray]
+            start index of the rarest window of each session (-1 if the
+            session is shorter than `window_len`),
+            log likelihood of each rarest window (nan if the session is
+            shorter than `window_len`)
+
+        """
+        if window_len < 1:
+            raise MsticpyException("`window_len` should be at least 1")
+        ids, param_liks, starts, lengths = self._encode_all(
+            sessions, use_start_end_tokens
+        )
+        # the log likelihood of a window starting at position i is
+        # head[i] + (cml[i + window_len] - cml[i + 1])
+        terms = self._trans_terms(ids, param_liks, starts[lengths > 0])
+        cml = np.concatenate(([0.0], np.cumsum(terms)))
+        head = self.log_prior[ids] + param_liks
+        if use_start_end_tokens:
+            first = starts[lengths > 0]
+            head[first] = self.log_trans[self.start_id, ids[first]] + param_liks[first]
+
+        n_windows = np.maximum(lengths - window_len + 1, 0)
+        win_offsets = np.cumsum(n_windows) - n_windows
+        win_starts = np.arange(n_windows.sum()) + np.repeat(
+            starts - win_offsets, n_windows
+        )
+        win_liks = head[win_starts] + (
+            cml[win_starts + window_len] - cml[win_starts + 1]
+        )
+        if use_geo_mean:
+            win_liks /= window_len
+
+        indices = np.full(len(sessions), -1, dtype=np.int64)
+        rare_liks = np.full(len(sessions), np.nan)
+        has_windows = n_windows > 0
+        if not has_windows.any():
+            return indices, rare_liks
+        # the first of any (near) equal minimum windows in each
+        # session is the rarest window
+        offsets = win_offsets[has_windows]
+        min_liks = np.minimum.reduceat(win_liks, offsets)
+        is_min = (
+            win_liks <= np.repeat(min_liks, n_windows[has_windows]) + _TIE_TOLERANCE
+        )
+        min_pos = np.flatnonzero(is_min)
+        first_min = min_pos[np.searchsorted(min_pos, offsets)]
+        indices[has_windows] = first_min - offsets
+        rare_liks[has_windows] = win_liks[first_min]
+        return indices, rare_liks
+
+    def _encode_all(
+        self, sessions: List[List[Union[str, Cmd]]], append_end: bool
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Return the concatenated encoded sessions, start offsets and lengths."""
+        encoded = [self.encode(session) for session in sessions]
+        if append_end:
+            end_id = np.array([self.end_id], dtype=np.int64)
+            # the end token is a command with no params
+            end_lik = np.zeros(1, dtype=np.float64)
+            encoded = [
+                (np.concatenate((ids, end_id)), np.concatenate((liks, end_lik)))
+                for ids, liks in encoded
+            ]
+        lengths = np.array([len(ids) for ids, _ in encoded], dtype=np.int64)
+        starts = np.cumsum(lengths) - lengths
+        ids = np.concatenate([ids for ids, _ in encoded] + [np.zeros(0, np.int64)])
+        param_liks = np.concatenate([liks for _, liks in encoded] + [np.zeros(0)])
+        return ids, param_liks, starts, lengths
+
+    def _trans_terms(
+        self, ids: np.ndarray, param_liks: np.ndarray, starts: np.ndarray
+    ) -> np.ndarray:
+        """Return transition + param log likelihoods (zero at session starts)."""
+        terms = np.zeros(len(ids), dtype=np.float64)
+        if len(ids) > 1:
+            terms[1:] = self.log_trans[ids[:-1], ids[1:]] + param_liks[1:]
+        terms[starts] = 0
+        return terms
+
+    def _log_prob_params(self, cmd_id: int, params: Union[set, dict]) -> float:
+        """Return the log geo-mean likelihood of the params (and values)."""
+        if not params:
+            return 0.0
+        try:
+            key: Hashable = (
+                cmd_id,
+                frozenset(params.items())
+                if isinstance(params, dict)
+                else frozenset(params),
+            )
+            return self._param_cache[key]
+        except TypeError:
+            # unhashable values - compute without caching
+            return self._compute_log_prob_params(cmd_id, params)
+        except KeyError:
+            result = self._compute_log_prob_params(cmd_id, params)
+            self._param_cache[key] = result
+            return result
+
+    def _compute_log_prob_params(self, cmd_id: int, params: Union[set, dict]) -> float:
+        if not self.has_params:
+            raise MsticpyException(
+                "`param_cond_cmd_probs` are required for sessions of Cmd datatypes"
+            )
+        delta = self._param_delta[cmd_id]
+        lik = self._param_base[cmd_id]
+        num = 0
+        for param in params:
+            if param not in delta:
+                continue
+            lik += delta[param]
+            if isinstance(params, dict) and param in self._log_value_probs:
+                num += 1
+                log_values = self._log_value_probs[param]
+                value = params[param]
+                lik += (
+                    log_values[value]
+                    if value in log_values
+                    else log_values[self.unk_token]
+                )
+        k = len(delta) + num
+        if k > 0:
+            lik /= k
+        return lik
@@ -56,6 +56,8 @@ except ImportError as imp_err:
 __version__ = VERSION
 __author__ = "Ian Hellen"
 
+_DEFAULT_DELIMS = r'[\s\-\\/\.,"\'|&:;%$()]'
+
 
 # pylint: disable=too-many-arguments, too-many-locals
 @export
@@ -67,6 +69,7 @@ def dbcluster_events(
     time_column: str = "TimeCreatedUtc",
     max_cluster_distance: float = 0.01,
     min_cluster_samples: int = 2,
+    aggregate_duplicates: bool = True,
     **kwargs,
 ) -> Tuple[pd.DataFrame, DBSCAN, np.ndarray]:
     """
@@ -91,10 +94,17 @@ def dbcluster_events(
         DBSCAN eps (max cluster member distance) (the default is 0.01)
     min_cluster_samples : int, optional
         DBSCAN min_samples (the minimum cluster size) (the default is 2)
+    aggregate_duplicates : bool, optional
+        Collapse identical feature vectors into a single weighted
+        sample before clustering (the default is True). This gives
+        the same clusters as clustering every row but uses much less
+        time and memory when many events have the same features.
 
     Other Parameters
     ----------------
     kwargs: Other arguments are passed to DBSCAN constructor
+        For example, use `algorithm="ball_tree"` or `algorithm="kd_tree"`
+        to choose the nearest neighbors algorithm used by DBSCAN.
 
     Returns
     -------
@@ -129,7 +139,10 @@ def dbcluster_events(
     # unnormalized data)
     x_norm = Normalizer().fit_transform(x_input) if normalize else x_input
     # fit the data set
-    db_cluster.fit(x_norm)
+    if aggregate_duplicates and kwargs.get("metric") != "precomputed":
+        _fit_unique_rows(db_cluster, x_norm)
+    else:
+        db_cluster.fit(x_norm)
     labels = db_cluster.labels_
     cluster_set, counts = np.unique(labels, return_counts=True)
     if verbose:
@@ -152,6 +165,41 @@ def dbcluster_events(
     return clustered_events, db_cluster, x_norm
 
 
+def _fit_unique_rows(db_cluster: DBSCAN, x_norm: np.ndarray):
+    """
+    Fit DBSCAN to the unique rows of `x_norm`, weighted by their counts.
+
+    Parameters
+    ----------
+    db_cluster : DBSCAN
+        The DBSCAN cluster object
+    x_norm : np.ndarray
+        The (normalized) data set
+
+    Notes
+    -----
+    The unique rows are ordered by their first occurrence so that the
+    clusters are numbered in the same order as fitting all of the rows.
+    The labels, core sample indices and components of the fitted
+    model are expanded to refer to all of the rows in `x_norm`.
+
+    """
+    _, first_idx, inverse, counts = np.unique(
+        x_norm, axis=0, return_index=True, return_inverse=True, return_counts=True
+    )
+    order = np.argsort(first_idx)
+    row_rank = np.empty_like(order)
+    row_rank[order] = np.arange(len(order))
+    db_cluster.fit(x_norm[first_idx[order]], sample_weight=counts[order])
+
+    unique_ids = row_rank[inverse.reshape(-1)]
+    core_mask = np.zeros(len(order), dtype=bool)
+    core_mask[db_cluster.core_sample_indices_] = True
+    db_cluster.labels_ = db_cluster.labels_[unique_ids]
+    db_cluster.core_sample_indices_ = np.flatnonzero(core_mask[unique_ids])
+    db_cluster.components_ = x_norm[db_cluster.core_sample_indices_]
+
+
 def _merge_clustered_items(
     cluster_set: np.array,
     labels: np.array,
@@ -184,64 +232,40 @@ def _merge_clustered_items(
     tz_aware = data.iloc[0][time_column].tz
     ts_type = "datetime64[ns, UTC]" if tz_aware is not None else "datetime64[ns]"
 
-    cluster_list = []
-    # Iterate through clusters, adding exemplar to output frame
-    # pylint: disable=consider-using-enumerate
-    # we need to know the index of the item within the loop
-    for idx in range(len(cluster_set)):
-        cluster_id = cluster_set[idx]
-        class_members = labels == cluster_id
-        if isinstance(data, pd.DataFrame):
-            time_ordered = data[class_members].sort_values(time_column, ascending=True)
-            first_event_time = time_ordered[0:][time_column].iat[0]
-            last_event_time = time_ordered[-1:][time_column].iat[0]
-        else:
-            first_event_time = None
-            last_event_time = None
+    labels = np.asarray(labels)
+    # first and last event time of each cluster
+    cluster_times = data[time_column].groupby(labels).agg(["min", "max"])
 
-        if cluster_id == -1:
-            # 'Noise' events are individual items that could not be assigned
-            # to a cluster and so are unique
-            cluster_list.append(
-                data[class_members]
-                .assign(
-                    Clustered=False,
-                    ClusterId=cluster_id,
-                    ClusterSize=1,
-                    TimeGenerated=first_event_time,
-                    FirstEventTime=first_event_time,
-                    LastEventTime=last_event_time,
-                )
-                .astype(
-                    dtype={
-                        "TimeGenerated": ts_type,
-                        "FirstEventTime": ts_type,
-                        "LastEventTime": ts_type,
-                    }
-                )
-            )
-        else:
-            # Otherwise, just choose the first example of the cluster set
-            cluster_list.append(
-                data[class_members]
-                .assign(
-                    Clustered=True,
-                    ClusterId=cluster_id,
-                    ClusterSize=counts[idx],
-                    TimeGenerated=first_event_time,
-                    FirstEventTime=first_event_time,
-                    LastEventTime=last_event_time,
-                )[0:1]
-                .astype(
-                    dtype={
-                        "TimeGenerated": ts_type,
-                        "FirstEventTime": ts_type,
-                        "LastEventTime": ts_type,
-                    }
-                )
-            )
-    # pylint: enable=consider-using-enumerate
-    return pd.concat(cluster_list)
+    # 'Noise' events are individual items that could not be assigned
+    # to a cluster and so are unique - these are all output.
+    # Otherwise, just choose the first example of the cluster set
+    _, first_rows = np.unique(labels, return_index=True)
+    out_rows = np.concatenate(
+        [np.flatnonzero(labels == -1), first_rows[cluster_set != -1]]
+    )
+    out_labels = labels[out_rows]
+    cluster_sizes = pd.Series(counts, index=cluster_set)
+    first_times = cluster_times["min"].reindex(out_labels).array
+    return (
+        data.iloc[out_rows]
+        .assign(
+            Clustered=out_labels != -1,
+            ClusterId=out_labels,
+            ClusterSize=np.where(
+                out_labels == -1, 1, cluster_sizes.reindex(out_labels).values
+            ),
+            TimeGenerated=first_times,
+            FirstEventTime=first_times,
+            LastEventTime=cluster_times["max"].reindex(out_labels).array,
+        )
+        .astype(
+            dtype={
+                "TimeGenerated": ts_type,
+                "FirstEventTime": ts_type,
+                "LastEventTime": ts_type,
+            }
+        )
+    )
 
 
 @export
@@ -329,22 +353,18 @@ def _add_processname_features(
         Path separator for OS
 
     """
+    # compute each feature once per unique process name
+    codes, paths = _factorize_strings(output_df["NewProcessName"])
     if "processName" not in output_df or force:
-        output_df["processName"] = output_df.apply(
-            lambda x: x.NewProcessName.split(path_separator)[-1], axis=1
+        output_df["processName"] = (
+            paths.str.rsplit(path_separator, n=1).str[-1].values[codes]
         )
     if "pathScore" not in output_df or force:
-        output_df["pathScore"] = output_df.apply(
-            lambda x: char_ord_score(x.NewProcessName), axis=1
-        )
+        output_df["pathScore"] = _char_ord_scores(paths)[codes]
     if "pathLogScore" not in output_df or force:
-        output_df["pathLogScore"] = output_df.apply(
-            lambda x: log10(x.pathScore) if x.pathScore else 0, axis=1
-        )
+        output_df["pathLogScore"] = _log10_or_zero(output_df["pathScore"].values)
     if "pathHash" not in output_df or force:
-        output_df["pathHash"] = output_df.apply(
-            lambda x: crc32_hash(x.NewProcessName), axis=1
-        )
+        output_df["pathHash"] = _crc32_hashes(paths)[codes]
 
 
 def _add_commandline_features(output_df: pd.DataFrame, force: bool):
@@ -359,32 +379,86 @@ def _add_commandline_features(output_df: pd.DataFrame, force: bool):
         If True overwrite existing feature columns
 
     """
+    # compute each feature once per unique command line
+    codes, cmd_lines = _factorize_strings(output_df["CommandLine"])
     if "commandlineLen" not in output_df or force:
-        output_df["commandlineLen"] = output_df.apply(
-            lambda x: len(x.CommandLine), axis=1
-        )
+        output_df["commandlineLen"] = cmd_lines.str.len().values.astype(np.int64)[codes]
     if "commandlineLogLen" not in output_df or force:
-        output_df["commandlineLogLen"] = output_df.apply(
-            lambda x: log10(x.commandlineLen) if x.commandlineLen else 0, axis=1
+        output_df["commandlineLogLen"] = _log10_or_zero(
+            output_df["commandlineLen"].values
         )
     if "commandlineTokensFull" not in output_df or force:
-        output_df["commandlineTokensFull"] = output_df[["CommandLine"]].apply(
-            lambda x: delim_count(x.CommandLine), axis=1
-        )
+        output_df["commandlineTokensFull"] = cmd_lines.str.count(
+            _DEFAULT_DELIMS
+        ).values.astype(np.int64)[codes]
 
     if "commandlineScore" not in output_df or force:
-        output_df["commandlineScore"] = output_df.apply(
-            lambda x: char_ord_score(x.CommandLine), axis=1
-        )
+        output_df["commandlineScore"] = _char_ord_scores(cmd_lines)[codes]
     if "commandlineTokensHash" not in output_df or force:
-        output_df["commandlineTokensHash"] = output_df.apply(
-            lambda x: delim_hash(x.CommandLine), axis=1
-        )
+        output_df["commandlineTokensHash"] = _crc32_hashes(
+            cmd_lines.str.findall(_DEFAULT_DELIMS).str.join("")
+        )[codes]
+
+
+def _factorize_strings(data: pd.Series) -> Tuple[np.ndarray, pd.Series]:
+    """
+    Return the codes and unique values of a string column.
+
+    Parameters
+    ----------
+    data : pd.Series
+        The column of strings (NaN values are treated as empty strings)
+
+    Returns
+    -------
+    Tuple[np.ndarray, pd.Series]
+        Codes (the index of the unique value for each row) and
+        the unique values. Indexing an array of per-unique values
+        with the codes returns the per-row values.
+
+    """
+    codes, uniques = pd.factorize(data.fillna(""))
+    return codes, pd.Series(uniques, dtype=object)
+
+
+def _char_ord_scores(values: pd.Series) -> np.ndarray:
+    """Return the sum of ord values of characters for each string in `values`."""
+    if values.empty:
+        return np.zeros(0, dtype=np.int64)
+    # encode all of the strings to a single array of code points and
+    # sum the code points between the string boundaries
+    code_points = np.frombuffer(
+        "".join(values).encode("utf-32-le", "surrogatepass"), dtype=np.uint32
+    )
+    cum_sum = np.concatenate([[0], np.cumsum(code_points, dtype=np.int64)])
+    ends = np.cumsum(values.str.len().values.astype(np.int64))
+    starts = np.concatenate([[0], ends[:-1]])
+    return cum_sum[ends] - cum_sum[starts]
+
+
+def _crc32_hashes(values: pd.Series) -> np.ndarray:
+    """Return the CRC32 hash of each string in `values`."""
+    return np.fromiter(
+        (crc32(value.encode("utf-8")) for value in values),
+        dtype=np.int64,
+        count=len(values),
+    )
+
+
+def _log10_or_zero(values: np.ndarray) -> np.ndarray:
+    """Return log10 of `values` or 0 where the value is 0."""
+    # use math.log10 (once per unique value) to match the scalar results
+    uniques, inverse = np.unique(values, return_inverse=True)
+    log_values = np.array(
+        [log10(value) if value else 0 for value in uniques.tolist()],
+        dtype=np.float64,
+    )
+    return log_values[inverse]
 
 
 @export
 @lru_cache(maxsize=1024)
-def delim_count(value: str, delim_list: str = r'[\s\-\\/\.,"\'|&:;%$()]') -> int:
+def delim_count(value: str, delim_list: str = _DEFAULT_DELIMS) -> int:
     r"""
     Count the delimiters in input column.
 
@@ -406,7 +480,7 @@ def delim_count(value: str, delim_list: str = r'[\s\-\\/\.,"\'|&:;%$()]') -> int
 
 @export
 @lru_cache(maxsize=1024)
-def delim_hash(value: str, delim_list: str = r'[\s\-\\/\.,"\'|&:;%$()]') -> int:
+def delim_hash(value: str, delim_list: str = _DEFAULT_DELIMS) -> int:
     r"""
     Return a hash (CRC32) of the delimiters from input column.
 
@@ -511,7 +585,7 @@ def crc32_hash(value: str) -> int:
 
 @export
 def delim_count_df(
-    data: pd.DataFrame, column: str, delim_list: str = r'[\s\-\\/\.,"\'|&:;%$()]'
+    data: pd.DataFrame, column: str, delim_list: str = _DEFAULT_DELIMS
 ) -> pd.Series:
     r"""
     Count the delimiters in input column.
@@ -568,7 +642,8 @@ def char_ord_score_df(data: pd.DataFrame, column: str, scale: int = 1) -> pd.Ser
     algorithms.
 
     """
-    return data.apply(lambda x: sum(ord(char) for char in x[column]) / scale, axis=1)
+    codes, values = _factorize_strings(data[column])
+    return pd.Series(_char_ord_scores(values)[codes] / scale, index=data.index)
 
 
 @export
@@ -613,7 +688,8 @@ def crc32_hash_df(data: pd.DataFrame, column: str) -> pd.Series:
         CRC32 hash of input column
 
     """
-    return data.apply(lambda x: crc32(bytes(x[column].encode("utf-8"))), axis=1)
+    codes, values = _factorize_strings(data[column])
+    return pd.Series(_crc32_hashes(values)[codes], index=data.index)
 
 
 # pylint: disable=too-many-arguments, too-many-statements
@@ -0,0 +1,78 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# --------------------------------------------------------------------------
+"""Thread-safe token bucket rate limiter."""
+import math
+import threading
+import time
+from typing import Optional
+
+from .._version import VERSION
+
+__version__ = VERSION
+__author__ = "Ian Hellen"
+
+
+class RateLimiter:
+    """Token bucket rate limiter shared between worker threads."""
+
+    def __init__(self, rate: Optional[float] = None, burst: Optional[int] = None):
+        """
+        Initialize the rate limiter.
+
+        Parameters
+        ----------
+        rate : Optional[float], optional
+            The sustained number of requests allowed per second,
+            by default None (no limit).
+        burst : Optional[int], optional
+            The maximum number of tokens that can accumulate in the bucket,
+            by default `rate` (rounded up, minimum of 1).
+
+        Raises
+        ------
+        ValueError
+            If `rate` or `burst` is not a positive number.
+
+        """
+        if rate is not None and rate <= 0:
+            raise ValueError("rate must be a positive number of requests per second.")
+        if burst is not None and burst < 1:
+            raise ValueError("burst must be 1 or greater.")
+        self.rate = rate
+        self.burst = burst or max(1, math.ceil(rate or 1))
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        """Return True if a rate limit is applied."""
+        return self.rate is not None
+
+    def acquire(self):
+        """Block until a token is available and consume it."""
+        if not self.enabled:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    float(self.burst), self._tokens + (now - self._last) * self.rate
+                )
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_time = (1 - self._tokens) / self.rate  # type: ignore
+            time.sleep(wait_time)
+
+    def __enter__(self):
+        """Acquire a token on entering the context."""
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Exit the context (tokens are not returned)."""
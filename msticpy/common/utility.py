@@ -6,15 +6,27 @@
 """Miscellaneous helper methods for Jupyter Notebooks."""
 import builtins
 import difflib
+import math
 import os
 import re
 import subprocess  # nosec
 import sys
 import uuid
 import warnings
+from concurrent.futures import Executor, ProcessPoolExecutor
 from enum import Enum
 from pathlib import Path
-from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 import pkg_resources
 from deprecated.sphinx import deprecated
@@ -629,3 +641,62 @@ def arg_to_list(arg: Union[str, List[str]], delims=",; ") -> List[str]:
                 return [item.strip() for item in arg.split(char)]
         return [arg]
     raise TypeError("`arg` must be a string or a list.")
+
+
+def process_chunks(
+    func: Callable[..., Any],
+    items: Sequence[Any],
+    *args,
+    n_jobs: Optional[int] = None,
+    min_items: int = 2,
+    min_chunk_size: int = 1,
+    executor: Optional[Executor] = None,
+) -> List[Any]:
+    """
+    Call `func` for chunks of `items`, in worker processes if requested.
+
+    Parameters
+    ----------
+    func : Callable[..., Any]
+        Picklable function that takes a list of items followed by `args`.
+    items : Sequence[Any]
+        The items to process.
+    args :
+        Additional arguments passed to `func`.
+    n_jobs : int, optional
+        The number of worker processes to use, by default None
+        (call `func` once in the current process with all of the items).
+        Use -1 to use one process per CPU.
+    min_items : int, optional
+        The minimum number of items needed to use worker processes,
+        by default 2.
+    min_chunk_size : int, optional
+        The minimum number of items in each chunk, by default 1.
+    executor : Executor, optional
+        An existing executor to use. If supplied, the items are always
+        processed using `executor`, split into `n_jobs` chunks (or
+        one chunk per CPU if `n_jobs` is not specified).
+
+    Returns
+    -------
+    List[Any]
+        The results of `func` for each chunk, in the order of `items`.
+
+    """
+    if n_jobs is not None and n_jobs < 0:
+        n_jobs = os.cpu_count() or 1
+    if executor is None and (not n_jobs or n_jobs < 2 or len(items) < min_items):
+        return [func(items, *args)]
+
+    n_chunks = n_jobs or os.cpu_count() or 1
+    chunk_size = max(math.ceil(len(items) / n_chunks), min_chunk_size, 1)
+    chunks = [
+        items[start : start + chunk_size]  # noqa: E203
+        for start in range(0, len(items), chunk_size)
+    ]
+    if executor is not None:
+        futures = [executor.submit(func, chunk, *args) for chunk in chunks]
+        return [future.result() for future in futures]
+    with ProcessPoolExecutor(max_workers=min(n_chunks, len(chunks))) as proc_exec:
+        futures = [proc_exec.submit(func, chunk, *args) for chunk in chunks]
+        return [future.result() for future in futures]
@@ -16,6 +16,8 @@ import numpy as np
 import pandas as pd
 import yaml
 
+from ..common.utility import process_chunks
+
 OBFUS_COL_MAP: Dict[str, str] = {}
 _MAP_FILE = "resources/obfuscation_cols.yaml"
 _obfus_map_file = pkgutil.get_data("msticpy", _MAP_FILE)
@@ -397,11 +399,18 @@ MAP_FUNCS: Dict[str, Union[str, Callable]] = {
 }
 
 
-def mask_df(  # noqa: MC0001
+# Map types that do not depend on per-process state (the random IP
+# map or the GUID replacement map) and can be run in worker processes.
+_PARALLEL_MAP_TYPES = {"str", "dict", "list", "sid", "acct"}
+_MIN_PARALLEL_COLUMNS = 4
+
+
+def mask_df(
     data: pd.DataFrame,
     column_map: Mapping[str, Any] = None,
     use_default: bool = True,
     silent: bool = True,
+    n_jobs: int = None,
 ) -> pd.DataFrame:
     """
     Obfuscate columns of a DataFrame.
@@ -418,12 +427,25 @@ def mask_df(  # noqa: MC0001
     silent: bool
         If False the function returns progress output,
         by default True.
+    n_jobs : int, optional
+        The number of worker processes to use to obfuscate
+        columns, by default None (obfuscate in the current process).
+        Use -1 to use one process per CPU.
 
     Returns
     -------
     pd.DataFrame
         Obfuscated dataframe.
 
+    Notes
+    -----
+    Each distinct value in a column is obfuscated once and the
+    result mapped back to all of the rows containing that value.
+    If `n_jobs` is greater than 1 and there are enough columns to
+    make it worthwhile, the columns are obfuscated in parallel.
+    Columns of type "ip" and "uuid" are always obfuscated in the
+    current process so that their mappings are consistent.
+
     """
     col_map = OBFUS_COL_MAP.copy() if use_default else {}
     if column_map is not None:
@@ -432,34 +454,141 @@ def mask_df(  # noqa: MC0001
     out_df = data.copy()
     if not silent:
         print("obfuscating columns:")
+    mask_cols = {}
     for col_name in data.columns:
         if col_name not in col_map:
             continue
         col_type = col_map.get(col_name, "str")
         if not silent:
             print(col_name, end=", ")
-        map_func = MAP_FUNCS.get(col_type)
-        try:
-            if map_func == "null":
-                data[col_name] = None
-            elif map_func is not None and callable(map_func):
-                out_df[col_name] = out_df.apply(
-                    lambda x, col=col_name, func=map_func: func(x[col]), axis=1
-                )
-            else:
-                out_df[col_name] = out_df.apply(
-                    lambda x, col=col_name, c_type=col_type: hash_item(x[col], c_type),
-                    axis=1,
-                )
-        except Exception as err:
-            print(col_name, str(err))
-            raise
+        if MAP_FUNCS.get(col_type) == "null":
+            data[col_name] = None
+        elif not data.empty:
+            mask_cols[col_name] = col_type
+
+    for col_name, masked_values in _mask_columns(data, mask_cols, n_jobs).items():
+        out_df[col_name] = masked_values
 
     if not silent:
         print("\ndone")
     return out_df
 
 
+def _mask_columns(
+    data: pd.DataFrame, mask_cols: Dict[str, str], n_jobs: Optional[int] = None
+) -> Dict[str, pd.Series]:
+    """Return the obfuscated values for each column in `mask_cols`."""
+    col_values = {}
+    for col_name in mask_cols:
+        try:
+            col_values[col_name] = _get_distinct_values(data[col_name])
+        except TypeError:
+            # unhashable values (e.g. dicts or lists) are masked individually
+            col_values[col_name] = (None, data[col_name].to_numpy(dtype=object))
+
+    # column types that use shared state (e.g. "ip" and "uuid")
+    # are masked in the current process
+    par_cols = [
+        col_name
+        for col_name, col_type in mask_cols.items()
+        if col_type in _PARALLEL_MAP_TYPES or col_type not in MAP_FUNCS
+    ]
+    serial_cols = [col_name for col_name in mask_cols if col_name not in par_cols]
+    chunk_results = process_chunks(
+        _mask_values_worker,
+        [(col, col_values[col][1], mask_cols[col]) for col in par_cols],
+        n_jobs=n_jobs,
+        min_items=_MIN_PARALLEL_COLUMNS,
+    )
+    masked_values = dict(
+        zip(par_cols, (masked for chunk in chunk_results for masked in chunk))
+    )
+    masked_values.update(
+        zip(
+            serial_cols,
+            _mask_values_worker(
+                [(col, col_values[col][1], mask_cols[col]) for col in serial_cols]
+            ),
+        )
+    )
+
+    results = {}
+    for col_name in mask_cols:
+        codes = col_values[col_name][0]
+        masked = masked_values[col_name]
+        if codes is not None:
+            masked = masked[codes]
+        # use the same dtype inference as DataFrame.apply
+        results[col_name] = pd.Series(masked.tolist(), index=data.index)
+    return results
+
+
+def _get_distinct_values(values: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return the codes and distinct values of a column.
+
+    Parameters
+    ----------
+    values : pd.Series
+        The column values.
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray]
+        The position of each row's value in the distinct values
+        and the distinct values (in order of first occurrence).
+
+    Raises
+    ------
+    TypeError
+        If the column contains unhashable values.
+
+    """
+    codes, _ = pd.factorize(values)
+    if values.dtype == object:
+        # Values that compare equal but have different types
+        # (e.g. 1, 1.0 and True) hash to different strings.
+        # This also separates different types of null values,
+        # which are all given a code of -1 by factorize.
+        type_codes, val_types = pd.factorize(values.map(type))
+        if len(val_types) > 1 or (codes == -1).any():
+            codes, _ = pd.factorize(
+                codes.astype(np.int64) * len(val_types) + type_codes
+            )
+    elif (codes == -1).any():
+        # null values (NaN, NaT) are given a code of -1 by factorize
+        codes, _ = pd.factorize(codes)
+    _, first_pos = np.unique(codes, return_index=True)
+    return codes, values.iloc[first_pos].to_numpy(dtype=object)
+
+
+def _mask_values(values: np.ndarray, col_type: str) -> np.ndarray:
+    """Return the obfuscated `values` for a column of type `col_type`."""
+    map_func = MAP_FUNCS.get(col_type)
+    if map_func is not None and callable(map_func):
+        masked = [map_func(value) for value in values]
+    else:
+        masked = [hash_item(value, col_type) for value in values]
+    out_values = np.empty(len(masked), dtype=object)
+    for idx, value in enumerate(masked):
+        out_values[idx] = value
+    return out_values
+
+
+def _mask_values_worker(
+    col_values: List[Tuple[str, np.ndarray, str]]
+) -> List[np.ndarray]:
+    """Obfuscate the values of a list of columns."""
+    masked_values = []
+    for col_name, values, col_type in col_values:
+        try:
+            masked_values.append(_mask_values(values, col_type))
+        except Exception as err:
+            print(col_name, str(err))
+            raise
+    return masked_values
+
+
 def check_masking(
     data: pd.DataFrame, orig_data: pd.DataFrame, index: int = 0, silent=True
 ) -> Optional[Tuple[List[str], List[str]]]:
@@ -523,7 +652,10 @@ class ObfuscationAccessor:
         self._df = pandas_obj
 
     def mask(
-        self, column_map: Mapping[str, Any] = None, use_default: bool = True
+        self,
+        column_map: Mapping[str, Any] = None,
+        use_default: bool = True,
+        n_jobs: int = None,
     ) -> pd.DataFrame:
         """
         Obfuscate the data in columns of a pandas dataframe.
@@ -537,6 +669,10 @@ class ObfuscationAccessor:
         use_default: bool
             If True use the built-in map (adding any custom
             mappings to this dictionary)
+        n_jobs : int, optional
+            The number of worker processes to use to obfuscate
+            columns, by default None (obfuscate in the current process).
+            Use -1 to use one process per CPU.
 
         Returns
         -------
@@ -544,4 +680,9 @@ class ObfuscationAccessor:
             Obfuscated dataframe
 
         """
-        return mask_df(data=self._df, column_map=column_map, use_default=use_default)
+        return mask_df(
+            data=self._df,
+            column_map=column_map,
+            use_default=use_default,
+            n_jobs=n_jobs,
+        )
@@ -4,23 +4,28 @@
 # license information.
 # --------------------------------------------------------------------------
 """Data provider loader."""
+import time
 import warnings
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from datetime import datetime
 from functools import partial
 from itertools import tee
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional, Union
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple, Union
 
 import pandas as pd
 from tqdm.auto import tqdm
 
 from .._version import VERSION
 from ..common import pkg_config as config
+from ..common.exceptions import MsticpyException
 from ..common.utility import export, valid_pyname
 from .browsers.query_browser import browse_queries
 from .drivers import import_driver, DriverBase
 from .param_extractor import extract_query_params
 from .query_container import QueryContainer
+from .query_cache import QueryResultCache
 from .query_defns import DataEnvironment
 from .query_source import QuerySource
 from .query_store import QueryStore
@@ -29,6 +34,19 @@ __version__ = VERSION
 __author__ = "Ian Hellen"
 
 _DB_QUERY_FLAGS = ("print", "debug_query", "print_query")
+# Options used to control split query execution - these are not
+# passed to the driver.
+_SPLIT_QUERY_OPTIONS = ("max_concurrency", "max_retries", "adaptive_split", "row_limit")
+
+
+def _run_inline(func, *args, **kwargs) -> Future:
+    """Run `func` in the current thread and return a completed Future."""
+    future: Future = Future()
+    try:
+        future.set_result(func(*args, **kwargs))
+    except Exception as err:  # pylint: disable=broad-except
+        future.set_exception(err)
+    return future
 
 
 @export
@@ -41,6 +59,16 @@ class QueryProvider:
 
     """
 
+    # Initial delay (seconds) before retrying a failed split query.
+    # This is doubled for each subsequent retry.
+    _SPLIT_RETRY_DELAY = 1.0
+    # Adaptive split settings - the shortest time range that will be
+    # bisected, the fraction of the row limit below which time ranges
+    # are widened and the maximum number of ranges combined in a query.
+    _MIN_SPLIT_DELTA = pd.Timedelta("1s")
+    _SPLIT_WIDEN_RATIO = 0.25
+    _MAX_SPLIT_COALESCE = 16
+
     def __init__(  # noqa: MC0001
         self,
         data_environment: Union[str, DataEnvironment],
@@ -61,6 +89,11 @@ class QueryProvider:
             `DriverBase`)
         query_paths : List[str]
             Additional paths to look for query definitions.
+        query_cache : Union[bool, str, QueryResultCache], optional
+            Cache query results on disk. If True, use a cache in the
+            default location (~/.msticpy/query_cache), if a string, use
+            a cache in this folder. You can also supply a
+            `QueryResultCache` instance. By default, results are not cached.
         kwargs :
             Other arguments are passed to the data provider driver.
 
@@ -77,6 +110,7 @@ class QueryProvider:
                 raise TypeError(f"Unknown data environment {data_environment}")
 
         self.environment = data_environment.name
+        self.query_cache = kwargs.pop("query_cache", None)
 
         if driver is None:
             driver_class = import_driver(data_environment)
@@ -89,6 +123,7 @@ class QueryProvider:
 
         self._query_provider = driver
         self.all_queries = QueryContainer()
+        self.split_query_stats: Optional[pd.DataFrame] = None
 
         # Add any query files
         data_env_queries: Dict[str, QueryStore] = {}
@@ -132,6 +167,30 @@ class QueryProvider:
             driver_queries = self._query_provider.driver_queries
             self._add_driver_queries(queries=driver_queries)
 
+    @property
+    def query_cache(self) -> Optional[QueryResultCache]:
+        """
+        Return the query result cache.
+
+        Returns
+        -------
+        Optional[QueryResultCache]
+            The query result cache or None if results are not cached.
+
+        """
+        return self._query_cache
+
+    @query_cache.setter
+    def query_cache(self, cache: Union[bool, str, QueryResultCache, None]):
+        """Set the query result cache (True, a folder path or a cache instance)."""
+        if cache is True:
+            cache = QueryResultCache()
+        elif isinstance(cache, str):
+            cache = QueryResultCache(path=cache)
+        elif not isinstance(cache, QueryResultCache):
+            cache = None
+        self._query_cache = cache
+
     @property
     def connected(self) -> bool:
         """
@@ -237,7 +296,12 @@ class QueryProvider:
         Parameters
         ----------
         query : str
-            [description]
+            The query to execute
+
+        Other Parameters
+        ----------------
+        kwargs :
+            Other parameters are passed to the driver.
 
         Returns
         -------
@@ -245,7 +309,14 @@ class QueryProvider:
             Query results - a DataFrame if successful
             or a KqlResult if unsuccessful.
 
+        Notes
+        -----
+        Ad hoc queries do not have an explicit time range, so the
+        results are not stored in the query result cache.
+
         """
+        # ad hoc queries are never cached
+        kwargs.pop("use_cache", None)
         query_options = kwargs.pop("query_options", {}) or kwargs
         return self._query_provider.query(query, **query_options)
 
@@ -294,13 +365,19 @@ class QueryProvider:
             query_source.help()
             raise ValueError(f"No values found for these parameters: {missing}")
 
+        use_cache = kwargs.pop("use_cache", True)
         split_by = kwargs.pop("split_query_by", None)
+        split_options = {
+            opt: kwargs.pop(opt) for opt in _SPLIT_QUERY_OPTIONS if opt in kwargs
+        }
         if split_by:
             split_result = self._exec_split_query(
                 split_by=split_by,
                 query_source=query_source,
                 query_params=params,
                 args=args,
+                use_cache=use_cache,
+                **split_options,
                 **kwargs,
             )
             if split_result is not None:
@@ -317,7 +394,71 @@ class QueryProvider:
 
         # Handle any query options passed
         query_options = self._get_query_options(params, kwargs)
-        return self._query_provider.query(query_str, query_source, **query_options)
+        return self._query_with_cache(
+            query_str,
+            query_source,
+            query_options,
+            use_cache=use_cache,
+            end=params.get("end"),
+        )
+
+    def _query_with_cache(
+        self,
+        query: str,
+        query_source: Optional[QuerySource] = None,
+        query_options: Optional[Dict[str, Any]] = None,
+        use_cache: bool = True,
+        end: Any = None,
+    ) -> Union[pd.DataFrame, Any]:
+        """Return cached query results or execute the query and cache them."""
+        query_options = query_options or {}
+        # ad hoc queries (exec_query) do not have a query_source
+        query_args = (query,) if query_source is None else (query, query_source)
+        cache_key = (
+            self._query_cache_key(query, query_options, end) if use_cache else None
+        )
+        if cache_key is None:
+            return self._query_provider.query(*query_args, **query_options)
+        result = self._query_cache.get(cache_key)  # type: ignore
+        if result is None:
+            result = self._query_provider.query(*query_args, **query_options)
+            self._query_cache.put(cache_key, result)  # type: ignore
+        return result
+
+    def _query_cache_key(
+        self, query: str, query_options: Dict[str, Any], end: Any = None
+    ) -> Optional[str]:
+        """
+        Return the result cache key for the driver, connection and query.
+
+        Returns
+        -------
+        Optional[str]
+            The cache key or None if the results should not be cached.
+            Results are only cached for queries with an `end` time
+            in the past (the results for later times may change) and for
+            drivers that have a `current_connection` identity.
+
+        """
+        if self._query_cache is None or end is None:
+            return None
+        connection = self._query_provider.current_connection
+        if not connection:
+            return None
+        try:
+            end_time = pd.Timestamp(end)
+        except (TypeError, ValueError):
+            return None
+        if end_time.tzinfo is None:
+            end_time = end_time.tz_localize("UTC")
+        if end_time >= pd.Timestamp.now(tz="UTC"):
+            return None
+        return self._query_cache.make_key(
+            f"{self.environment}.{type(self._query_provider).__qualname__}",
+            connection,
+            query,
+            **query_options,
+        )
 
     @staticmethod
     def _get_query_options(
@@ -412,6 +553,60 @@ class QueryProvider:
         args,
         **kwargs,
     ) -> Union[pd.DataFrame, str, None]:
+        """
+        Execute a query split into time ranges.
+
+        Parameters
+        ----------
+        split_by : str
+            The time period of each sub-query (e.g. "1D")
+        query_source : QuerySource
+            The query to execute
+        query_params : Dict[str, Any]
+            The query parameters (including "start" and "end")
+        args :
+            Query function positional args
+
+        Other Parameters
+        ----------------
+        max_concurrency : int, optional
+            The maximum number of sub-queries to run concurrently,
+            by default 1 (sub-queries are run in sequence). Note: the
+            driver must support concurrent queries.
+        max_retries : int, optional
+            The number of times to retry a sub-query that fails (raises
+            an exception or does not return a DataFrame), by default 0.
+        adaptive_split : bool, optional
+            If True, a time range is split in two (recursively) if the
+            sub-query fails or returns `row_limit` rows. Following
+            sub-queries are widened (by combining time ranges) if a
+            sub-query returns less than a quarter of `row_limit` rows.
+            By default, False.
+        row_limit : int, optional
+            The maximum number of rows that the data source returns
+            for a query. Sub-queries returning this number of rows
+            are assumed to be truncated.
+        kwargs :
+            Other parameters are passed to the driver.
+
+        Returns
+        -------
+        Union[pd.DataFrame, str, None]
+            The combined results of the sub-queries (in time order),
+            the query text if a debug option was specified or None if the
+            query could not be split.
+
+        Notes
+        -----
+        The start, end, row count, duration and number of attempts
+        for each sub-query are available in the `split_query_stats`
+        attribute after the query completes.
+
+        """
+        split_options = {
+            opt: kwargs.pop(opt) for opt in _SPLIT_QUERY_OPTIONS if opt in kwargs
+        }
+        use_cache = kwargs.pop("use_cache", True)
         start = query_params.pop("start", None)
         end = query_params.pop("end", None)
         if not (start or end):
@@ -444,12 +639,284 @@ class QueryProvider:
         # Retrive any query options passed (other than query params)
         # and send to query function.
         query_options = self._get_query_options(query_params, kwargs)
-        query_dfs = [
-            self._query_provider.query(query_str, query_source, **query_options)
-            for query_str in tqdm(split_queries, unit="sub-queries", desc="Running")
-        ]
+        query_dfs, self.split_query_stats = self._run_split_queries(
+            ranges,
+            query_source=query_source,
+            query_params=query_params,
+            query_options=query_options,
+            use_cache=use_cache,
+            **split_options,
+        )
+        return pd.concat(query_dfs) if query_dfs else pd.DataFrame()
 
-        return pd.concat(query_dfs)
+    # pylint: disable=too-many-locals, too-many-branches
+    def _run_split_queries(  # noqa: MC0001
+        self,
+        ranges: List[Tuple[datetime, datetime]],
+        query_source: QuerySource,
+        query_params: Dict[str, Any],
+        query_options: Dict[str, Any],
+        **kwargs,
+    ) -> Tuple[List[pd.DataFrame], pd.DataFrame]:
+        """
+        Execute the queries for each time range.
+
+        Parameters
+        ----------
+        ranges : List[Tuple[datetime, datetime]]
+            The initial list of time ranges to query.
+        query_source : QuerySource
+            The query to execute
+        query_params : Dict[str, Any]
+            The query parameters (other than "start" and "end")
+        query_options : Dict[str, Any]
+            Options to pass to the driver.
+
+        Other Parameters
+        ----------------
+        max_concurrency : int, optional
+            The maximum number of queries to run concurrently.
+        max_retries : int, optional
+            The number of times to retry a failed query, by default 0.
+        adaptive_split : bool, optional
+            If True, bisect time ranges that fail or return `row_limit`
+            rows and widen time ranges that return few rows.
+        row_limit : int, optional
+            The maximum number of rows returned by the data source.
+        use_cache : bool, optional
+            If False, do not use the query result cache.
+
+        Returns
+        -------
+        Tuple[List[pd.DataFrame], pd.DataFrame]
+            The query results in time order and a DataFrame of the
+            statistics for each query executed.
+
+        """
+        max_concurrency = kwargs.get("max_concurrency", 1) or 1
+        adaptive = kwargs.get("adaptive_split", False)
+        row_limit = kwargs.get("row_limit")
+        exec_split = partial(
+            self._exec_split_slice,
+            query_source=query_source,
+            query_options=query_options,
+            max_retries=kwargs.get("max_retries", 0),
+            use_cache=kwargs.get("use_cache", True),
+        )
+        # each pending item is (start, end, units, mergeable) - units is
+        # the number of progress bar units that the time range represents.
+        # Bisected ranges are not mergeable (they would just be re-combined
+        # into the range that was bisected).
+        pending = deque((q_start, q_end, 1, True) for q_start, q_end in ranges)
+        in_flight: Dict[Future, Tuple[datetime, datetime, int]] = {}
+        results: Dict[Tuple[datetime, datetime], pd.DataFrame] = {}
+        # time ranges that completed (successfully or not)
+        completed: List[Tuple[datetime, datetime]] = []
+        stats: List[Tuple[Any, ...]] = []
+        # number of adjacent time ranges to combine into one query
+        coalesce = 1
+        progress = tqdm(total=len(ranges), unit="sub-queries", desc="Running")
+        executor = (
+            ThreadPoolExecutor(max_workers=max_concurrency)
+            if max_concurrency > 1
+            else None
+        )
+        try:
+            while pending or in_flight:
+                while pending and len(in_flight) < max_concurrency:
+                    q_start, q_end, units = self._next_split_range(pending, coalesce)
+                    query_str = query_source.create_query(
+                        formatters=self._query_provider.formatters,
+                        start=q_start,
+                        end=q_end,
+                        **query_params,
+                    )
+                    if executor:
+                        future = executor.submit(exec_split, query_str, end=q_end)
+                    else:
+                        future = _run_inline(exec_split, query_str, end=q_end)
+                    in_flight[future] = (q_start, q_end, units)
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in sorted(done, key=lambda fut: in_flight[fut][0]):
+                    q_start, q_end, units = in_flight.pop(future)
+                    try:
+                        result, attempts, duration = future.result()
+                        error = None
+                    except Exception as err:  # pylint: disable=broad-except
+                        result, attempts, duration, error = None, None, None, err
+                    failed = not isinstance(result, pd.DataFrame)
+                    capped = not failed and row_limit and len(result) >= row_limit
+                    if (
+                        adaptive
+                        and (failed or capped)
+                        and q_end - q_start > self._MIN_SPLIT_DELTA
+                    ):
+                        status = "bisected"
+                        first, second = self._bisect_range(q_start, q_end)
+                        if units == 1:
+                            progress.total += 1
+                            progress.refresh()
+                        pending.extendleft(
+                            [
+                                (*second, max(units - units // 2, 1), False),
+                                (*first, max(units // 2, 1), False),
+                            ]
+                        )
+                        coalesce = max(coalesce // 2, 1)
+                    elif failed:
+                        if error is not None:
+                            raise error
+                        # pass on non-DataFrame results from the driver
+                        status = "failed"
+                        results[(q_start, q_end)] = result
+                        completed.append((q_start, q_end))
+                        progress.update(units)
+                    else:
+                        status = "ok"
+                        if capped:
+                            status = "truncated"
+                            warnings.warn(
+                                f"Query for time range {q_start} - {q_end} "
+                                f"returned the maximum of {row_limit} rows. "
+                                "Some results may be missing."
+                            )
+                        results[(q_start, q_end)] = result
+                        completed.append((q_start, q_end))
+                        if (
+                            adaptive
+                            and row_limit
+                            and len(result) < row_limit * self._SPLIT_WIDEN_RATIO
+                        ):
+                            coalesce = min(coalesce * 2, self._MAX_SPLIT_COALESCE)
+                        progress.update(units)
+                    stats.append(
+                        (
+                            q_start,
+                            q_end,
+                            None if failed else len(result),
+                            duration,
+                            attempts,
+                            status,
+                        )
+                    )
+        finally:
+            if executor:
+                executor.shutdown()
+            progress.close()
+
+        self._check_split_coverage(ranges, completed)
+        stats_df = pd.DataFrame(
+            stats, columns=["Start", "End", "Rows", "Duration", "Attempts", "Status"]
+        )
+        return (
+            [results[q_range] for q_range in sorted(results)],
+            stats_df.sort_values("Start", kind="stable", ignore_index=True),
+        )
+
+    @staticmethod
+    def _next_split_range(
+        pending: Deque[Tuple[datetime, datetime, int, bool]], coalesce: int
+    ) -> Tuple[datetime, datetime, int]:
+        """
+        Remove and return up to `coalesce` ranges from pending as one range.
+
+        Only mergeable ranges that are adjacent to each other
+        (the next range starts 1 nanosecond after the current one ends)
+        are combined.
+
+        """
+        q_start, q_end, units, mergeable = pending.popleft()
+        for _ in range(coalesce - 1):
+            if not (mergeable and pending):
+                break
+            next_start, next_end, next_units, mergeable = pending[0]
+            if not mergeable or pd.Timestamp(next_start) != pd.Timestamp(
+                q_end
+            ) + pd.Timedelta("1ns"):
+                break
+            pending.popleft()
+            q_end = next_end
+            units += next_units
+        return q_start, q_end, units
+
+    @staticmethod
+    def _check_split_coverage(
+        ranges: List[Tuple[datetime, datetime]],
+        completed: List[Tuple[datetime, datetime]],
+    ):
+        """
+        Check that the completed time ranges exactly cover `ranges`.
+
+        Raises
+        ------
+        MsticpyException
+            If the completed time ranges overlap or have gaps.
+
+        """
+        if not ranges:
+            return
+        completed = sorted(completed)
+        if not completed or (completed[0][0], completed[-1][1]) != (
+            ranges[0][0],
+            ranges[-1][1],
+        ):
+            raise MsticpyException(
+                "Split query results do not cover the query time range."
+            )
+        for (_, prev_end), (next_start, _) in zip(completed, completed[1:]):
+            if pd.Timestamp(next_start) != pd.Timestamp(prev_end) + pd.Timedelta("1ns"):
+                raise MsticpyException(
+                    f"Split query results overlap or have a gap at {prev_end}."
+                )
+
+    def _exec_split_slice(
+        self,
+        query_str: str,
+        query_source: QuerySource,
+        query_options: Dict[str, Any],
+        max_retries: int,
+        use_cache: bool = True,
+        end: Optional[datetime] = None,
+    ) -> Tuple[Any, int, float]:
+        """
+        Execute a sub-query, retrying if it fails.
+
+        Returns
+        -------
+        Tuple[Any, int, float]
+            The query result, the number of attempts (0 if the result
+            was retrieved from the cache) and the time taken in seconds.
+
+        Raises
+        ------
+        Exception
+            Any exception raised by the driver on the final attempt.
+
+        """
+        start_time = time.perf_counter()
+        cache_key = (
+            self._query_cache_key(query_str, query_options, end) if use_cache else None
+        )
+        if cache_key:
+            result = self._query_cache.get(cache_key)  # type: ignore
+            if result is not None:
+                return result, 0, time.perf_counter() - start_time
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                result = self._query_provider.query(
+                    query_str, query_source, **query_options
+                )
+                if isinstance(result, pd.DataFrame) or attempt > max_retries:
+                    if cache_key:
+                        self._query_cache.put(cache_key, result)  # type: ignore
+                    return result, attempt, time.perf_counter() - start_time
+            except Exception:  # pylint: disable=broad-except
+                if attempt > max_retries:
+                    raise
+            time.sleep(self._SPLIT_RETRY_DELAY * 2 ** (attempt - 1))
 
     @staticmethod
     def _calc_split_ranges(start: datetime, end: datetime, split_delta: pd.Timedelta):
@@ -481,6 +948,16 @@ class QueryProvider:
             ranges.append((ranges[-1][0] + pd.Timedelta("1ns"), end))
         return ranges
 
+    @staticmethod
+    def _bisect_range(
+        start: datetime, end: datetime
+    ) -> Tuple[Tuple[datetime, datetime], Tuple[datetime, datetime]]:
+        """Return `start`-`end` split into two time ranges."""
+        # as with _calc_split_ranges, the second range starts 1 nanosecond
+        # after the end of the first to avoid duplicate records.
+        mid = pd.Timestamp(start) + (pd.Timestamp(end) - pd.Timestamp(start)) / 2
+        return (start, mid), (mid + pd.Timedelta("1ns"), end)
+
     @classmethod
     def _resolve_package_path(cls, config_path: str) -> Optional[str]:
         """Resolve path relative to current package."""
@@ -0,0 +1,261 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# --------------------------------------------------------------------------
+"""
+Local on-disk cache for query results.
+
+Query results (DataFrames) are stored in a cache folder, keyed by a hash
+of the driver, the connection and the fully rendered query text. Results
+are saved as Parquet files if pyarrow is installed, otherwise (or if the
+DataFrame cannot be saved as Parquet) as pickle files.
+
+The total size of the cache is limited - the least recently used results
+are removed when the limit is exceeded.
+
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+from .._version import VERSION
+from ..common.utility import export
+
+try:
+    import pyarrow  # noqa: F401 pylint: disable=unused-import
+
+    _PARQUET_AVAILABLE = True
+except ImportError:
+    _PARQUET_AVAILABLE = False
+
+__version__ = VERSION
+__author__ = "Ian Hellen"
+
+_PARQUET_EXT = ".parquet"
+_PICKLE_EXT = ".pkl"
+
+
+def _remove_file(file_path: Path):
+    """Delete `file_path`, ignoring missing files."""
+    try:
+        file_path.unlink()
+    except FileNotFoundError:
+        pass
+
+
+def _parquet_compatible(data: pd.DataFrame) -> bool:
+    """
+    Return True if `data` can be saved and restored as Parquet unchanged.
+
+    Object columns holding values other than strings (e.g. lists or
+    dictionaries from dynamic columns) are not restored with the
+    same types, so these DataFrames are saved as pickle files.
+
+    """
+    return all(
+        pd.api.types.infer_dtype(data.iloc[:, idx], skipna=True) in ("string", "empty")
+        for idx, dtype in enumerate(data.dtypes)
+        if dtype == object
+    )
+
+
+@export
+class QueryResultCache:
+    """
+    On-disk cache of query results.
+
+    Notes
+    -----
+    Results may be stored as pickled objects. You should only use
+    a cache folder that is writable by you.
+
+    """
+
+    _DEFAULT_PATH = str(Path("~").expanduser().joinpath(".msticpy", "query_cache"))
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        max_size_mb: float = 1024,
+        max_age: Optional[pd.Timedelta] = None,
+    ):
+        """
+        Initialize the cache.
+
+        Parameters
+        ----------
+        path : Optional[str], optional
+            Path to the cache folder, by default "~/.msticpy/query_cache".
+            The folder is created if it does not exist.
+        max_size_mb : float, optional
+            The maximum total size of the cached results in megabytes,
+            by default 1024. Least recently used results are removed
+            when this is exceeded.
+        max_age : Optional[pd.Timedelta], optional
+            If supplied, results older than this are not returned,
+            by default None (results do not expire).
+
+        """
+        self.path = Path(path or self._DEFAULT_PATH).expanduser()
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.max_size = int(max_size_mb * 1024 * 1024)
+        self.max_age = pd.Timedelta(max_age) if max_age is not None else None
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def make_key(driver: str, connection: Any, query: str, **kwargs) -> str:
+        """
+        Return the cache key for a query.
+
+        Parameters
+        ----------
+        driver : str
+            The driver name.
+        connection : Any
+            The connection identity (e.g. connection string or workspace).
+        query : str
+            The rendered query text.
+        kwargs :
+            Any query options that affect the query result.
+
+        Returns
+        -------
+        str
+            The cache key (a SHA256 hash of the parameters).
+
+        """
+        key_data = json.dumps(
+            [driver, connection, query, kwargs], sort_keys=True, default=str
+        )
+        return hashlib.sha256(key_data.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        """
+        Return the cached result for `key`.
+
+        Parameters
+        ----------
+        key : str
+            The key returned by `make_key`.
+
+        Returns
+        -------
+        Optional[pd.DataFrame]
+            The cached DataFrame or None if the result is not cached
+            or has expired.
+
+        """
+        with self._lock:
+            result = self._read_item(key)
+            if result is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+            return result
+
+    def put(self, key: str, result: pd.DataFrame):
+        """
+        Add a query result to the cache.
+
+        Parameters
+        ----------
+        key : str
+            The key returned by `make_key`.
+        result : pd.DataFrame
+            The query result.
+
+        """
+        if not isinstance(result, pd.DataFrame):
+            return
+        with self._lock:
+            self._remove_item(key)
+            file_path = None
+            if _PARQUET_AVAILABLE and _parquet_compatible(result):
+                file_path = self.path.joinpath(key + _PARQUET_EXT)
+                try:
+                    result.to_parquet(file_path)
+                except Exception:  # pylint: disable=broad-except
+                    _remove_file(file_path)
+                    file_path = None
+            if file_path is None:
+                result.to_pickle(self.path.joinpath(key + _PICKLE_EXT))
+            self._evict()
+
+    def clear(self):
+        """Remove all cached results."""
+        with self._lock:
+            for file_path in self._cache_files():
+                _remove_file(file_path)
+
+    @property
+    def size(self) -> int:
+        """Return the total size of the cached results in bytes."""
+        return sum(file_path.stat().st_size for file_path in self._cache_files())
+
+    def __len__(self) -> int:
+        """Return the number of cached results."""
+        return len(self._cache_files())
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Return the cache hit and miss counts."""
+        return {"hits": self._hits, "misses": self._misses}
+
+    def _cache_files(self) -> List[Path]:
+        return [
+            file_path
+            for file_path in self.path.iterdir()
+            if file_path.suffix in (_PARQUET_EXT, _PICKLE_EXT)
+        ]
+
+    def _read_item(self, key: str) -> Optional[pd.DataFrame]:
+        for ext in (_PARQUET_EXT, _PICKLE_EXT):
+            file_path = self.path.joinpath(key + ext)
+            if not file_path.is_file():
+                continue
+            if self.max_age is not None:
+                age = time.time() - file_path.stat().st_mtime
+                if age > self.max_age.total_seconds():
+                    _remove_file(file_path)
+                    return None
+            try:
+                if ext == _PARQUET_EXT:
+                    result = pd.read_parquet(file_path)
+                else:
+                    result = pd.read_pickle(file_path)  # nosec
+            except Exception:  # pylint: disable=broad-except
+                # remove unreadable (e.g. partially written) files
+                _remove_file(file_path)
+                return None
+            # update the access time so that we evict the least recently
+            # used items first (the modified time is the time of creation).
+            os.utime(file_path, (time.time(), file_path.stat().st_mtime))
+            return result
+        return None
+
+    def _remove_item(self, key: str):
+        for ext in (_PARQUET_EXT, _PICKLE_EXT):
+            _remove_file(self.path.joinpath(key + ext))
+
+    def _evict(self):
+        """Remove least recently used results to keep within max_size."""
+        file_stats = [
+            (file_path, file_path.stat()) for file_path in self._cache_files()
+        ]
+        total_size = sum(f_stat.st_size for _, f_stat in file_stats)
+        if total_size <= self.max_size:
+            return
+        for file_path, f_stat in sorted(file_stats, key=lambda item: item[1].st_atime):
+            _remove_file(file_path)
+            total_size -= f_stat.st_size
+            if total_size <= self.max_size:
+                break
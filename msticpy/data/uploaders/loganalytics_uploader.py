@@ -4,14 +4,16 @@
 # license information.
 # --------------------------------------------------------------------------
 """LogAnayltics Uploader class."""
-from typing import Any
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Deque, Iterator, List
 import json
 import datetime
-import sys
 import hashlib
 import hmac
 import base64
 import re
+import time
 from pathlib import Path
 
 import requests
@@ -32,17 +34,53 @@ __version__ = VERSION
 __author__ = "Pete Bryan"
 
 
+# Due to 30MB limit on each post, data is uploaded in chunks of up to 25MB
+_MAX_BATCH_SIZE = 26214400
+# Number of DataFrame rows converted to JSON at a time
+_SERIALIZE_ROWS = 10000
+# Response codes returned when the API is throttling or temporarily unavailable
+_RETRY_CODES = {429, 500, 503}
+
+
 class LAUploader(UploaderBase):
     """Uploader class for LogAnalytics."""
 
+    _RETRY_DELAY = 0.5
+
     def __init__(self, workspace: str, workspace_secret: str, **kwargs):
-        """Initialize a LogAnalytics Uploader instance."""
+        """
+        Initialize a LogAnalytics Uploader instance.
+
+        Parameters
+        ----------
+        workspace : str
+            The workspace ID to upload data to.
+        workspace_secret : str
+            The workspace key.
+
+        Other Parameters
+        ----------------
+        debug : bool, optional
+            Print debug output, by default False
+        opsinsight_loc : str, optional
+            The domain of the Data Collector API,
+            by default ".ods.opinsights.azure.com"
+        max_concurrency : int, optional
+            The maximum number of concurrent requests used
+            to upload data, by default 4
+        max_retries : int, optional
+            The number of times to retry a request if the API is
+            throttling requests or temporarily unavailable, by default 2
+
+        """
         super().__init__()
         self._kwargs = kwargs
         self.workspace = workspace
         self.workspace_secret = workspace_secret
         self._debug = kwargs.get("debug", False)
         self.ops_loc = kwargs.get("opsinsight_loc", ".ods.opinsights.azure.com")
+        self.max_concurrency = kwargs.get("max_concurrency", 4)
+        self.max_retries = kwargs.get("max_retries", 2)
 
     def _build_signature(
         self,
@@ -86,13 +124,13 @@ class LAUploader(UploaderBase):
         authorization = f"SharedKey {self.workspace}:{encoded_hash}"
         return authorization
 
-    def _post_data(self, body: str, table_name: str):
+    def _post_data(self, body: bytes, table_name: str):
         """
         Write data to Log Analytics Workspace.
 
         Parameters
         ----------
-        body : str
+        body : bytes
             The JSON formatted data to write to Log Analytics.
         table_name : str
             The name of the custom table to write the data to.
@@ -102,16 +140,18 @@ class LAUploader(UploaderBase):
         MsticpyConnectionError
             Raised when response code indicates failure.
 
+        Notes
+        -----
+        Requests that fail because the API is throttling requests
+        or is temporarily unavailable are retried (up to `max_retries`
+        times) with an exponential backoff.
+
         """
         table_name = re.sub("[^A-Za-z0-9_]+", "", table_name)
 
         resource = "/api/logs"
         content_type = "application/json"
-        rfc1123date = datetime.datetime.utcnow().strftime("%a, %d %b %Y %H:%M:%S GMT")
         content_length = len(body)
-        signature = self._build_signature(
-            rfc1123date, content_length, "POST", content_type, resource
-        )
         uri = (
             "https://"
             + self.workspace
@@ -119,21 +159,34 @@ class LAUploader(UploaderBase):
             + resource
             + "?api-version=2016-04-01"
         )
-        headers = {
-            "content-type": content_type,
-            "Authorization": signature,
-            "Log-Type": table_name,
-            "x-ms-date": rfc1123date,
-        }
-        try:
-            response = requests.post(uri, data=body, headers=headers)
-        except requests.ConnectionError as req_err:
-            raise MsticpyConnectionError(
-                "Unable to connect to workspace, ensure your Workspace ID is correct.",
-                title="Unable to connect to Workspace",
-            ) from req_err
-        if self._debug is True:
-            print(f"Upload response code: {response.status_code}")
+        attempt = 0
+        while True:
+            attempt += 1
+            rfc1123date = datetime.datetime.utcnow().strftime(
+                "%a, %d %b %Y %H:%M:%S GMT"
+            )
+            signature = self._build_signature(
+                rfc1123date, content_length, "POST", content_type, resource
+            )
+            headers = {
+                "content-type": content_type,
+                "Authorization": signature,
+                "Log-Type": table_name,
+                "x-ms-date": rfc1123date,
+            }
+            try:
+                response = requests.post(uri, data=body, headers=headers)
+            except requests.ConnectionError as req_err:
+                raise MsticpyConnectionError(
+                    "Unable to connect to workspace, "
+                    + "ensure your Workspace ID is correct.",
+                    title="Unable to connect to Workspace",
+                ) from req_err
+            if self._debug is True:
+                print(f"Upload response code: {response.status_code}")
+            if response.status_code not in _RETRY_CODES or attempt > self.max_retries:
+                break
+            time.sleep(self._get_retry_delay(response, attempt))
         if response.status_code < 200 or response.status_code > 299:
             raise MsticpyConnectionError(
                 f"""LogAnalytics data upload failed with code {response.status_code}.
@@ -141,6 +194,13 @@ class LAUploader(UploaderBase):
                 title="Data Upload Failed",
             )
 
+    def _get_retry_delay(self, response: requests.Response, attempt: int) -> float:
+        """Return the time to wait before retrying a request."""
+        try:
+            return float(response.headers["Retry-After"])
+        except (KeyError, ValueError):
+            return self._RETRY_DELAY * 2 ** (attempt - 1)
+
     def upload_df(self, data: pd.DataFrame, table_name: Any, **kwargs):
         """
         Upload a pandas DataFrame to Log Analytics.
@@ -152,21 +212,37 @@ class LAUploader(UploaderBase):
         table_name : str
             Custom table name to upload the data to.
 
+        Other Parameters
+        ----------------
+        max_concurrency : int, optional
+            The maximum number of concurrent requests used
+            to upload data (the default is the `max_concurrency`
+            value set when creating the uploader).
+
+        Notes
+        -----
+        The data is converted to JSON a chunk at a time and
+        split into batches of up to 25MB. Each batch is
+        uploaded in a separate request.
+
         """
-        events = []
-        for row in data.iterrows():
-            events.append(row[1].astype(str).to_dict())
-            # Due to 30MB limit if data is larger than 25Mb upload that chunk then continue
-            if sys.getsizeof(json.dumps(events)) > 26214400:
-                if self._debug is True:
-                    print("Data larger than 25MB spliting data requests.")
-                body = json.dumps(events)
-                self._post_data(body, table_name)
-                events = []
-
-        if events:
-            body = json.dumps(events)
-            self._post_data(body, table_name)
+        max_concurrency = kwargs.get("max_concurrency", self.max_concurrency) or 1
+        in_flight: Deque = deque()
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            try:
+                for batch_num, body in enumerate(_serialize_batches(data)):
+                    if batch_num == 1 and self._debug is True:
+                        print("Data larger than 25MB spliting data requests.")
+                    # limit the number of serialized batches held in memory
+                    if len(in_flight) >= max_concurrency:
+                        in_flight.popleft().result()
+                    in_flight.append(executor.submit(self._post_data, body, table_name))
+                while in_flight:
+                    in_flight.popleft().result()
+            except Exception:
+                for future in in_flight:
+                    future.cancel()
+                raise
 
         if self._debug:
             print(f"Upload to {table_name} complete")
@@ -224,3 +300,55 @@ class LAUploader(UploaderBase):
             self.upload_df(data, table_name)
             progress.update(1)
         progress.close()
+
+
+def _serialize_batches(data: pd.DataFrame, max_size: int = None) -> Iterator[bytes]:
+    """
+    Return the rows of a DataFrame as batches of JSON events.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        The DataFrame to serialize.
+    max_size : int, optional
+        The maximum size of each batch in bytes, by default 25MB.
+        A single event larger than this is returned in its own batch.
+
+    Yields
+    ------
+    bytes
+        A JSON-encoded list of events - each event is a dictionary
+        of the row values (converted to strings).
+
+    """
+    max_size = max_size or _MAX_BATCH_SIZE
+    encoder = json.JSONEncoder()
+    columns = list(data.columns)
+    batch: List[str] = []
+    # the size of the encoded batch including the enclosing "[]"
+    batch_size = 2
+    for start in range(0, len(data), _SERIALIZE_ROWS):
+        # converting to object first gives the same string format for
+        # each value (e.g. timestamps) as converting the value on its own
+        str_data = (
+            data.iloc[start : start + _SERIALIZE_ROWS]  # noqa: E203
+            .astype(object)
+            .astype(str)
+        )
+        for row in str_data.itertuples(index=False, name=None):
+            # JSONEncoder escapes non-ASCII characters so the length of
+            # the encoded string is the same as its size in bytes.
+            event = encoder.encode(dict(zip(columns, row)))
+            if batch and batch_size + len(event) + 2 > max_size:
+                yield _join_events(batch)
+                batch, batch_size = [], 2
+            # events after the first are preceded by ", "
+            batch_size += len(event) + (2 if batch else 0)
+            batch.append(event)
+    if batch:
+        yield _join_events(batch)
+
+
+def _join_events(events: List[str]) -> bytes:
+    """Return the JSON encoded list of `events`."""
+    return ("[" + ", ".join(events) + "]").encode("utf-8")
@@ -31,6 +31,7 @@ import hashlib
 import io
 import re
 import tarfile
+from functools import lru_cache
 
 # pylint: disable=unused-import
 from typing import Tuple, Any, Set, Optional, List, Iterable, Dict, Callable, Union
@@ -39,7 +40,7 @@ from collections import namedtuple
 
 import pandas as pd
 
-from ..common.utility import export
+from ..common.utility import export, process_chunks
 from .._version import VERSION
 
 __version__ = VERSION
@@ -90,10 +91,11 @@ BASE64_REGEX_C = re.compile(_BASE64_REGEX, re.I | re.X)
 # Same expresion without group for pandas
 _BASE64_REGEX_NG = "[A-Za-z0-9+/\\n\\r]{30,}={0,2}"
 
-# we use this to store a set of strings that match the B64 regex but
-# that we were unable to decode - so that we don't end up in an
-# infinite loop
-_UNDECODABLE_STRINGS: Set[str] = set()
+# maximum number of decoded base64 candidates to cache
+_DECODE_CACHE_SIZE = 1024
+
+# minimum number of distinct input strings to decode in parallel
+_MIN_PARALLEL_VALUES = 5000
 
 # When True prints see more verbose execution
 # (set from 'trace' parameter to unpack_items)
@@ -143,6 +145,7 @@ def unpack_items(
     column: str = None,
     trace: bool = False,
     utf16: bool = False,
+    n_jobs: int = None,
 ) -> Any:
     """
     Base64 decode an input string or strings taken from a pandas dataframe.
@@ -159,6 +162,10 @@ def unpack_items(
         Show additional status (the default is None)
     utf16 : bool, optional
         Attempt to decode UTF16 byte strings
+    n_jobs : int, optional
+        The number of worker processes to use to decode the strings
+        in a DataFrame, by default None (decode in the current process).
+        Use -1 to use one process per CPU.
 
     Returns
     -------
@@ -213,7 +220,9 @@ def unpack_items(
     if data is not None:
         if not column:
             raise ValueError("column must be supplied if the input is a DataFrame")
-        return unpack_df(data=data, column=column, trace=trace, utf16=utf16)
+        return unpack_df(
+            data=data, column=column, trace=trace, utf16=utf16, n_jobs=n_jobs
+        )
     return None
 
 
@@ -259,7 +268,11 @@ def unpack(
 
 
 def unpack_df(
-    data: pd.DataFrame, column: str, trace: bool = False, utf16: bool = False
+    data: pd.DataFrame,
+    column: str,
+    trace: bool = False,
+    utf16: bool = False,
+    n_jobs: int = None,
 ) -> pd.DataFrame:
     """
     Base64 decode strings taken from a pandas dataframe.
@@ -274,6 +287,11 @@ def unpack_df(
         Show additional status (the default is None)
     utf16 : bool, optional
         Attempt to decode UTF16 byte strings
+    n_jobs : int, optional
+        The number of worker processes to use to decode the strings,
+        by default None (decode in the current process). Use -1 to
+        use one process per CPU. The strings are only decoded in parallel
+        if there are enough distinct strings to make this worthwhile.
 
     Returns
     -------
@@ -289,6 +307,7 @@ def unpack_df(
     will unpack the contents of the archive.
     For any binary it will return the decoded file as a byte array, and as a
     printable list of byte values.
+    Each distinct string in `column` is only decoded once.
 
     The columns of the output DataFrame are:
 
@@ -314,35 +333,100 @@ def unpack_df(
     _GET_TRACE(trace)
     _GET_UTF16(utf16)
 
-    output_df = pd.DataFrame(columns=BinaryRecord._fields)
-    row_results: List[pd.DataFrame] = []
     rows_with_b64_match = data[data[column].str.contains(_BASE64_REGEX_NG)]
-    for input_row in rows_with_b64_match[[column]].itertuples():
-        (decoded_string, output_frame) = _decode_b64_string_recursive(input_row[1])
-        output_frame["src_index"] = input_row.Index
-        output_frame[column] = input_row._asdict()[column]
-        output_frame["full_decoded_string"] = decoded_string
-        row_results.append(output_frame)
-
-    if row_results:
-        output_df = pd.concat(row_results, ignore_index=True)
+    if rows_with_b64_match.empty:
+        return pd.DataFrame(columns=BinaryRecord._fields)
+
+    # decode each distinct string once
+    codes, values = pd.factorize(rows_with_b64_match[column])
+    value_results = _decode_b64_values(list(values), n_jobs)
+
+    records: List[BinaryRecord] = []
+    src_indexes: List[Any] = []
+    src_strings: List[str] = []
+    full_decoded_strings: List[str] = []
+    for src_index, code in zip(rows_with_b64_match.index, codes):
+        decoded_string, value_records = value_results[code]
+        records.extend(value_records)
+        src_indexes.extend([src_index] * len(value_records))
+        src_strings.extend([values[code]] * len(value_records))
+        full_decoded_strings.extend([decoded_string] * len(value_records))
+
+    output_df = pd.DataFrame(records, columns=BinaryRecord._fields)
+    output_df["src_index"] = src_indexes
+    output_df[column] = src_strings
+    output_df["full_decoded_string"] = full_decoded_strings
     return output_df
 
 
-# pylint: disable=too-many-locals
+def _decode_b64_values(
+    values: List[str], n_jobs: Optional[int] = None
+) -> List[Tuple[str, List[BinaryRecord]]]:
+    """
+    Return the decoded string and binary records for each value.
+
+    If `n_jobs` is greater than 1 and there are enough values to make
+    it worthwhile, the values are split into chunks and decoded in
+    parallel.
+
+    """
+    chunk_results = process_chunks(
+        _decode_b64_values_worker,
+        values,
+        _GET_TRACE(),
+        _GET_UTF16(),
+        n_jobs=n_jobs,
+        min_items=_MIN_PARALLEL_VALUES,
+        min_chunk_size=_MIN_PARALLEL_VALUES // 2,
+    )
+    return [result for chunk in chunk_results for result in chunk]
+
+
+def _decode_b64_values_worker(
+    values: List[str], trace: bool, utf16: bool
+) -> List[Tuple[str, List[BinaryRecord]]]:
+    """Decode a chunk of values in a worker process."""
+    _GET_TRACE(trace)
+    _GET_UTF16(utf16)
+    return [_decode_b64_string_records(value) for value in values]
+
+
 def _decode_b64_string_recursive(
     input_string: str,
     max_recursion: int = 20,
     current_depth: int = 1,
     item_prefix: str = "",
 ) -> Tuple[str, pd.DataFrame]:
+    """Recursively decode and unpack an encoded string."""
+    decoded_string, records = _decode_b64_string_records(
+        input_string,
+        max_recursion=max_recursion,
+        current_depth=current_depth,
+        item_prefix=item_prefix,
+    )
+    return decoded_string, pd.DataFrame(records, columns=BinaryRecord._fields)
+
+
+# pylint: disable=too-many-locals
+def _decode_b64_string_records(
+    input_string: str,
+    max_recursion: int = 20,
+    current_depth: int = 1,
+    item_prefix: str = "",
+    undecodable: Set[str] = None,
+) -> Tuple[str, List[BinaryRecord]]:
     """Recursively decode and unpack an encoded string."""
     _debug_print_trace("_decode_b64_string_recursive: ", max_recursion)
     _debug_print_trace("processing input: ", input_string[:200])
 
     decoded_string = input_string
+    # we use this to store a set of strings that match the B64 regex but
+    # that we were unable to decode - so that we don't end up in an
+    # infinite loop
+    if undecodable is None:
+        undecodable = set()
 
-    df_results = pd.DataFrame(columns=BinaryRecord._fields)
+    records: List[BinaryRecord] = []
     fragment_index = 0
     match_pos = 0
     decode_success = False
@@ -361,7 +445,7 @@ def _decode_b64_string_recursive(
         b64_candidate = b64match.groupdict()["b64"]
         _debug_print_trace("regex found: ", b64_candidate)
         # if we already know that this string won't decode, skip
-        if b64_candidate in _UNDECODABLE_STRINGS:
+        if b64_candidate in undecodable:
             match_pos = b64match.end()
             continue
 
@@ -378,15 +462,14 @@ def _decode_b64_string_recursive(
         if decode_success:
             # we did decode something so lets put our result this in the output string
             if binary_items:
-                new_records = _add_to_results(
-                    binary_items,
-                    b64_candidate,
-                    current_depth,
-                    item_prefix,
-                    fragment_index,
-                )
-                df_results = df_results.append(
-                    new_records, ignore_index=True, sort=False
+                records.extend(
+                    _add_to_results(
+                        binary_items,
+                        b64_candidate,
+                        current_depth,
+                        item_prefix,
+                        fragment_index,
+                    )
                 )
             # replace the decoded fragment in our current results string
             # (decode_string)
@@ -400,7 +483,7 @@ def _decode_b64_string_recursive(
             # if the string didn't decode we'll have the same output as input
             # so add that to our set of undecodable strings (we need to track this
             # otherwise we will recurse infinitely)
-            _UNDECODABLE_STRINGS.add(b64_candidate)
+            undecodable.add(b64_candidate)
             _debug_print_trace("new undecodable string")
             match_pos = b64match.end()
 
@@ -410,7 +493,7 @@ def _decode_b64_string_recursive(
     # if we reach our max recursion depth bail out here
     if max_recursion == 0:
         _debug_print_trace("max recursion reached")
-        return decoded_string, df_results
+        return decoded_string, records
 
     if decode_success:
         # stuff that we have already decoded may also contain further
@@ -418,19 +501,17 @@ def _decode_b64_string_recursive(
         prefix = (
             f"{item_prefix}.{fragment_index}." if item_prefix else f"{fragment_index}."
         )
-        next_level_string, child_records = _decode_b64_string_recursive(
+        next_level_string, child_records = _decode_b64_string_records(
             decoded_string,
             item_prefix=prefix,
             max_recursion=max_recursion - 1,
             current_depth=(current_depth + 1),
+            undecodable=undecodable,
         )
-        return (
-            next_level_string,
-            df_results.append(child_records, ignore_index=True, sort=False),
-        )
+        return next_level_string, records + child_records
 
     _debug_print_trace("Nothing left to decode")
-    return decoded_string, df_results
+    return decoded_string, records
 
 
 def _add_to_results(
@@ -439,23 +520,22 @@ def _add_to_results(
     current_depth: int,
     item_prefix: str,
     fragment_index: int,
-) -> List[Dict[str, Any]]:
+) -> List[BinaryRecord]:
     """Add current set of decoding results to collection."""
-    new_rows = []
-    for bin_record in binary_items:
-        new_row = bin_record._asdict()
-        new_row["reference"] = (
-            f"{item_prefix}",
-            f"{current_depth}.",
-            f"{fragment_index}",
+    return [
+        bin_record._replace(
+            reference=(
+                f"{item_prefix}",
+                f"{current_depth}.",
+                f"{fragment_index}",
+            ),
+            original_string=original_str,
+            md5=bin_record.file_hashes["md5"],
+            sha1=bin_record.file_hashes["sha1"],
+            sha256=bin_record.file_hashes["sha256"],
         )
-        new_row["original_string"] = original_str
-        new_row["md5"] = new_row["file_hashes"]["md5"]
-        new_row["sha1"] = new_row["file_hashes"]["sha1"]
-        new_row["sha256"] = new_row["file_hashes"]["sha256"]
-
-        new_rows.append(new_row)
-    return new_rows
+        for bin_record in binary_items
+    ]
 
 
 def _debug_print_trace(*args):
@@ -476,9 +556,10 @@ def _decode_and_format_b64_string(
     # Check if we recognize this as a known file type
     (_, f_type) = _is_known_b64_prefix(b64encoded_string)
     _debug_print_trace("Found type: ", f_type)
-    output_files = _decode_b64_binary(b64encoded_string, f_type)
-    if not output_files:
+    cached_files = _decode_b64_binary_cached(b64encoded_string, f_type, _GET_UTF16())
+    if not cached_files:
         return b64encoded_string, None
+    output_files = dict(cached_files)
 
     if len(output_files) == 1:
         # get the first (only) item
@@ -645,6 +726,25 @@ def _decode_b64_binary(
         return None
 
 
+# pylint: disable=unused-argument
+@lru_cache(maxsize=_DECODE_CACHE_SIZE)
+def _decode_b64_binary_cached(
+    input_string: str, file_type: Optional[str], utf16: bool
+) -> Optional[Tuple[Tuple[str, BinaryRecord], ...]]:
+    """
+    Return the cached result of `_decode_b64_binary`.
+
+    The `utf16` setting is part of the cache key since it
+    changes the decoded results.
+
+    """
+    output_files = _decode_b64_binary(input_string, file_type)
+    return tuple(output_files.items()) if output_files else None
+
+
+# pylint: enable=unused-argument
+
+
 def _unpack_and_hash_b64_binary(
     input_bytes: bytes, file_type: str = None
 ) -> Optional[Dict[str, BinaryRecord]]:
@@ -19,30 +19,38 @@ rate. Maxmind geolite uses a downloadable database, while IPStack is
 an online lookup (API key required).
 
 """
+import ipaddress
 import math
 import os
 import random
 import tarfile
+import threading
 import warnings
 from abc import ABCMeta, abstractmethod
 from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from functools import lru_cache
 from json import JSONDecodeError
 from pathlib import Path
 from time import sleep
-from typing import Any, Dict, List, Mapping, Optional, Tuple
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
 
 import geoip2.database  # type: ignore
+import maxminddb  # type: ignore
+import numpy as np
 import pandas as pd
 import requests
 from geoip2.errors import AddressNotFoundError  # type: ignore
 from IPython import get_ipython
 from IPython.display import HTML, display
+from requests.adapters import HTTPAdapter
 from requests.exceptions import HTTPError
 
 from .._version import VERSION
 from ..common.exceptions import MsticpyUserConfigError
 from ..common.provider_settings import ProviderSettings, get_provider_settings
+from ..common.rate_limiter import RateLimiter
 from ..common.utility import export
 from ..datamodel.entities import GeoLocation, IpAddress
 
@@ -119,8 +127,10 @@ class GeoIpLookup(metaclass=ABCMeta):
             appended (where a location lookup was successful)
 
         """
+        # look up each distinct address once
+        ip_locs = self.lookup_ips(data[[column]].drop_duplicates(), column)
         return data.merge(
-            self.lookup_ips(data, column),
+            ip_locs.drop_duplicates(subset="IpAddress"),
             how="left",
             left_on=column,
             right_on="IpAddress",
@@ -186,6 +196,13 @@ This library uses services provided by ipstack.
 This library uses services provided by ipstack (https://ipstack.com)"""
 
     _IPSTACK_API = "http://api.ipstack.com/{iplist}?access_key={access_key}&output=json"
+    # Maximum number of addresses in a bulk request
+    _BULK_BATCH_SIZE = 50
+    # Default number of concurrent requests and requests/sec rate limit.
+    # These can be overridden by the "MaxConcurrency" and "RateLimit"
+    # settings args.
+    _MAX_CONCURRENCY = 4
+    _RATE_LIMIT: Optional[float] = None
 
     _NO_API_KEY_MSSG = """
 No API Key was found to access the IPStack service.
@@ -200,7 +217,13 @@ Alternatively, you can pass this to the IPStackLookup class when creating it:
 >>> iplookup = IPStackLookup(api_key="your_api_key")
 """
 
-    def __init__(self, api_key: Optional[str] = None, bulk_lookup: bool = False):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        bulk_lookup: bool = False,
+        max_concurrency: Optional[int] = None,
+        rate_limit: Optional[float] = None,
+    ):
         """
         Create a new instance of IPStackLookup.
 
@@ -214,6 +237,12 @@ Alternatively, you can pass this to the IPStackLookup class when creating it:
             submit multiple IPs in a single request.
             (the default is False, which submits a single request
             per address)
+        max_concurrency : int, optional
+            The maximum number of concurrent requests, by default
+            the "MaxConcurrency" setting from msticpyconfig.yaml (or 4).
+        rate_limit : float, optional
+            The maximum number of requests per second, by default
+            the "RateLimit" setting from msticpyconfig.yaml (or no limit).
 
         """
         super().__init__()
@@ -234,6 +263,17 @@ Alternatively, you can pass this to the IPStackLookup class when creating it:
                 title="IPStack API key not found",
             )
         self.bulk_lookup = bulk_lookup
+        self.max_concurrency = int(
+            max_concurrency
+            or self.settings.args.get("MaxConcurrency", self._MAX_CONCURRENCY)
+        )
+        rate_limit = rate_limit or self.settings.args.get("RateLimit", self._RATE_LIMIT)
+        self.rate_limit: Optional[float] = (
+            float(rate_limit) if rate_limit is not None else None
+        )
+        # shared by all requests so that the rate limit applies
+        # across calls to lookup_ip
+        self._rate_limiter = RateLimiter(rate=self.rate_limit)
 
     def lookup_ip(
         self,
@@ -268,11 +308,18 @@ Alternatively, you can pass this to the IPStackLookup class when creating it:
             Service refused request (e.g. requesting batch of addresses
             on free tier API key)
 
+        Notes
+        -----
+        Each distinct address is only looked up once. Addresses are
+        looked up concurrently (up to `max_concurrency` requests at a
+        time). If `bulk_lookup` is True, addresses are submitted in
+        batches of up to 50 addresses per request.
+
         """
         if ip_address and isinstance(ip_address, str):
             ip_list = [ip_address.strip()]
         elif ip_addr_list:
-            ip_list = [ip.strip() for ip in ip_addr_list]
+            ip_list = list(dict.fromkeys(ip.strip() for ip in ip_addr_list))
         elif ip_entity:
             ip_list = [ip_entity.Address]
         else:
@@ -323,10 +370,24 @@ Alternatively, you can pass this to the IPStackLookup class when creating it:
         if not self.bulk_lookup:
             return self._lookup_ip_list(ip_list)
 
+        ip_batches = [
+            ip_list[start : start + self._BULK_BATCH_SIZE]  # noqa: E203
+            for start in range(0, len(ip_list), self._BULK_BATCH_SIZE)
+        ]
+        return [
+            result
+            for batch_results in self._map_requests(self._lookup_ip_batch, ip_batches)
+            for result in batch_results
+        ]
+
+    def _lookup_ip_batch(
+        self, session: requests.Session, ip_list: List[str]
+    ) -> List[Tuple[Dict[str, str], int]]:
+        """Lookup a batch of IP Addresses in a single request."""
         submit_url = self._IPSTACK_API.format(
             iplist=",".join(ip_list), access_key=self._api_key
         )
-        response = requests.get(submit_url)
+        response = session.get(submit_url)
 
         if response.status_code == 200:
             results = response.json()
@@ -340,6 +401,9 @@ Alternatively, you can pass this to the IPStackLookup class when creating it:
                         results["error"]
                     )
                 )
+            if isinstance(results, dict):
+                # a single address returns a single result
+                results = [results]
             return [(item, response.status_code) for item in results]
 
         if response:
@@ -351,28 +415,71 @@ Alternatively, you can pass this to the IPStackLookup class when creating it:
 
     def _lookup_ip_list(self, ip_list: List[str]):
         """Lookup IP Addresses one-by-one."""
-        ip_loc_results = []
+        return self._map_requests(self._lookup_single_ip, ip_list)
+
+    def _lookup_single_ip(
+        self, session: requests.Session, ip_addr: str
+    ) -> Tuple[Optional[Dict[str, str]], int]:
+        """Lookup a single IP Address."""
+        submit_url = self._IPSTACK_API.format(iplist=ip_addr, access_key=self._api_key)
+        response = session.get(submit_url)
+        if response.status_code == 200:
+            return response.json(), response.status_code
+        if response:
+            try:
+                return response.json(), response.status_code
+            except JSONDecodeError:
+                return None, response.status_code
+        print("Unknown response from IPStack request.")
+        return None, -1
+
+    def _map_requests(
+        self, request_func: Callable[[requests.Session, Any], Any], items: List[Any]
+    ) -> List[Any]:
+        """
+        Run `request_func` for each item, returning the results in order.
+
+        Parameters
+        ----------
+        request_func : Callable[[requests.Session, Any], Any]
+            Function that takes a requests session and an item
+            and returns the result for that item.
+        items : List[Any]
+            The items to submit.
+
+        Returns
+        -------
+        List[Any]
+            The results of `request_func` for each item.
+
+        Notes
+        -----
+        The requests share a single session (and its connection pool).
+        If `max_concurrency` is greater than 1, the requests are run
+        using a thread pool. All requests are limited to `rate_limit`
+        requests per second.
+
+        """
+        max_concurrency = min(self.max_concurrency, len(items))
         with requests.Session() as session:
-            for ip_addr in ip_list:
-                submit_url = self._IPSTACK_API.format(
-                    iplist=ip_addr, access_key=self._api_key
-                )
-                response = session.get(submit_url)
-                if response.status_code == 200:
-                    ip_loc_results.append((response.json(), response.status_code))
-                else:
-                    if response:
-                        try:
-                            ip_loc_results.append(
-                                (response.json(), response.status_code)
-                            )
-                            continue
-                        except JSONDecodeError:
-                            ip_loc_results.append((None, response.status_code))
-                    else:
-                        print("Unknown response from IPStack request.")
-                        ip_loc_results.append((None, -1))
-        return ip_loc_results
+
+            def _request_item(item):
+                self._rate_limiter.acquire()
+                return request_func(session, item)
+
+            if max_concurrency < 2:
+                return [_request_item(item) for item in items]
+            adapter = HTTPAdapter(
+                pool_connections=max_concurrency, pool_maxsize=max_concurrency
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            with ThreadPoolExecutor(
+                max_workers=max_concurrency,
+                thread_name_prefix=f"{self.__class__.__name__}_lookup",
+            ) as executor:
+                # executor.map returns results in input order
+                return list(executor.map(_request_item, items))
 
 
 @export
@@ -423,6 +530,7 @@ Alternatively, you can pass this to the GeoLiteLookup class when creating it:
         db_folder: Optional[str] = None,
         force_update: bool = False,
         auto_update: bool = True,
+        db_mode: Optional[str] = None,
     ):
         r"""
         Return new instance of GeoLiteLookup class.
@@ -448,11 +556,33 @@ Alternatively, you can pass this to the GeoLiteLookup class when creating it:
         auto_update: bool, optional
             Auto update can be set to true or false. depending on it,
             new download request will be initiated if age criteria is matched.
+        db_mode: str, optional
+            The mode used to open the MMDB file. One of:
+
+            - "auto" - use the C extension reader if it is available,
+              otherwise memory-map the file (the default)
+            - "mmap" - memory-map the file, using the C extension
+              reader if it is available
+            - "mmap_ext" - memory-map the file with the C extension reader
+            - "file" - read the file using standard file operations
+            - "memory" - load the whole file into memory
+
+            The database is opened once per process (or shared with the
+            parent process, if forked) for each file and mode and is shared
+            by all GeoLiteLookup instances.
+            Use the memory-mapped modes to share the memory used by the
+            database between processes.
 
         """
         super().__init__()
 
         self.settings = _get_geoip_provider_settings("GeoIPLite")
+        self._db_mode = db_mode or self.settings.args.get("DBMode", "auto")
+        if self._db_mode not in _DB_MODES:
+            raise ValueError(
+                f"Unknown db_mode '{self._db_mode}'. "
+                + f"Valid modes are: {', '.join(_DB_MODES)}."
+            )
         self._api_key = api_key or self.settings.args.get("AuthKey")
         self._dbfolder = db_folder
         if self._dbfolder is None:
@@ -487,13 +617,23 @@ Alternatively, you can pass this to the GeoLiteLookup class when creating it:
                 service_uri="https://www.maxmind.com/en/geolite2/signup",
                 title="Maxmind GeoIP database not found",
             )
-        self._reader = geoip2.database.Reader(self._dbpath)
+        self._reader_key, self._reader = _open_shared_reader(
+            self._dbpath, self._db_mode
+        )
 
     def close(self):
-        """Close an open GeoIP DB."""
+        """
+        Close an open GeoIP DB.
+
+        The database reader is shared with other GeoLiteLookup instances
+        and is only closed when all of the instances using it are closed.
+
+        """
         if self._reader:
+            reader_key, self._reader_key = self._reader_key, None
+            self._reader = None
             try:
-                self._reader.close()
+                _release_shared_reader(reader_key)
             except Exception as err:  # pylint: disable=broad-except
                 print(f"Exception when trying to close GeoIP DB {err}")
 
@@ -740,11 +880,9 @@ Alternatively, you can pass this to the GeoLiteLookup class when creating it:
         output_entities = []
         ip_cache: Dict[str, Any] = {}
         for ip_input in ip_list:
-            geo_match = None
-            try:
-                geo_match = ip_cache.get(ip_input, self._reader.city(ip_input).raw)
-            except (AddressNotFoundError, AttributeError, ValueError):
-                continue
+            if ip_input not in ip_cache:
+                ip_cache[ip_input] = self._get_geo_match(ip_input)
+            geo_match = ip_cache[ip_input]
             if geo_match:
                 output_raw.append(geo_match)
                 output_entities.append(
@@ -753,6 +891,92 @@ Alternatively, you can pass this to the GeoLiteLookup class when creating it:
 
         return output_raw, output_entities
 
+    def lookup_ips(self, data: pd.DataFrame, column: str) -> pd.DataFrame:
+        """
+        Lookup Geolocation data from a pandas Dataframe.
+
+        Parameters
+        ----------
+        data : pd.DataFrame
+            pandas dataframe containing IpAddress column
+        column : str
+            the name of the dataframe column to use as a source
+
+        Returns
+        -------
+        pd.DataFrame
+            IpLookup results as DataFrame.
+
+        Notes
+        -----
+        Each distinct address is looked up once. Private, reserved and
+        other non-routable addresses are not looked up. The results
+        are built directly from the GeoLite2 data without creating
+        IpAddress or GeoLocation entities.
+
+        """
+        codes, unique_ips = pd.factorize(data[column])
+        geo_matches = [
+            self._get_geo_match(ip.strip()) if isinstance(ip, str) else None
+            for ip in unique_ips
+        ]
+        found = [idx for idx, geo_match in enumerate(geo_matches) if geo_match]
+        geo_rows = [_get_geo_fields(geo_matches[idx]) for idx in found]
+
+        # build the results with the same columns as the
+        # GeoLocation entity properties (plus the IpAddress)
+        unique_locs = pd.DataFrame(
+            geo_rows, columns=list(_GEO_FIELDS), index=None
+        ).reindex(columns=list(_geo_properties()))
+        for prop, default in _geo_properties().items():
+            if prop not in _GEO_FIELDS:
+                unique_locs[prop] = _default_values(default, len(found))
+        unique_locs["IpAddress"] = [unique_ips[idx].strip() for idx in found]
+
+        # expand the results to one row for each input row
+        loc_idx = np.full(len(unique_ips), -1)
+        loc_idx[found] = np.arange(len(found))
+        row_locs = loc_idx[codes[codes >= 0]]
+        row_locs = row_locs[row_locs >= 0]
+        if len(row_locs) == len(found):
+            return unique_locs
+        ip_locs = unique_locs.iloc[row_locs].reset_index(drop=True)
+        for prop, default in _geo_properties().items():
+            if prop not in _GEO_FIELDS:
+                ip_locs[prop] = _default_values(default, len(ip_locs))
+        return ip_locs
+
+    def _get_geo_match(self, ip_address: str) -> Optional[Dict[str, Any]]:
+        """Return the GeoLite2 data for an address or None if not found."""
+        try:
+            ip_addr = ipaddress.ip_address(ip_address)
+        except ValueError:
+            return None
+        if isinstance(ip_addr, ipaddress.IPv6Address):
+            # look up the IPv4 address embedded in IPv4-mapped,
+            # Teredo (client address) and 6to4 addresses
+            embedded_ip = (
+                ip_addr.ipv4_mapped
+                or (ip_addr.teredo and ip_addr.teredo[1])
+                or ip_addr.sixtofour
+            )
+            if embedded_ip:
+                ip_addr = embedded_ip
+        if (
+            ip_addr.is_private
+            or ip_addr.is_reserved
+            or ip_addr.is_loopback
+            or ip_addr.is_link_local
+            or ip_addr.is_multicast
+            or ip_addr.is_unspecified
+        ):
+            # non-routable addresses are not in the database
+            return None
+        try:
+            return self._reader.city(str(ip_addr)).raw
+        except (AddressNotFoundError, AttributeError, ValueError):
+            return None
+
     @staticmethod
     def _create_ip_entity(
         ip_address: str, geo_match: Mapping[str, Any], ip_entity: IpAddress = None
@@ -761,20 +985,131 @@ Alternatively, you can pass this to the GeoLiteLookup class when creating it:
             ip_entity = IpAddress()
             ip_entity.Address = ip_address
         geo_entity = GeoLocation()
-        geo_entity.CountryCode = geo_match.get("country", {}).get("iso_code", None)
-        geo_entity.CountryName = (
-            geo_match.get("country", {}).get("names", {}).get("en", None)
-        )
-        subdivs = geo_match.get("subdivisions", [])
-        if subdivs:
-            geo_entity.State = subdivs[0].get("names", {}).get("en", None)
-        geo_entity.City = geo_match.get("city", {}).get("names", {}).get("en", None)
-        geo_entity.Longitude = geo_match.get("location", {}).get("longitude", None)
-        geo_entity.Latitude = geo_match.get("location", {}).get("latitude", None)
+        for field, value in zip(_GEO_FIELDS, _get_geo_fields(geo_match)):
+            setattr(geo_entity, field, value)
         ip_entity.Location = geo_entity
         return ip_entity
 
 
+# GeoLocation properties set from the GeoLite2 data
+_GEO_FIELDS = ("CountryCode", "CountryName", "State", "City", "Longitude", "Latitude")
+
+
+@lru_cache(maxsize=1)
+def _geo_properties() -> Dict[str, Any]:
+    """Return the default values of the GeoLocation entity properties."""
+    return GeoLocation().properties
+
+
+def _default_values(default: Any, rows: int) -> List[Any]:
+    """Return a list of default values - mutable values are not shared."""
+    if isinstance(default, (set, dict, list)):
+        return [default.copy() for _ in range(rows)]
+    return [default] * rows
+
+
+def _get_geo_fields(geo_match: Mapping[str, Any]) -> Tuple[Any, ...]:
+    """Return the values of `_GEO_FIELDS` from GeoLite2 data."""
+    country = geo_match.get("country", {})
+    subdivs = geo_match.get("subdivisions", [])
+    location = geo_match.get("location", {})
+    return (
+        country.get("iso_code", None),
+        country.get("names", {}).get("en", None),
+        subdivs[0].get("names", {}).get("en", None) if subdivs else None,
+        geo_match.get("city", {}).get("names", {}).get("en", None),
+        location.get("longitude", None),
+        location.get("latitude", None),
+    )
+
+
+# GeoLiteLookup db_mode values and the corresponding MMDB open modes
+_DB_MODES = {
+    "auto": maxminddb.MODE_AUTO,
+    "mmap": maxminddb.MODE_MMAP_EXT,
+    "mmap_ext": maxminddb.MODE_MMAP_EXT,
+    "file": maxminddb.MODE_FILE,
+    "memory": maxminddb.MODE_MEMORY,
+}
+
+# Open GeoLite2 database readers - each entry is [reader, reference count]
+_SHARED_READERS: Dict[Tuple[Any, ...], List[Any]] = {}
+_SHARED_READERS_LOCK = threading.Lock()
+
+
+def _open_shared_reader(
+    db_path: str, db_mode: str = "auto"
+) -> Tuple[Tuple[Any, ...], geoip2.database.Reader]:
+    """
+    Return a shared reader for a GeoLite2 database.
+
+    Parameters
+    ----------
+    db_path : str
+        Path to the MMDB file.
+    db_mode : str, optional
+        The mode used to open the file, by default "auto".
+
+    Returns
+    -------
+    Tuple[Tuple[Any, ...], geoip2.database.Reader]
+        The registry key of the reader (used to release it)
+        and the reader.
+
+    Notes
+    -----
+    Readers are shared for the same file (path, size and
+    modification time) and mode, so a new reader is opened
+    if the database file is updated. Readers in "file" mode
+    are not shared with forked processes, since the processes
+    would share the file position.
+
+    """
+    db_stat = os.stat(db_path)
+    reader_key: Tuple[Any, ...] = (
+        os.path.realpath(db_path),
+        db_stat.st_size,
+        db_stat.st_mtime_ns,
+        db_mode,
+    )
+    if db_mode == "file":
+        reader_key += (os.getpid(),)
+    with _SHARED_READERS_LOCK:
+        if reader_key not in _SHARED_READERS:
+            try:
+                reader = geoip2.database.Reader(db_path, mode=_DB_MODES[db_mode])
+            except ValueError:
+                if db_mode != "mmap":
+                    raise
+                # the C extension is not available
+                reader = geoip2.database.Reader(db_path, mode=maxminddb.MODE_MMAP)
+            _SHARED_READERS[reader_key] = [reader, 0]
+        _SHARED_READERS[reader_key][1] += 1
+        return reader_key, _SHARED_READERS[reader_key][0]
+
+
+def _release_shared_reader(reader_key: Tuple[Any, ...]):
+    """Release a shared reader, closing it if it is no longer used."""
+    with _SHARED_READERS_LOCK:
+        reader_entry = _SHARED_READERS.get(reader_key)
+        if reader_entry is None:
+            return
+        reader_entry[1] -= 1
+        if reader_entry[1] <= 0:
+            del _SHARED_READERS[reader_key]
+            reader_entry[0].close()
+
+
+def _reset_shared_readers_lock():
+    """Create a new lock in a forked child process."""
+    global _SHARED_READERS_LOCK  # pylint: disable=global-statement
+    _SHARED_READERS_LOCK = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_shared_readers_lock)
+
+
 def _get_geoip_provider_settings(provider_name: str) -> ProviderSettings:
     """
     Return settings for a provider.
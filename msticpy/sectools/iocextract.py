@@ -7,8 +7,9 @@
 Module for IoCExtract class.
 
 Uses a set of builtin regular expressions to look for Indicator of
-Compromise (IoC) patterns. Input can be a single string or a pandas
-dataframe with one or more columns specified as input.
+Compromise (IoC) patterns. Input can be a single string, a pandas
+dataframe with one or more columns specified as input or a stream
+of lines or records (a file or iterator).
 
 The following types are built-in:
 
@@ -23,16 +24,33 @@ The following types are built-in:
 
 """
 
+import io
+import os
 import re
 from collections import defaultdict, namedtuple
+from concurrent.futures import Executor
 from enum import Enum
-from typing import Any, Dict, List, Set, Tuple, Union
+from typing import (
+    IO,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
 from urllib.parse import unquote
 
+import numpy as np
 import pandas as pd
 
 from .._version import VERSION
-from ..common.utility import check_kwargs, export
+from ..common.utility import check_kwargs, export, process_chunks
 from .domain_utils import DomainValidator
 
 __version__ = VERSION
@@ -45,8 +63,110 @@ def _compile_regex(regex):
 
 IoCPattern = namedtuple("IoCPattern", ["ioc_type", "comp_regex", "priority", "group"])
 
+# Prefilters are cheap, necessary conditions for a match by each of the
+# built-in patterns. A pattern is only run against an input string if its
+# prefilter returns True, so most strings are only scanned by the
+# small number of patterns that could possibly match.
+_IPV4_PREFILTER_RGX = re.compile(r"\d\.\d")
+_DNS_PREFILTER_RGX = re.compile(r"\.[a-z]", re.I)
+_HASH_PREFILTER_RGX = re.compile(r"[A-Fa-f0-9]{32}", re.I)
+
+
+def _ipv4_prefilter(src: str) -> bool:
+    return "." in src and _IPV4_PREFILTER_RGX.search(src) is not None
+
+
+def _ipv6_prefilter(src: str) -> bool:
+    return src.count(":") >= 2
+
+
+def _dns_prefilter(src: str) -> bool:
+    return "." in src and _DNS_PREFILTER_RGX.search(src) is not None
+
+
+def _url_prefilter(src: str) -> bool:
+    return "://" in src
+
+
+def _winpath_prefilter(src: str) -> bool:
+    return "\\" in src
+
+
+def _lxpath_prefilter(src: str) -> bool:
+    return "/" in src
+
+
+def _hash_prefilter(src: str) -> bool:
+    return _HASH_PREFILTER_RGX.search(src) is not None
+
+
 _RESULT_COLS = ["IoCType", "Observable", "SourceIndex", "Input"]
 
+StreamSource = Union[str, os.PathLike, IO, Iterable[Union[str, bytes, Mapping]]]
+
+
+def _read_segments(text_io: IO[str], max_length: int) -> Iterator[Tuple[str, bool]]:
+    """
+    Read lines from `text_io` in segments of at most ~`max_length` chars.
+
+    Yields tuples of (segment, end_of_line). Lines longer than
+    `max_length` are broken at the last whitespace character in the
+    segment and the remainder is carried over into the next segment,
+    so that observables are not split across segment boundaries.
+
+    """
+    carry = ""
+    while True:
+        segment = text_io.readline(max_length)
+        if not segment:
+            if carry:
+                yield carry, True
+            return
+        text = carry + segment
+        carry = ""
+        if text.endswith("\n"):
+            yield text.rstrip("\r\n"), True
+            continue
+        if len(segment) < max_length:
+            # last line with no line terminator
+            yield text, True
+            continue
+        split_pos = max(text.rfind(" "), text.rfind("\t"))
+        if split_pos <= 0 or len(text) - split_pos > max_length:
+            # no break point - scan the whole segment
+            yield text, False
+        else:
+            yield text[:split_pos], False
+            carry = text[split_pos + 1 :]  # noqa: E203
+
+
+def _iter_stream_records(
+    source: StreamSource, max_length: int
+) -> Iterator[Tuple[int, Any]]:
+    """Yield (record index, record) from a file, file-like or iterable."""
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "r", encoding="utf-8", errors="replace") as file_io:
+            yield from _iter_stream_records(file_io, max_length)
+        return
+    if hasattr(source, "readline"):
+        text_io = source
+        if isinstance(source.read(0), bytes):  # type: ignore
+            text_io = io.TextIOWrapper(source, encoding="utf-8", errors="replace")  # type: ignore
+        line_no = 0
+        for segment, end_of_line in _read_segments(text_io, max_length):  # type: ignore
+            yield line_no, segment
+            if end_of_line:
+                line_no += 1
+        return
+    for rec_idx, record in enumerate(source):  # type: ignore
+        if isinstance(record, bytes):
+            record = record.decode("utf-8", errors="replace")
+        if isinstance(record, str) and len(record) > max_length:
+            for segment, _ in _read_segments(io.StringIO(record), max_length):
+                yield rec_idx, segment
+        else:
+            yield rec_idx, record
+
 
 @export
 class IoCType(Enum):
@@ -147,9 +267,38 @@ class IoCExtract:
     SHA256_REGEX = r"(?:^|[^A-Fa-f0-9])(?P<hash>[A-Fa-f0-9]{64})(?:$|[^A-Fa-f0-9])"
 
     _content_regex: Dict[str, IoCPattern] = {}
+    _prefilters: Dict[str, Callable[[str], bool]] = {}
+
+    _BUILTIN_PREFILTERS: Dict[Tuple[str, str], Callable[[str], bool]] = {
+        ("ipv4", IPV4_REGEX): _ipv4_prefilter,
+        ("ipv6", IPV6_REGEX): _ipv6_prefilter,
+        ("dns", DNS_REGEX): _dns_prefilter,
+        ("url", URL_REGEX): _url_prefilter,
+        ("windows_path", WINPATH_REGEX): _winpath_prefilter,
+        ("linux_path", LXPATH_REGEX): _lxpath_prefilter,
+        ("md5_hash", MD5_REGEX): _hash_prefilter,
+        ("sha1_hash", SHA1_REGEX): _hash_prefilter,
+        ("sha256_hash", SHA256_REGEX): _hash_prefilter,
+    }
+
+    # Minimum number of distinct values to scan before using
+    # multiple processes (for smaller data the overhead of starting
+    # worker processes outweighs any benefit).
+    _MIN_PARALLEL_VALUES = 20000
+
+    def __init__(self, use_prefilter: bool = True):
+        """
+        Initialize new instance of IoCExtract.
 
-    def __init__(self):
-        """Initialize new instance of IoCExtract."""
+        Parameters
+        ----------
+        use_prefilter : bool, optional
+            If True (the default), skip patterns that cannot match an
+            input string using a cheap prefilter test before running
+            the full regular expression. This does not change the results.
+
+        """
+        self.use_prefilter = use_prefilter
         # IP Addresses
         self.add_ioc_type(IoCType.ipv4.name, self.IPV4_REGEX, 0, "ipaddress")
         self.add_ioc_type(IoCType.ipv6.name, self.IPV6_REGEX, 0)
@@ -218,6 +367,12 @@ class IoCExtract:
             priority=priority,
             group=group,
         )
+        # prefilters are only valid for the unmodified built-in patterns
+        prefilter = self._BUILTIN_PREFILTERS.get((ioc_type, ioc_regex))
+        if prefilter:
+            self._prefilters[ioc_type] = prefilter
+        else:
+            self._prefilters.pop(ioc_type, None)
 
     @property
     def ioc_types(self) -> dict:
@@ -322,35 +477,137 @@ class IoCExtract:
                 )
             )
 
-        result_rows: List[pd.Series] = []
-        for idx, datarow in data.iterrows():
-            result_rows.extend(
-                self._search_in_row(datarow, idx, columns, ioc_types_to_use)
-            )
+        result_df = self._scan_df(data, columns, ioc_types_to_use)
         self._ignore_tld = ignore_tld_current
-        return pd.DataFrame(data=result_rows, columns=_RESULT_COLS)
+        return result_df
 
-    # pylint: disable=too-many-arguments
-    def _search_in_row(
+    # pylint: disable=too-many-locals
+    def _scan_df(
         self,
-        datarow: pd.Series,
-        idx: Any,
+        data: pd.DataFrame,
         columns: List[str],
         ioc_types_to_use: List[str],
-    ) -> List[pd.Series]:
-        """Return results for a single input row."""
-        result_rows = []
+        n_jobs: Optional[int] = None,
+        executor: Optional[Executor] = None,
+    ) -> pd.DataFrame:
+        """
+        Return IoCs found in the `columns` of `data`.
+
+        Each distinct value in the columns is only scanned once. The
+        matches are then expanded back to the rows containing the value.
+        Results are ordered by input row then by column.
+
+        """
+        col_codes: List[np.ndarray] = []
+        col_values: List[Any] = []
         for col in columns:
-            ioc_results = self._scan_for_iocs(datarow[col], ioc_types_to_use)
-            for result_type, result_set in ioc_results.items():
-                if result_set:
-                    for observable in result_set:
-                        result_row = pd.Series(
-                            data=[result_type, observable, idx, datarow[col]],
-                            index=_RESULT_COLS,
-                        )
-                        result_rows.append(result_row)
-        return result_rows
+            codes, uniques = pd.factorize(data[col])
+            # offset codes to index into the combined list of column values
+            col_codes.append(np.where(codes >= 0, codes + len(col_values), -1))
+            col_values.extend(uniques)
+        value_codes, values = pd.factorize(pd.Series(col_values, dtype=object))
+        value_results = self._scan_values(
+            list(values), ioc_types_to_use, n_jobs, executor
+        )
+        # code -1 (null values) indexes the trailing empty result
+        value_results.append([])
+        has_results = np.array([bool(res) for res in value_results])
+        value_codes = np.append(value_codes, -1)
+
+        ioc_types: List[str] = []
+        observables: List[str] = []
+        row_pos: List[int] = []
+        col_pos: List[int] = []
+        inputs: List[Any] = []
+        for col_idx, codes in enumerate(col_codes):
+            row_codes = value_codes[codes]
+            for pos in np.flatnonzero(has_results[row_codes]):
+                src = values[row_codes[pos]]
+                for ioc_type, observable in value_results[row_codes[pos]]:
+                    ioc_types.append(ioc_type)
+                    observables.append(observable)
+                    row_pos.append(pos)
+                    col_pos.append(col_idx)
+                    inputs.append(src)
+
+        # stable sort to restore row order (then column order) of the input
+        sort_order = np.lexsort(
+            (np.array(col_pos, dtype=int), np.array(row_pos, dtype=int))
+        )
+        return pd.DataFrame(
+            {
+                "IoCType": np.array(ioc_types, dtype=object)[sort_order],
+                "Observable": np.array(observables, dtype=object)[sort_order],
+                "SourceIndex": data.index[np.array(row_pos, dtype=int)[sort_order]],
+                "Input": np.array(inputs, dtype=object)[sort_order],
+            },
+            columns=_RESULT_COLS,
+        )
+
+    def _scan_values(
+        self,
+        values: List[Any],
+        ioc_types_to_use: List[str],
+        n_jobs: Optional[int] = None,
+        executor: Optional[Executor] = None,
+    ) -> List[List[Tuple[str, str]]]:
+        """
+        Return a list of (IoCType, Observable) matches for each value.
+
+        If `executor` is supplied or `n_jobs` is greater than 1 and
+        there are enough values to make it worthwhile, the values are
+        split into chunks and scanned in parallel.
+
+        """
+        # Send the pattern definitions to the workers so that
+        # types added with add_ioc_type are used in the worker processes.
+        chunk_results = process_chunks(
+            _scan_values_worker,
+            values,
+            self._get_pattern_state(),
+            ioc_types_to_use,
+            n_jobs=n_jobs,
+            min_items=self._MIN_PARALLEL_VALUES,
+            min_chunk_size=self._MIN_PARALLEL_VALUES // 2,
+            executor=executor,
+        )
+        return [result for chunk in chunk_results for result in chunk]
+
+    def _scan_value_list(
+        self, values: List[Any], ioc_types_to_use: List[str]
+    ) -> List[List[Tuple[str, str]]]:
+        """Return a list of (IoCType, Observable) matches for each value."""
+        return [
+            [
+                (ioc_type, observable)
+                for ioc_type, result_set in self._scan_for_iocs(
+                    src if isinstance(src, str) else str(src), ioc_types_to_use
+                ).items()
+                for observable in result_set
+            ]
+            for src in values
+        ]
+
+    def _get_pattern_state(self) -> Dict[str, Any]:
+        """Return the picklable pattern state used by worker processes."""
+        return {
+            "content_regex": dict(self._content_regex),
+            "prefilters": dict(self._prefilters),
+            "use_prefilter": self.use_prefilter,
+            "ignore_tld": self._ignore_tld,
+        }
+
+    @classmethod
+    def _from_pattern_state(cls, pattern_state: Dict[str, Any]) -> "IoCExtract":
+        """Create an IoCExtract instance from `pattern_state`."""
+        extractor = cls.__new__(cls)
+        # instance attributes hide the shared class pattern dictionaries
+        extractor._content_regex = pattern_state["content_regex"]
+        extractor._prefilters = pattern_state["prefilters"]
+        extractor.use_prefilter = pattern_state["use_prefilter"]
+        extractor._ignore_tld = pattern_state["ignore_tld"]
+        extractor._dom_validator = DomainValidator()
+        return extractor
 
     def extract_df(
         self, data: pd.DataFrame, columns: Union[str, List[str]], **kwargs
@@ -380,6 +637,16 @@ class IoCExtract:
             If True, ignore the official Top Level Domains
             list when determining whether a domain name is
             a legal domain.
+        n_jobs : int, optional
+            The number of worker processes to use to scan the data,
+            by default None (scan in the current process). Use -1 to
+            use one process per CPU. The data is only scanned in parallel
+            if it has enough distinct values to make this worthwhile.
+        executor : concurrent.futures.Executor, optional
+            An existing executor (e.g. a ProcessPoolExecutor) to use
+            to scan the data in parallel. The data is split into
+            `n_jobs` chunks (or one chunk per CPU if `n_jobs` is
+            not specified).
 
         Returns
         -------
@@ -396,6 +663,9 @@ class IoCExtract:
         - SourceIndex: the index of the row in the input DataFrame from
         which the source for the IoC observable was extracted.
 
+        Each distinct value in a column is only scanned once and the
+        results are expanded to all of the rows containing that value.
+
         IoCType Pattern selection
         The default list is:  ['ipv4', 'ipv6', 'dns', 'url',
         'md5_hash', 'sha1_hash', 'sha256_hash'] plus any
@@ -404,7 +674,10 @@ class IoCExtract:
         is True or explicitly included in `ioc_paths`.
 
         """
-        check_kwargs(kwargs, ["ioc_types", "include_paths", "ignore_tlds"])
+        check_kwargs(
+            kwargs,
+            ["ioc_types", "include_paths", "ignore_tlds", "n_jobs", "executor"],
+        )
         ioc_types = kwargs.get("ioc_types", None)
         include_paths = kwargs.get("include_paths", False)
         ignore_tld_current = self._ignore_tld
@@ -422,13 +695,133 @@ class IoCExtract:
                 )
             )
 
-        result_rows = []
-        for idx, datarow in data.iterrows():
-            result_rows.extend(
-                self._search_in_row(datarow, idx, columns, ioc_types_to_use)
-            )
+        result_df = self._scan_df(
+            data,
+            columns,
+            ioc_types_to_use,
+            n_jobs=kwargs.get("n_jobs"),
+            executor=kwargs.get("executor"),
+        )
         self._ignore_tld = ignore_tld_current
-        return pd.DataFrame(data=result_rows, columns=_RESULT_COLS)
+        return result_df
+
+    # pylint: disable=too-many-locals
+    def extract_stream(
+        self,
+        source: StreamSource,
+        columns: Union[str, List[str], None] = None,
+        batch_size: int = 10000,
+        summary: Optional["IoCStreamSummary"] = None,
+        **kwargs,
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Extract IoCs incrementally from a file, file-like object or iterator.
+
+        Parameters
+        ----------
+        source : Union[str, os.PathLike, IO, Iterable]
+            The path of a text file, a file-like object (text or binary)
+            or an iterable of lines (str or bytes) or records (dicts).
+        columns : Union[str, List[str], None], optional
+            The record keys to scan if `source` yields dictionaries,
+            by default None (all keys).
+        batch_size : int, optional
+            The number of lines or records to scan in each batch,
+            by default 10000. The memory used is proportional to this.
+        summary : Optional[IoCStreamSummary], optional
+            If supplied, the summary is updated with the results of
+            each batch before the batch is returned.
+
+        Other Parameters
+        ----------------
+        ioc_types : list, optional
+            Restrict matching to just specified types.
+            (default is all types)
+        include_paths : bool, optional
+            Whether to include path matches (which can be noisy)
+            (the default is false - excludes 'windows_path'
+            and 'linux_path'). If `ioc_types` is specified
+            this parameter is ignored.
+        ignore_tlds : bool, optional
+            If True, ignore the official Top Level Domains
+            list when determining whether a domain name is
+            a legal domain.
+        max_line_length : int, optional
+            Lines longer than this (default 1,000,000 characters) are
+            scanned in segments, broken at whitespace.
+        n_jobs : int, optional
+            The number of worker processes to use to scan each batch.
+        executor : concurrent.futures.Executor, optional
+            An existing executor to use to scan each batch.
+
+        Yields
+        ------
+        pd.DataFrame
+            DataFrame of the observables found in each batch with the
+            same columns as `extract_df`. SourceIndex is the (zero-based)
+            line number or record number of the source.
+
+        Notes
+        -----
+        Lines longer than `max_line_length` are split at whitespace,
+        so observables that do not contain whitespace are never split
+        across segments. Results for all segments of a line have the
+        same SourceIndex.
+
+        """
+        check_kwargs(
+            kwargs,
+            [
+                "ioc_types",
+                "include_paths",
+                "ignore_tlds",
+                "max_line_length",
+                "n_jobs",
+                "executor",
+            ],
+        )
+        ioc_types_to_use = self._get_ioc_types_to_use(
+            kwargs.get("ioc_types"), kwargs.get("include_paths", False)
+        )
+        if isinstance(columns, str):
+            columns = [columns]
+        max_length = kwargs.get("max_line_length", 1_000_000)
+
+        batch: List[Any] = []
+        batch_index: List[int] = []
+        records = _iter_stream_records(source, max_length)
+        while True:
+            for rec_idx, record in records:
+                batch.append(record)
+                batch_index.append(rec_idx)
+                if len(batch) >= batch_size:
+                    break
+            if not batch:
+                return
+            if isinstance(batch[0], Mapping):
+                batch_df = pd.DataFrame.from_records(
+                    batch, columns=columns, index=batch_index
+                )
+            else:
+                batch_df = pd.DataFrame({"Input": batch}, index=batch_index)
+            batch.clear()
+            batch_index.clear()
+
+            ignore_tld_current = self._ignore_tld
+            self._ignore_tld = kwargs.get("ignore_tlds", False)
+            try:
+                result_df = self._scan_df(
+                    batch_df,
+                    list(batch_df.columns),
+                    ioc_types_to_use,
+                    n_jobs=kwargs.get("n_jobs"),
+                    executor=kwargs.get("executor"),
+                )
+            finally:
+                self._ignore_tld = ignore_tld_current
+            if summary is not None:
+                summary.update(result_df)
+            yield result_df
 
     def _get_ioc_types_to_use(
         self, ioc_types: List[str], include_paths: bool
@@ -559,11 +952,15 @@ class IoCExtract:
         """Return IoCs found in the string."""
         ioc_results: Dict[str, Set] = defaultdict(set)
         iocs_found: Dict[str, Tuple[str, int]] = {}
+        # prefilter results for this string (shared prefilters run once)
+        prefilter_results: Dict[Callable[[str], bool], bool] = {}
 
         # pylint: disable=too-many-nested-blocks
         for (ioc_type, rgx_def) in self._content_regex.items():
             if ioc_types and ioc_type not in ioc_types:
                 continue
+            if not self._prefilter_match(src, ioc_type, prefilter_results):
+                continue
 
             match_pos = 0
             for rgx_match in rgx_def.comp_regex.finditer(src, match_pos):
@@ -589,6 +986,22 @@ class IoCExtract:
 
         return ioc_results
 
+    def _prefilter_match(
+        self,
+        src: str,
+        ioc_type: str,
+        prefilter_results: Dict[Callable[[str], bool], bool],
+    ) -> bool:
+        """Return False if the `ioc_type` pattern cannot match `src`."""
+        prefilter: Optional[Callable[[str], bool]] = (
+            self._prefilters.get(ioc_type) if self.use_prefilter else None
+        )
+        if prefilter is None:
+            return True
+        if prefilter not in prefilter_results:
+            prefilter_results[prefilter] = prefilter(src)
+        return prefilter_results[prefilter]
+
     def _check_decode_url(self, match_str, rgx_def, match_pos, iocs_found):
         """Get any other IoCs from decoded URL."""
         decoded_url = unquote(match_str)
@@ -616,6 +1029,82 @@ class IoCExtract:
         iocs_found[current_match] = (current_def.ioc_type, current_def.priority)
 
 
+@export
+class IoCStreamSummary:
+    """Deduplicated summary of the IoCs found by `IoCExtract.extract_stream`."""
+
+    def __init__(self):
+        """Initialize an empty summary."""
+        # (IoCType, Observable) -> [count, first SourceIndex, last SourceIndex]
+        self._observables: Dict[Tuple[str, str], List[Any]] = {}
+
+    def update(self, results: pd.DataFrame):
+        """
+        Add the results from an IoC extraction to the summary.
+
+        Parameters
+        ----------
+        results : pd.DataFrame
+            DataFrame of results returned by `extract_stream`
+            or `extract_df`.
+
+        """
+        if results.empty:
+            return
+        grouped = results.groupby(["IoCType", "Observable"], sort=False)[
+            "SourceIndex"
+        ].agg(["count", "first", "last"])
+        for key, count, first, last in grouped.itertuples(name=None):
+            current = self._observables.get(key)
+            if current is None:
+                self._observables[key] = [count, first, last]
+            else:
+                current[0] += count
+                current[2] = last
+
+    def __len__(self) -> int:
+        """Return the number of distinct observables."""
+        return len(self._observables)
+
+    def to_df(self) -> pd.DataFrame:
+        """
+        Return the summary as a DataFrame.
+
+        Returns
+        -------
+        pd.DataFrame
+            DataFrame with one row per distinct IoCType/Observable
+            and columns: IoCType, Observable, Count, FirstSourceIndex
+            and LastSourceIndex.
+
+        """
+        return pd.DataFrame(
+            [
+                (ioc_type, observable, *values)
+                for (ioc_type, observable), values in self._observables.items()
+            ],
+            columns=[
+                "IoCType",
+                "Observable",
+                "Count",
+                "FirstSourceIndex",
+                "LastSourceIndex",
+            ],
+        )
+
+
+def _scan_values_worker(
+    values: List[Any], pattern_state: Dict[str, Any], ioc_types: List[str]
+) -> List[List[Tuple[str, str]]]:
+    """Scan a chunk of values in a worker process."""
+    extractor = IoCExtract._from_pattern_state(  # pylint: disable=protected-access
+        pattern_state
+    )
+    return extractor._scan_value_list(  # pylint: disable=protected-access
+        values, ioc_types
+    )
+
+
 # pylint: disable=too-few-public-methods
 @pd.api.extensions.register_dataframe_accessor("mp_ioc")
 class IoCExtractAccessor:
@@ -645,6 +1134,12 @@ class IoCExtractAccessor:
             (the default is false - excludes 'windows_path'
             and 'linux_path'). If `ioc_types` is specified
             this parameter is ignored.
+        n_jobs : int, optional
+            The number of worker processes to use to scan the data,
+            by default None (scan in the current process). Use -1 to
+            use one process per CPU.
+        executor : concurrent.futures.Executor, optional
+            An existing executor to use to scan the data in parallel.
 
         Returns
         -------
@@ -4,9 +4,10 @@
 # license information.
 # --------------------------------------------------------------------------
 """Process Tree Visualization."""
-from typing import Any, Dict, Iterable, Optional, Union
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
 
 import attr
+import numpy as np
 import pandas as pd
 
 from .._version import VERSION
@@ -125,12 +126,17 @@ LX_INT_TYPES = ["argc", "egid", "euid", "gid", "auid", "ppid", "pid", "ses", "ui
 
 TS_FMT_STRING = "%Y-%m-%d %H:%M:%S.%f"
 
+# DataFrame.attrs key of an attached ProcessTreeIndex
+_TREE_INDEX_ATTR = "process_tree_index"
+
 
 def build_process_tree(
     procs: pd.DataFrame,
     schema: ProcSchema = None,
     show_progress: bool = False,
     debug: bool = False,
+    add_path: bool = True,
+    add_index: bool = False,
 ) -> pd.DataFrame:
     """
     Build process trees from the process events.
@@ -148,12 +154,26 @@ def build_process_tree(
     debug : bool
         If True produces extra debugging output,
         by default False
+    add_path : bool
+        If True (the default) add the "path" column - the
+        source_index values of the process and its ancestors
+        separated by "/". For very large or deep trees, set this
+        to False and use `build_process_paths` to create the
+        paths later if they are needed.
+    add_index : bool
+        If True, build a `ProcessTreeIndex` and attach it to the
+        process tree (see `add_process_tree_index`), by default False
 
     Returns
     -------
     pd.DataFrame
         Process tree dataframe.
 
+    Notes
+    -----
+    Many of the functions in this module and the process tree
+    plot use the "path" column.
+
     """
     # If schema is none, infer schema from columns
     if not schema:
@@ -186,9 +206,11 @@ def build_process_tree(
     progress_ui.update_progress(delta=section_len)
 
     # Build process paths
-    proc_tree = _build_proc_tree(merged_procs_keys, progress_ui)
+    proc_tree = _build_proc_tree(merged_procs_keys, progress_ui, add_path=add_path)
+    if add_index:
+        add_process_tree_index(proc_tree)
 
-    if show_progress:
+    if show_progress and add_path:
         print(get_summary_info(proc_tree))
     return proc_tree
 
@@ -391,53 +413,363 @@ def _assign_proc_keys(
     return proc_tree
 
 
-def _build_proc_tree(input_tree, progress: Progress, max_depth=-1):
+def _build_proc_tree(
+    input_tree: pd.DataFrame,
+    progress: Progress,
+    max_depth: int = -1,
+    add_path: bool = True,
+) -> pd.DataFrame:
     """Build process tree paths."""
-    # set default path == current process ID
-    input_tree["path"] = input_tree["source_index"]
-
-    cur_level = input_tree[input_tree["IsRoot"]]
-    remaining_procs = input_tree[~input_tree["IsRoot"]]
-
-    cur_level_num = 0
-    progress.update_progress(delta=len(cur_level))
-    while True:
-        sel_crit = remaining_procs["parent_key"].isin(cur_level.index)
-        next_level = remaining_procs[sel_crit].copy()
-        remaining_procs = remaining_procs[~sel_crit]
-
-        if next_level.empty:
-            progress.update_progress(new_total=progress.max)
-            break
-        if max_depth != -1 and cur_level_num >= max_depth:
-            print(f"max path depth reached: {cur_level_num}")
+    # resolve the parent of each process to its integer position
+    is_root = input_tree["IsRoot"].to_numpy(dtype=bool)
+    parent_pos = input_tree.index.get_indexer(input_tree["parent_key"])
+    parent_pos[is_root | input_tree["parent_key"].isna().to_numpy()] = -1
+
+    # processes are only part of a tree if their top-most ancestor is a root
+    top_pos, depth = _get_tree_levels(parent_pos)
+    in_tree = is_root[top_pos]
+    if max_depth != -1:
+        too_deep = in_tree & (depth > max_depth)
+        in_tree &= ~too_deep
+        if too_deep.any():
+            progress.update_progress(delta=int(in_tree.sum()))
+            print(f"max path depth reached: {max_depth}")
             print(
                 f"processed {progress.value} of {progress.max} for specified depth of {max_depth}"
             )
-            progress.update_progress(new_total=progress.max)
+    progress.update_progress(new_total=progress.max)
+    parent_pos[~in_tree] = -1
+
+    source_index = input_tree["source_index"].to_numpy(dtype=object)
+    if add_path:
+        input_tree["path"] = _build_paths(source_index, parent_pos, depth)
+    input_tree["parent_index"] = np.where(
+        parent_pos >= 0, source_index[parent_pos], np.nan
+    )
+    return input_tree
+
+
+def _get_tree_levels(parent_pos: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return the position of the top-most ancestor and the depth of each process.
+
+    Parameters
+    ----------
+    parent_pos : np.ndarray
+        The position of the parent of each process (-1 if the
+        process has no parent)
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray]
+        The position of the top-most ancestor and the number of
+        levels between this and the process.
+
+    Notes
+    -----
+    This uses pointer jumping - each iteration doubles the distance
+    to the ancestor of each process so the number of iterations is
+    proportional to the log of the tree depth. Processes that are
+    part of a parent loop are not resolved to a top-most ancestor
+    without a parent.
+
+    """
+    positions = np.arange(len(parent_pos))
+    has_parent = parent_pos >= 0
+    ancestor = np.where(has_parent, parent_pos, positions)
+    depth = has_parent.astype(np.int64)
+    for _ in range(len(parent_pos).bit_length() + 1):
+        next_ancestor = ancestor[ancestor]
+        if np.array_equal(next_ancestor, ancestor):
             break
+        depth = depth + depth[ancestor]
+        ancestor = next_ancestor
+    return ancestor, depth
+
+
+def _build_paths(
+    source_index: np.ndarray, parent_pos: np.ndarray, depth: np.ndarray
+) -> np.ndarray:
+    """Return the path (parent path + "/" + source_index) of each process."""
+    paths = source_index.astype(str).astype(object)
+    child_pos = np.flatnonzero(parent_pos >= 0)
+    if not child_pos.size:
+        return paths
+    # build the paths one level at a time (parents before children)
+    child_pos = child_pos[np.argsort(depth[child_pos], kind="stable")]
+    level_starts = np.flatnonzero(np.diff(depth[child_pos])) + 1
+    for level_pos in np.split(child_pos, level_starts):
+        paths[level_pos] = paths[parent_pos[level_pos]] + "/" + paths[level_pos]
+    return paths
+
+
+def build_process_paths(procs: pd.DataFrame) -> pd.Series:
+    """
+    Return the process tree path of each process.
+
+    Parameters
+    ----------
+    procs : pd.DataFrame
+        Process events (with process tree metadata)
+        - the output from `build_process_tree`
+
+    Returns
+    -------
+    pd.Series
+        The source_index values of each process and its ancestors,
+        separated by "/" (the "path" column of the process tree).
+
+    Notes
+    -----
+    This uses the "source_index" and "parent_index" columns so can be
+    used to add the "path" column to process trees built with
+    `add_path=False`. If `procs` is a subset of a process tree, the paths
+    start at the top-most ancestor that is in the subset.
+
+    """
+    source_index = procs["source_index"].to_numpy(dtype=object)
+    parent_pos = pd.Index(source_index).get_indexer(procs["parent_index"])
+    parent_pos[procs["parent_index"].isna().to_numpy()] = -1
+    _, depth = _get_tree_levels(parent_pos)
+    return pd.Series(
+        _build_paths(source_index, parent_pos, depth), index=procs.index, name="path"
+    )
+
+
+class ProcessTreeIndex:
+    """
+    Index of the parent-child relationships in a process tree.
+
+    The processes are identified by their (integer) position in the
+    process tree DataFrame. The index holds the children of each
+    process and the entry and exit positions of each process in a
+    (pre-order) Euler tour of the process trees - the descendents of
+    a process are the processes between its entry and exit positions.
+
+    Notes
+    -----
+    The index is only valid for the DataFrame that it was built from.
+    If the process tree is changed, the index should be rebuilt.
+
+    """
+
+    def __init__(self, procs: pd.DataFrame):
+        """
+        Create the index for a process tree.
+
+        Parameters
+        ----------
+        procs : pd.DataFrame
+            Process events (with process tree metadata)
+            - the output from `build_process_tree`
 
-        # merge next level with current level
-        tmp_df = next_level.merge(
-            cur_level[["source_index", "path"]],
-            how="inner",
-            left_on="parent_key",
-            right_index=True,
+        Raises
+        ------
+        MsticpyException
+            If the process keys (the index of `procs`) are not unique.
+
+        """
+        if not procs.index.is_unique:
+            raise MsticpyException("The process keys of the tree must be unique.")
+        self._proc_keys = procs.index
+        parent_pos = procs.index.get_indexer(procs["parent_key"])
+        parent_pos[procs["parent_key"].isna().to_numpy()] = -1
+        self.parent_pos = parent_pos
+
+        # adjacency lists - the children of each process, in position order
+        self._child_pos = np.argsort(parent_pos, kind="stable")
+        self._child_start = np.searchsorted(
+            parent_pos[self._child_pos], np.arange(len(parent_pos) + 1)
         )
 
-        # Build the path of these processes
-        # = parent_path + child source_index
-        next_level.loc[tmp_df.index, "path"] = (
-            tmp_df["path_y"] + "/" + tmp_df["source_index_x"]
+        # processes in a parent loop are not part of a tree (depth == -1)
+        top_pos, depth = _get_tree_levels(parent_pos)
+        in_tree = parent_pos[top_pos] < 0
+        self.root_pos = np.where(in_tree, top_pos, -1)
+        self.depth = np.where(in_tree, depth, -1)
+        self.entry, self.exit, self.tour = _euler_tour(parent_pos, self.depth)
+
+    def __copy__(self):
+        """Return self - the index is not modified after creation."""
+        return self
+
+    def __deepcopy__(self, memo):
+        """Return self - the index is not modified after creation."""
+        return self
+
+    def matches(self, procs: pd.DataFrame) -> bool:
+        """Return True if the index was built from `procs`."""
+        return procs.index is self._proc_keys and len(procs) == len(self.parent_pos)
+
+    def get_position(self, proc_key: str) -> Optional[int]:
+        """Return the position of the process with key `proc_key`."""
+        if proc_key in self._proc_keys:
+            return self._proc_keys.get_loc(proc_key)
+        return None
+
+    def children(self, proc_pos: int) -> np.ndarray:
+        """Return the positions of the children of the process."""
+        return self._child_pos[
+            self._child_start[proc_pos] : self._child_start[proc_pos + 1]  # noqa: E203
+        ]
+
+    def descendents(self, proc_pos: int, max_levels: int = -1) -> Optional[np.ndarray]:
+        """
+        Return the positions of the descendents of the process.
+
+        Parameters
+        ----------
+        proc_pos : int
+            Position of the process
+        max_levels : int, optional
+            Maximum number of levels to descend, by default -1 (all levels)
+
+        Returns
+        -------
+        Optional[np.ndarray]
+            Positions of the descendents (in Euler tour order) or
+            None if the process is not part of a tree.
+
+        """
+        if self.entry[proc_pos] < 0:
+            return None
+        desc_pos = self.tour[self.entry[proc_pos] + 1 : self.exit[proc_pos]]
+        if max_levels != -1:
+            desc_pos = desc_pos[
+                self.depth[desc_pos] - self.depth[proc_pos] <= max_levels
+            ]
+        return desc_pos
+
+    def ancestors(self, proc_pos: int) -> Optional[np.ndarray]:
+        """
+        Return the positions of the ancestors of the process.
+
+        Parameters
+        ----------
+        proc_pos : int
+            Position of the process
+
+        Returns
+        -------
+        Optional[np.ndarray]
+            Positions of the root process to the process (inclusive)
+            or None if the process is not part of a tree.
+
+        """
+        if self.depth[proc_pos] < 0:
+            return None
+        anc_pos: List[int] = [proc_pos]
+        while self.parent_pos[anc_pos[-1]] >= 0:
+            anc_pos.append(self.parent_pos[anc_pos[-1]])
+        return np.array(anc_pos[::-1], dtype=np.int64)
+
+    def is_ancestor(self, anc_pos: int, proc_pos: int) -> bool:
+        """Return True if `anc_pos` is an ancestor of (or is) `proc_pos`."""
+        return (
+            self.entry[anc_pos] >= 0
+            and self.entry[anc_pos] <= self.entry[proc_pos] < self.exit[anc_pos]
         )
-        input_tree.loc[next_level.index, "path"] = next_level["path"]
-        input_tree.loc[tmp_df.index, "parent_index"] = tmp_df["source_index_y"]
 
-        cur_level = next_level
-        cur_level_num += 1
-        progress.update_progress(delta=len(cur_level))
 
-    return input_tree
+def _euler_tour(
+    parent_pos: np.ndarray, depth: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Return the Euler tour entry and exit positions and the tour order.
+
+    Parameters
+    ----------
+    parent_pos : np.ndarray
+        The position of the parent of each process (-1 if the
+        process has no parent)
+    depth : np.ndarray
+        The depth of each process (-1 if not part of a tree)
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray, np.ndarray]
+        Entry positions, exit positions (-1 for processes not part
+        of a tree) and the process positions in tour order.
+
+    Notes
+    -----
+    The tour is a pre-order traversal with the children of each
+    process visited in position order. The entry positions are
+    calculated from the subtree sizes one level at a time.
+
+    """
+    in_tree = np.flatnonzero(depth >= 0)
+    entry = np.full(len(parent_pos), -1, dtype=np.int64)
+    if not in_tree.size:
+        return entry, entry.copy(), in_tree
+    size = (depth >= 0).astype(np.int64)
+    by_depth = in_tree[np.argsort(depth[in_tree], kind="stable")]
+    levels = np.split(by_depth, np.flatnonzero(np.diff(depth[by_depth])) + 1)
+    for level_pos in reversed(levels[1:]):
+        np.add.at(size, parent_pos[level_pos], size[level_pos])
+
+    # top level processes are in position order
+    entry[levels[0]] = np.cumsum(size[levels[0]]) - size[levels[0]]
+    for level_pos in levels[1:]:
+        # group the processes by parent, in position order within each group
+        level_pos = level_pos[np.argsort(parent_pos[level_pos], kind="stable")]
+        parents = parent_pos[level_pos]
+        offsets = np.cumsum(size[level_pos]) - size[level_pos]
+        group_start = np.flatnonzero(np.r_[True, parents[1:] != parents[:-1]])
+        group_sizes = np.diff(np.r_[group_start, len(level_pos)])
+        offsets -= np.repeat(offsets[group_start], group_sizes)
+        entry[level_pos] = entry[parents] + 1 + offsets
+
+    exit_pos = np.where(entry >= 0, entry + size, -1)
+    tour = np.empty(len(in_tree), dtype=np.int64)
+    tour[entry[in_tree]] = in_tree
+    return entry, exit_pos, tour
+
+
+def add_process_tree_index(procs: pd.DataFrame) -> ProcessTreeIndex:
+    """
+    Build a `ProcessTreeIndex` and attach it to the process tree.
+
+    Parameters
+    ----------
+    procs : pd.DataFrame
+        Process events (with process tree metadata)
+        - the output from `build_process_tree`
+
+    Returns
+    -------
+    ProcessTreeIndex
+        The process tree index.
+
+    Notes
+    -----
+    The index is stored in `procs.attrs`. `get_children`, `get_descendents`,
+    `get_ancestors`, `get_root` and `get_siblings` use the index, if one is
+    attached, instead of searching the whole process tree. The index is
+    ignored for other DataFrames (e.g. subsets or copies of the tree).
+
+    """
+    tree_index = ProcessTreeIndex(procs)
+    procs.attrs[_TREE_INDEX_ATTR] = tree_index
+    return tree_index
+
+
+def _get_tree_index_pos(
+    procs: pd.DataFrame, proc: pd.Series
+) -> Tuple[Optional[ProcessTreeIndex], Optional[int]]:
+    """Return the attached tree index and the position of `proc` in it."""
+    tree_index = getattr(procs, "attrs", {}).get(_TREE_INDEX_ATTR)
+    if tree_index is None or not tree_index.matches(procs):
+        return None, None
+    proc_pos = tree_index.get_position(proc.name)
+    if proc_pos is None:
+        return None, None
+    return tree_index, proc_pos
+
+
+def _sort_by_path(procs: pd.DataFrame) -> pd.DataFrame:
+    """Sort processes by path (if the path column exists)."""
+    return procs.sort_values("path") if "path" in procs.columns else procs
 
 
 def get_process_key(procs: pd.DataFrame, source_index: int) -> str:
@@ -576,6 +908,9 @@ def get_root(procs: pd.DataFrame, source: Union[str, pd.Series]) -> pd.Series:
 
     """
     proc = get_process(procs, source)
+    tree_index, proc_pos = _get_tree_index_pos(procs, proc)
+    if tree_index is not None and tree_index.root_pos[proc_pos] >= 0:
+        return procs.iloc[tree_index.root_pos[proc_pos]]
     p_path = proc.path.split("/")
     root_proc = procs[procs["source_index"] == p_path[0]]
     return root_proc.iloc[0]
@@ -643,7 +978,11 @@ def get_children(
 
     """
     proc = get_process(procs, source)
-    children = procs[procs["parent_key"] == proc.name]
+    tree_index, proc_pos = _get_tree_index_pos(procs, proc)
+    if tree_index is not None:
+        children = procs.iloc[tree_index.children(proc_pos)]
+    else:
+        children = procs[procs["parent_key"] == proc.name]
     if include_source:
         return children.append(proc)
     return children
@@ -676,8 +1015,31 @@ def get_descendents(
 
     """
     proc = get_process(procs, source)
+    tree_index, proc_pos = _get_tree_index_pos(procs, proc)
+    desc_pos = (
+        tree_index.descendents(proc_pos, max_levels) if tree_index is not None else None
+    )
+    if desc_pos is not None:
+        descendents = [procs.iloc[desc_pos]] if desc_pos.size else []
+    else:
+        descendents = _search_descendents(procs, proc.name, max_levels)
+
+    if descendents:
+        desc_procs = pd.concat(descendents)
+    else:
+        desc_procs = pd.DataFrame(columns=proc.index, index=None)
+        desc_procs.index.name = "proc_key"
+    if include_source:
+        return _sort_by_path(desc_procs.append(proc))
+    return _sort_by_path(desc_procs)
+
+
+def _search_descendents(
+    procs: pd.DataFrame, proc_key: str, max_levels: int
+) -> List[pd.DataFrame]:
+    """Return the descendents of `proc_key`, one DataFrame per level."""
     descendents = []
-    parent_keys = [proc.name]
+    parent_keys = [proc_key]
     level = 0
     rem_procs: Optional[pd.DataFrame] = None
     while max_levels == -1 or level < max_levels:
@@ -694,15 +1056,7 @@ def get_descendents(
         descendents.append(children)
         parent_keys = children.index
         level += 1
-
-    if descendents:
-        desc_procs = pd.concat(descendents)
-    else:
-        desc_procs = pd.DataFrame(columns=proc.index, index=None)
-        desc_procs.index.name = "proc_key"
-    if include_source:
-        return desc_procs.append(proc).sort_values("path")
-    return desc_procs.sort_values("path")
+    return descendents
 
 
 def get_ancestors(procs: pd.DataFrame, source, include_source=True) -> pd.DataFrame:
@@ -725,6 +1079,11 @@ def get_ancestors(procs: pd.DataFrame, source, include_source=True) -> pd.DataFr
 
     """
     proc = get_process(procs, source)
+    tree_index, proc_pos = _get_tree_index_pos(procs, proc)
+    anc_pos = tree_index.ancestors(proc_pos) if tree_index is not None else None
+    if anc_pos is not None:
+        # the ancestors are in path order (root process first)
+        return procs.iloc[anc_pos if include_source else anc_pos[:-1]]
     p_path = proc.path.split("/")
     if not include_source:
         p_path.remove(proc.source_index)
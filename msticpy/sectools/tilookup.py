@@ -15,8 +15,11 @@ requests per minute for the account type that you have.
 import sys  # noqa
 import warnings
 from collections import ChainMap
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from concurrent.futures import as_completed
 from inspect import isclass
-from typing import Dict, Iterable, List, Mapping, Optional, Tuple, Union
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Tuple, Union
 
 import attr
 import pandas as pd
@@ -31,6 +34,11 @@ from . import tiproviders
 # used in dynamic instantiation of providers
 # pylint: disable=unused-wildcard-import, wildcard-import
 from .tiproviders import *  # noqa:F401, F403
+from .tiproviders.result_cache import (
+    MemoryTIResultCache,
+    SqliteTIResultCache,
+    TIResultCache,
+)
 from .tiproviders.ti_provider_base import LookupResult, TILookupStatus, TIProvider
 
 __version__ = VERSION
@@ -56,6 +64,7 @@ class TILookup:
         primary_providers: Optional[List[TIProvider]] = None,
         secondary_providers: Optional[List[TIProvider]] = None,
         providers: Optional[List[str]] = None,
+        cache: Union[TIResultCache, str, None] = None,
     ):
         """
         Initialize TILookup instance.
@@ -72,11 +81,19 @@ class TILookup:
             call `TILookup.list_available_providers()`.
             Note: if primary_provides or secondary_providers is specified
             This will override the providers list.
+        cache : Union[TIResultCache, str, None], optional
+            A result cache to share between all providers. This can be
+            a TIResultCache instance or the path to a SQLite cache file
+            (see `SqliteTIResultCache`). By default None - each
+            provider uses its own in-memory cache.
 
         """
         self._providers: Dict[str, TIProvider] = {}
         self._secondary_providers: Dict[str, TIProvider] = {}
         self._providers_to_load = providers
+        self._cache: Optional[TIResultCache] = (
+            SqliteTIResultCache(path=cache) if isinstance(cache, str) else cache
+        )
 
         if primary_providers:
             for prov in primary_providers:
@@ -102,6 +119,73 @@ class TILookup:
         """
         return self._all_providers  # type: ignore
 
+    @property
+    def cache(self) -> Optional[TIResultCache]:
+        """
+        Return the shared result cache.
+
+        Returns
+        -------
+        Optional[TIResultCache]
+            The result cache shared by all providers or None
+            if each provider uses its own cache.
+
+        """
+        return self._cache
+
+    @cache.setter
+    def cache(self, cache: Union[TIResultCache, str, None]):
+        """
+        Set the result cache to be shared by all loaded providers.
+
+        If `cache` is None, each provider reverts to its own
+        in-memory cache.
+
+        """
+        self._cache = (
+            SqliteTIResultCache(path=cache) if isinstance(cache, str) else cache
+        )
+        for provider in self._all_providers.values():
+            provider.result_cache = self._cache or MemoryTIResultCache(max_size=256)
+
+    @property
+    def cache_stats(self) -> pd.DataFrame:
+        """
+        Return result cache hit and miss counts for loaded providers.
+
+        Returns
+        -------
+        pd.DataFrame
+            DataFrame of hits and misses, indexed by provider name.
+
+        """
+        stats = {}
+        for prov_name, provider in self._all_providers.items():
+            if provider.result_cache is None:
+                continue
+            prov_stats = provider.result_cache.stats.get(
+                provider.__class__.__name__, {"hits": 0, "misses": 0}
+            )
+            stats[prov_name] = prov_stats
+        return pd.DataFrame.from_dict(stats, orient="index", columns=["hits", "misses"])
+
+    def clear_cache(self, providers: Optional[List[str]] = None):
+        """
+        Remove cached results for loaded providers.
+
+        Parameters
+        ----------
+        providers : Optional[List[str]], optional
+            Names of providers to clear results for, by default None
+            (all loaded providers).
+
+        """
+        for prov_name, provider in self._all_providers.items():
+            if providers and prov_name not in providers:
+                continue
+            if provider.result_cache is not None:
+                provider.result_cache.clear(provider=provider.__class__.__name__)
+
     @property
     def provider_status(self) -> Iterable[str]:
         """
@@ -305,6 +389,8 @@ class TILookup:
         """
         if not name:
             name = provider.__class__.__name__
+        if self._cache is not None:
+            provider.result_cache = self._cache
         if primary:
             self._providers[name] = provider
         else:
@@ -371,6 +457,7 @@ class TILookup:
         overall_result = any(res.result for _, res in result_list)
         return overall_result, result_list
 
+    # pylint: disable=too-many-locals
     def lookup_iocs(
         self,
         data: Union[pd.DataFrame, Mapping[str, str], Iterable[str]],
@@ -379,6 +466,8 @@ class TILookup:
         ioc_query_type: str = None,
         providers: List[str] = None,
         prov_scope: str = "primary",
+        parallel: bool = False,
+        timeout: Optional[float] = None,
         **kwargs,
     ) -> pd.DataFrame:
         """
@@ -402,6 +491,16 @@ class TILookup:
             Explicit list of providers to use
         prov_scope : str, optional
             Use "primary", "secondary" or "all" providers, by default "primary"
+        parallel : bool, optional
+            Query all of the selected providers at the same time,
+            by default False.
+        timeout : Optional[float], optional
+            If `parallel` is True, the maximum time in seconds to wait
+            for the providers to return results, by default None (no timeout).
+            Results from providers that fail or do not respond within this
+            time are omitted from the output. Note: lookups that are
+            already running when the timeout expires cannot be stopped -
+            they are abandoned and complete in the background.
         kwargs :
             Additional arguments passed to the underlying provider(s)
 
@@ -411,7 +510,6 @@ class TILookup:
             DataFrame of results
 
         """
-        result_list: List[pd.DataFrame] = []
         selected_providers = self._select_providers(providers, prov_scope)
         if not selected_providers:
             raise MsticpyUserConfigError(
@@ -420,31 +518,113 @@ class TILookup:
                 help_uri=_TI_HELP_URI,
             )
 
-        for prov_name, provider in selected_providers.items():
-            provider_result = provider.lookup_iocs(
+        def _provider_lookup(provider: TIProvider) -> pd.DataFrame:
+            return provider.lookup_iocs(
                 data=data,
                 obs_col=obs_col,
                 ioc_type_col=ioc_type_col,
                 query_type=ioc_query_type,
                 **kwargs,
             )
-            if provider_result is None or provider_result.empty:
-                continue
-            if not kwargs.get("show_not_supported", False):
-                provider_result = provider_result[
-                    provider_result["Status"] != TILookupStatus.not_supported.value
-                ]
-            if not kwargs.get("show_bad_ioc", False):
-                provider_result = provider_result[
-                    provider_result["Status"] != TILookupStatus.bad_format.value
-                ]
-            provider_result["Provider"] = prov_name
-            result_list.append(provider_result)
 
+        if parallel and len(selected_providers) > 1:
+            if not isinstance(data, (pd.DataFrame, Mapping)):
+                # an iterator can only be consumed once - share a list instead
+                data = list(data)
+            prov_results = self._lookup_iocs_parallel(
+                selected_providers, _provider_lookup, timeout
+            )
+        else:
+            prov_results = {
+                prov_name: _provider_lookup(provider)
+                for prov_name, provider in selected_providers.items()
+            }
+
+        # keep the provider order used by sequential lookups
+        result_list = [
+            self._filter_provider_result(prov_results[prov_name], prov_name, **kwargs)
+            for prov_name in selected_providers
+            if prov_name in prov_results
+        ]
+        result_list = [result for result in result_list if result is not None]
         if not result_list:
             print("No IoC matches")
+            return pd.DataFrame(columns=list(LookupResult.column_map().values()))
         return pd.concat(result_list, sort=False)
 
+    @staticmethod
+    def _lookup_iocs_parallel(
+        selected_providers: Dict[str, TIProvider],
+        lookup_func: Callable[[TIProvider], pd.DataFrame],
+        timeout: Optional[float] = None,
+    ) -> Dict[str, pd.DataFrame]:
+        """
+        Run `lookup_func` for each provider concurrently.
+
+        Returns
+        -------
+        Dict[str, pd.DataFrame]
+            The results of the providers that completed successfully
+            within `timeout`.
+
+        Notes
+        -----
+        Lookups that have not started when the timeout expires are
+        cancelled. Lookups that are already running are abandoned
+        (they cannot be interrupted) and their results are discarded.
+
+        """
+        prov_results: Dict[str, pd.DataFrame] = {}
+        executor = ThreadPoolExecutor(
+            max_workers=len(selected_providers), thread_name_prefix="TILookup"
+        )
+        futures = {
+            executor.submit(lookup_func, provider): prov_name
+            for prov_name, provider in selected_providers.items()
+        }
+        try:
+            for future in as_completed(futures, timeout=timeout):
+                prov_name = futures[future]
+                try:
+                    prov_results[prov_name] = future.result()
+                except Exception as err:  # pylint: disable=broad-except
+                    warnings.warn(
+                        f"Lookup failed for provider {prov_name}: {err}. "
+                        + "Results for this provider are not included."
+                    )
+        except FuturesTimeoutError:
+            timed_out = [
+                prov_name for future, prov_name in futures.items() if not future.done()
+            ]
+            warnings.warn(
+                f"Timeout after {timeout} seconds waiting for providers: "
+                + f"{', '.join(timed_out)}. Results for these providers are not included."
+            )
+        finally:
+            # cancel any lookups that have not started (the equivalent of
+            # shutdown(cancel_futures=True), which needs Python 3.9)
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+        return prov_results
+
+    @staticmethod
+    def _filter_provider_result(
+        provider_result: Optional[pd.DataFrame], prov_name: str, **kwargs
+    ) -> Optional[pd.DataFrame]:
+        """Filter a provider result and add the provider name."""
+        if provider_result is None or provider_result.empty:
+            return None
+        if not kwargs.get("show_not_supported", False):
+            provider_result = provider_result[
+                provider_result["Status"] != TILookupStatus.not_supported.value
+            ]
+        if not kwargs.get("show_bad_ioc", False):
+            provider_result = provider_result[
+                provider_result["Status"] != TILookupStatus.bad_format.value
+            ]
+        return provider_result.assign(Provider=prov_name)
+
     @staticmethod
     def result_to_df(
         ioc_lookup: Tuple[bool, List[Tuple[str, LookupResult]]]
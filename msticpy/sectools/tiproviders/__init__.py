@@ -10,6 +10,11 @@ from .greynoise import Greynoise  # noqa:F401
 from .http_base import HttpProvider  # noqa:F401
 from .ibm_xforce import XForce  # noqa:F401
 from .open_page_rank import OPR  # noqa:F401
+from .result_cache import (  # noqa:F401
+    MemoryTIResultCache,
+    SqliteTIResultCache,
+    TIResultCache,
+)
 from .ti_provider_base import (  # noqa:F401
     LookupResult,
     TIProvider,
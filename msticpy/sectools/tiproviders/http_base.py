@@ -14,7 +14,6 @@ requests per minute for the account type that you have.
 """
 import abc
 import traceback
-from functools import lru_cache
 from http import client
 from json import JSONDecodeError
 from typing import Any, Dict, List, Tuple
@@ -22,11 +21,18 @@ from typing import Any, Dict, List, Tuple
 import attr
 import requests
 from attr import Factory
+from requests.adapters import HTTPAdapter
 
 from ..._version import VERSION
 from ...common.exceptions import MsticpyConfigException
 from ...common.utility import export
-from .ti_provider_base import LookupResult, TILookupStatus, TIProvider, TISeverity
+from .ti_provider_base import (
+    LookupResult,
+    TILookupStatus,
+    TIProvider,
+    TISeverity,
+    cached_lookup,
+)
 
 __version__ = VERSION
 __author__ = "Ian Hellen"
@@ -63,6 +69,7 @@ class HttpProvider(TIProvider):
         super().__init__(**kwargs)
 
         self._requests_session = requests.Session()
+        self._pool_size = 0
         self._request_params = {}
         if "ApiID" in kwargs:
             self._request_params["API_ID"] = kwargs.pop("ApiID")
@@ -81,8 +88,29 @@ class HttpProvider(TIProvider):
                 f"Missing parameters are: {param_list}",
             )
 
+    def _prepare_concurrency(self, max_concurrency: int):
+        """
+        Size the requests session connection pool for concurrent lookups.
+
+        Parameters
+        ----------
+        max_concurrency : int
+            The number of lookups that will run concurrently.
+
+        """
+        if not isinstance(self._requests_session, requests.Session):
+            return
+        if self._pool_size >= max_concurrency:
+            return
+        adapter = HTTPAdapter(
+            pool_connections=max_concurrency, pool_maxsize=max_concurrency
+        )
+        self._requests_session.mount("https://", adapter)
+        self._requests_session.mount("http://", adapter)
+        self._pool_size = max_concurrency
+
     # pylint: disable=too-many-branches, duplicate-code
-    @lru_cache(maxsize=256)
+    @cached_lookup
     def lookup_ioc(  # type: ignore
         self, ioc: str, ioc_type: str = None, query_type: str = None, **kwargs
     ) -> LookupResult:
@@ -117,8 +145,8 @@ class HttpProvider(TIProvider):
 
         Notes
         -----
-        Note: this method uses memoization (lru_cache) to cache results
-        for a particular observable to try avoid repeated network calls for
+        Note: this method caches successful results in the provider
+        `result_cache` to try avoid repeated network calls for
         the same item.
 
         """
@@ -14,7 +14,6 @@ requests per minute for the account type that you have.
 """
 import abc
 from collections import defaultdict
-from functools import lru_cache
 from typing import Any, Dict, Tuple, Union, Iterable, DefaultDict, Set, List, Callable
 import warnings
 
@@ -31,6 +30,7 @@ from .ti_provider_base import (
     generate_items,
     TISeverity,
     TILookupStatus,
+    cached_lookup,
 )
 
 __version__ = VERSION
@@ -62,7 +62,7 @@ class KqlTIProvider(TIProvider):
             raise MsticpyConfigException("Query provider for KQL could not be created.")
 
     # pylint: disable=duplicate-code
-    @lru_cache(maxsize=256)
+    @cached_lookup
     def lookup_ioc(  # type: ignore
         self, ioc: str, ioc_type: str = None, query_type: str = None, **kwargs
     ) -> LookupResult:
@@ -96,8 +96,8 @@ class KqlTIProvider(TIProvider):
 
         Notes
         -----
-        Note: this method uses memoization (lru_cache) to cache results
-        for a particular observable to try avoid repeated network calls for
+        Note: this method caches successful results in the provider
+        `result_cache` to try avoid repeated network calls for
         the same item.
 
         """
@@ -0,0 +1,430 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# --------------------------------------------------------------------------
+"""
+TI lookup result caches.
+
+Lookup results are cached using a key of provider, IoC type,
+query type and observable (plus any additional query parameters).
+The memory cache is used by default by each provider. The SQLite
+cache persists results across sessions and can be shared
+between providers (and TILookup instances).
+
+"""
+import abc
+import copy
+import json
+import pickle  # nosec
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from datetime import timedelta
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple, Union
+
+from ..._version import VERSION
+from ...common.utility import export
+
+__version__ = VERSION
+__author__ = "Ian Hellen"
+
+CacheKey = Tuple[str, str, str, str, str]
+TTLType = Union[int, float, timedelta, None]
+
+
+def _ttl_seconds(ttl: TTLType) -> Optional[float]:
+    """Return TTL as seconds."""
+    if ttl is None:
+        return None
+    if isinstance(ttl, timedelta):
+        return ttl.total_seconds()
+    return float(ttl)
+
+
+@export
+class TIResultCache(abc.ABC):
+    """Base class for TI lookup result caches."""
+
+    def __init__(
+        self,
+        max_size: int = 256,
+        default_ttl: TTLType = None,
+        provider_ttl: Optional[Dict[str, TTLType]] = None,
+    ):
+        """
+        Initialize the cache.
+
+        Parameters
+        ----------
+        max_size : int, optional
+            The maximum number of results to store. Least recently used
+            results are evicted when this is exceeded, by default 256.
+        default_ttl : Union[int, float, timedelta, None], optional
+            The default time-to-live for cached results (in seconds
+            or as a timedelta), by default None (results do not expire).
+        provider_ttl : Optional[Dict[str, Union[int, float, timedelta]]], optional
+            Time-to-live values for individual providers, keyed by
+            provider name, by default None.
+
+        """
+        self.max_size = max_size
+        self.default_ttl = _ttl_seconds(default_ttl)
+        self.provider_ttl: Dict[str, Optional[float]] = {
+            prov: _ttl_seconds(ttl) for prov, ttl in (provider_ttl or {}).items()
+        }
+        self._hits: Counter = Counter()
+        self._misses: Counter = Counter()
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def make_key(
+        provider: str,
+        ioc_type: Optional[str],
+        query_type: Optional[str],
+        observable: str,
+        **kwargs,
+    ) -> CacheKey:
+        """
+        Return the cache key for a lookup.
+
+        Parameters
+        ----------
+        provider : str
+            Provider name
+        ioc_type : Optional[str]
+            IoC type
+        query_type : Optional[str]
+            Query sub-type
+        observable : str
+            IoC observable
+        kwargs :
+            Any additional parameters that affect the lookup result.
+
+        Returns
+        -------
+        CacheKey
+            Tuple of key values.
+
+        """
+        params = json.dumps(kwargs, sort_keys=True, default=str) if kwargs else ""
+        return (provider, ioc_type or "", query_type or "", observable, params)
+
+    def get_ttl(self, provider: str) -> Optional[float]:
+        """Return the time-to-live in seconds for `provider`."""
+        return self.provider_ttl.get(provider, self.default_ttl)
+
+    def get(self, key: CacheKey) -> Optional[Any]:
+        """
+        Return the cached result for `key`.
+
+        Parameters
+        ----------
+        key : CacheKey
+            The key returned by `make_key`
+
+        Returns
+        -------
+        Optional[Any]
+            A copy of the cached LookupResult or None if the
+            result is not cached or has expired.
+
+        """
+        with self._lock:
+            result = self._get_item(key, time.time())
+            if result is None:
+                self._misses[key[0]] += 1
+            else:
+                self._hits[key[0]] += 1
+            return result
+
+    def put(self, key: CacheKey, result: Any):
+        """
+        Add a lookup result to the cache.
+
+        Parameters
+        ----------
+        key : CacheKey
+            The key returned by `make_key`
+        result : Any
+            The LookupResult to store.
+
+        """
+        ttl = self.get_ttl(key[0])
+        if ttl is not None and ttl <= 0:
+            return
+        now = time.time()
+        expires = now + ttl if ttl is not None else None
+        with self._lock:
+            self._set_item(key, result, now, expires)
+
+    @property
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Return cache hit and miss counts for each provider.
+
+        Returns
+        -------
+        Dict[str, Dict[str, int]]
+            Dictionary of provider names and hit/miss counts.
+
+        """
+        return {
+            provider: {"hits": self._hits[provider], "misses": self._misses[provider]}
+            for provider in sorted(set(self._hits) | set(self._misses))
+        }
+
+    def reset_stats(self):
+        """Reset the cache hit and miss counts."""
+        with self._lock:
+            self._hits.clear()
+            self._misses.clear()
+
+    @abc.abstractmethod
+    def clear(self, provider: Optional[str] = None):
+        """
+        Remove cached results.
+
+        Parameters
+        ----------
+        provider : Optional[str], optional
+            Only remove results for this provider, by default None
+            (remove all results).
+
+        """
+
+    @abc.abstractmethod
+    def __len__(self) -> int:
+        """Return the number of cached items."""
+
+    @abc.abstractmethod
+    def _get_item(self, key: CacheKey, now: float) -> Optional[Any]:
+        """Return an unexpired item and mark it as recently used."""
+
+    @abc.abstractmethod
+    def _set_item(self, key: CacheKey, result: Any, now: float, expires):
+        """Store an item, evicting least recently used items if needed."""
+
+
+@export
+class MemoryTIResultCache(TIResultCache):
+    """In-memory LRU TI lookup result cache."""
+
+    def __init__(
+        self,
+        max_size: int = 256,
+        default_ttl: TTLType = None,
+        provider_ttl: Optional[Dict[str, TTLType]] = None,
+    ):
+        """
+        Initialize the cache.
+
+        Parameters
+        ----------
+        max_size : int, optional
+            The maximum number of results to store. Least recently used
+            results are evicted when this is exceeded, by default 256.
+        default_ttl : Union[int, float, timedelta, None], optional
+            The default time-to-live for cached results (in seconds
+            or as a timedelta), by default None (results do not expire).
+        provider_ttl : Optional[Dict[str, Union[int, float, timedelta]]], optional
+            Time-to-live values for individual providers, keyed by
+            provider name, by default None.
+
+        """
+        super().__init__(max_size, default_ttl, provider_ttl)
+        self._items: "OrderedDict[CacheKey, Tuple[Any, Optional[float]]]" = (
+            OrderedDict()
+        )
+
+    def clear(self, provider: Optional[str] = None):
+        """
+        Remove cached results.
+
+        Parameters
+        ----------
+        provider : Optional[str], optional
+            Only remove results for this provider, by default None
+            (remove all results).
+
+        """
+        with self._lock:
+            if provider is None:
+                self._items.clear()
+                return
+            for key in [key for key in self._items if key[0] == provider]:
+                del self._items[key]
+
+    def __len__(self) -> int:
+        """Return the number of cached items."""
+        return len(self._items)
+
+    def _get_item(self, key: CacheKey, now: float) -> Optional[Any]:
+        item = self._items.get(key)
+        if item is None:
+            return None
+        result, expires = item
+        if expires is not None and expires < now:
+            del self._items[key]
+            return None
+        self._items.move_to_end(key)
+        return copy.copy(result)
+
+    def _set_item(self, key: CacheKey, result: Any, now: float, expires):
+        del now
+        self._items[key] = (copy.copy(result), expires)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+
+@export
+class SqliteTIResultCache(TIResultCache):
+    """
+    Persistent TI lookup result cache stored in a SQLite database.
+
+    Notes
+    -----
+    Results are stored as pickled objects. You should only use
+    a cache file that is writable by you.
+
+    """
+
+    _DEFAULT_PATH = str(Path("~").expanduser().joinpath(".msticpy", "ti_cache.db"))
+
+    _CREATE_TABLE = """
+        CREATE TABLE IF NOT EXISTS ti_results (
+            provider TEXT NOT NULL,
+            ioc_type TEXT NOT NULL,
+            query_type TEXT NOT NULL,
+            observable TEXT NOT NULL,
+            params TEXT NOT NULL,
+            result BLOB NOT NULL,
+            expires REAL,
+            last_access REAL NOT NULL,
+            PRIMARY KEY (provider, ioc_type, query_type, observable, params)
+        )
+    """
+    _CREATE_INDEX = """
+        CREATE INDEX IF NOT EXISTS ix_ti_results_access
+        ON ti_results (last_access)
+    """
+    _KEY_WHERE = (
+        "provider = ? AND ioc_type = ? AND query_type = ? "
+        "AND observable = ? AND params = ?"
+    )
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        max_size: int = 100000,
+        default_ttl: TTLType = timedelta(days=1),
+        provider_ttl: Optional[Dict[str, TTLType]] = None,
+    ):
+        """
+        Initialize the cache.
+
+        Parameters
+        ----------
+        path : Optional[str], optional
+            Path to the SQLite database file, by default
+            "~/.msticpy/ti_cache.db". The file is created if it does
+            not exist.
+        max_size : int, optional
+            The maximum number of results to store. Least recently used
+            results are evicted when this is exceeded, by default 100000.
+        default_ttl : Union[int, float, timedelta, None], optional
+            The default time-to-live for cached results (in seconds
+            or as a timedelta), by default 1 day.
+        provider_ttl : Optional[Dict[str, Union[int, float, timedelta]]], optional
+            Time-to-live values for individual providers, keyed by
+            provider name, by default None.
+
+        """
+        super().__init__(max_size, default_ttl, provider_ttl)
+        self.path = str(Path(path or self._DEFAULT_PATH).expanduser())
+        if self.path != ":memory:":
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(self._CREATE_TABLE)
+            self._conn.execute(self._CREATE_INDEX)
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+
+    def clear(self, provider: Optional[str] = None):
+        """
+        Remove cached results.
+
+        Parameters
+        ----------
+        provider : Optional[str], optional
+            Only remove results for this provider, by default None
+            (remove all results).
+
+        """
+        with self._lock, self._conn:
+            if provider is None:
+                self._conn.execute("DELETE FROM ti_results")
+            else:
+                self._conn.execute(
+                    "DELETE FROM ti_results WHERE provider = ?", (provider,)
+                )
+
+    def remove_expired(self):
+        """Remove expired results from the cache."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM ti_results WHERE expires IS NOT NULL AND expires < ?",
+                (time.time(),),
+            )
+
+    def __len__(self) -> int:
+        """Return the number of cached items."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM ti_results").fetchone()[0]
+
+    def _get_item(self, key: CacheKey, now: float) -> Optional[Any]:
+        row = self._conn.execute(
+            f"SELECT result, expires FROM ti_results WHERE {self._KEY_WHERE}",  # nosec
+            key,
+        ).fetchone()
+        if row is None:
+            return None
+        with self._conn:
+            if row[1] is not None and row[1] < now:
+                self._conn.execute(
+                    f"DELETE FROM ti_results WHERE {self._KEY_WHERE}", key  # nosec
+                )
+                return None
+            self._conn.execute(
+                f"UPDATE ti_results SET last_access = ? WHERE {self._KEY_WHERE}",  # nosec
+                (now, *key),
+            )
+        return pickle.loads(row[0])  # nosec
+
+    def _set_item(self, key: CacheKey, result: Any, now: float, expires):
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO ti_results VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (*key, pickle.dumps(result), expires, now),
+            )
+            excess = (
+                self._conn.execute("SELECT COUNT(*) FROM ti_results").fetchone()[0]
+                - self.max_size
+            )
+            if excess > 0:
+                self._conn.execute(
+                    """
+                    DELETE FROM ti_results WHERE rowid IN (
+                        SELECT rowid FROM ti_results
+                        ORDER BY last_access LIMIT ?
+                    )
+                    """,
+                    (excess,),
+                )
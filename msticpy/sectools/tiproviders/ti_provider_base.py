@@ -19,10 +19,11 @@ import math  # noqa
 import pprint
 import re
 from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
-from functools import lru_cache, singledispatch, total_ordering
+from functools import lru_cache, singledispatch, total_ordering, wraps
 from ipaddress import IPv4Address, IPv6Address, ip_address
-from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Union
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
 from urllib.parse import quote_plus
 
 import attr
@@ -31,8 +32,10 @@ from urllib3.exceptions import LocationParseError
 from urllib3.util import parse_url
 
 from ..._version import VERSION
+from ...common.rate_limiter import RateLimiter
 from ...common.utility import export
 from ..iocextract import IoCExtract, IoCType
+from .result_cache import MemoryTIResultCache, TIResultCache
 
 __version__ = VERSION
 __author__ = "Ian Hellen"
@@ -223,11 +226,26 @@ class TIProvider(ABC):
 
     _IOC_QUERIES: Dict[str, Any] = {}
 
+    # Default number of concurrent lookups and requests/sec rate limit
+    # used by `lookup_iocs`. These can be overridden by the provider
+    # "MaxConcurrency" and "RateLimit" settings args.
+    _MAX_CONCURRENCY = 1
+    _RATE_LIMIT: Optional[float] = None
+
     # pylint: disable=unused-argument
     def __init__(self, **kwargs):
         """Initialize the provider."""
         self._supported_types: Set[IoCType] = set()
         self.description: Optional[str] = None
+        self.result_cache: Optional[TIResultCache] = MemoryTIResultCache(max_size=256)
+        self.max_concurrency = int(kwargs.get("MaxConcurrency", self._MAX_CONCURRENCY))
+        rate_limit = kwargs.get("RateLimit", self._RATE_LIMIT)
+        self.rate_limit: Optional[float] = (
+            float(rate_limit) if rate_limit is not None else None
+        )
+        # shared by calls to lookup_iocs so that the rate limit
+        # applies across calls
+        self._rate_limiter = RateLimiter(rate=self.rate_limit)
 
         self._supported_types = {
             IoCType.parse(ioc_type.split("-")[0]) for ioc_type in self._IOC_QUERIES
@@ -291,23 +309,69 @@ class TIProvider(ABC):
             If not specified the default record type for the IoC type
             will be returned.
 
+        Other Parameters
+        ----------------
+        max_concurrency : int, optional
+            The maximum number of lookups to run concurrently,
+            by default the provider `max_concurrency` setting (1).
+        rate_limit : float, optional
+            The maximum number of lookups to submit per second in this
+            call, by default the provider `rate_limit` setting (no limit).
+            The provider rate limit applies across calls to `lookup_iocs`.
+
         Returns
         -------
         pd.DataFrame
             DataFrame of results.
 
+        Notes
+        -----
+        If `max_concurrency` is greater than 1, lookups are executed
+        using a thread pool. Results are returned in the same order
+        as the input items.
+
         """
-        results = []
-        for observable, ioc_type in generate_items(data, obs_col, ioc_type_col):
-            if not observable:
-                continue
-            item_result = self.lookup_ioc(
-                ioc=observable, ioc_type=ioc_type, query_type=query_type
-            )
-            results.append(pd.Series(attr.asdict(item_result)))
+        items = [
+            (observable, ioc_type)
+            for observable, ioc_type in generate_items(data, obs_col, ioc_type_col)
+            if observable
+        ]
+        max_concurrency = int(kwargs.get("max_concurrency", self.max_concurrency))
+        rate_limiter = (
+            RateLimiter(rate=kwargs["rate_limit"])
+            if "rate_limit" in kwargs
+            else self._rate_limiter
+        )
+
+        def _lookup_item(item: Tuple[str, str]) -> LookupResult:
+            rate_limiter.acquire()
+            return self.lookup_ioc(ioc=item[0], ioc_type=item[1], query_type=query_type)
+
+        if max_concurrency > 1 and len(items) > 1:
+            self._prepare_concurrency(max_concurrency)
+            with ThreadPoolExecutor(
+                max_workers=max_concurrency,
+                thread_name_prefix=f"{self.__class__.__name__}_lookup",
+            ) as executor:
+                # executor.map returns results in input order
+                lookup_results = list(executor.map(_lookup_item, items))
+        else:
+            lookup_results = [_lookup_item(item) for item in items]
 
+        results = [pd.Series(attr.asdict(result)) for result in lookup_results]
         return pd.DataFrame(data=results).rename(columns=LookupResult.column_map())
 
+    def _prepare_concurrency(self, max_concurrency: int):
+        """
+        Prepare provider resources for concurrent lookups.
+
+        Parameters
+        ----------
+        max_concurrency : int
+            The number of lookups that will run concurrently.
+
+        """
+
     @abc.abstractmethod
     def parse_results(self, response: LookupResult) -> Tuple[bool, TISeverity, Any]:
         """
@@ -474,6 +538,51 @@ class TIProvider(ABC):
         return result
 
 
+def cached_lookup(func: Callable) -> Callable:
+    """
+    Decorate a provider `lookup_ioc` method to use the provider result cache.
+
+    Parameters
+    ----------
+    func : Callable
+        The `lookup_ioc` method.
+
+    Returns
+    -------
+    Callable
+        The wrapped method.
+
+    Notes
+    -----
+    Results are cached using the provider `result_cache`.
+    Only successful lookups are cached.
+
+    """
+
+    @wraps(func)
+    def _lookup_with_cache(
+        self, ioc: str, ioc_type: str = None, query_type: str = None, **kwargs
+    ) -> LookupResult:
+        if self.result_cache is None:
+            return func(self, ioc, ioc_type, query_type, **kwargs)
+        ioc_type = ioc_type or self.resolve_ioc_type(ioc)
+        cache_params = {
+            key: val for key, val in kwargs.items() if key != "provider_name"
+        }
+        cache_key = self.result_cache.make_key(
+            self.__class__.__name__, ioc_type, query_type, ioc, **cache_params
+        )
+        result = self.result_cache.get(cache_key)
+        if result is not None:
+            return result
+        result = func(self, ioc, ioc_type, query_type, **kwargs)
+        if result.status == TILookupStatus.ok.value:
+            self.result_cache.put(cache_key, result)
+        return result
+
+    return _lookup_with_cache
+
+
 # slightly stricter than normal URL regex to exclude '() from host string
 _HTTP_STRICT_REGEX = r"""
     (?P<protocol>(https?|ftp|telnet|ldap|file)://)
@@ -4,11 +4,13 @@
 # license information.
 # --------------------------------------------------------------------------
 """vtlookup test class."""
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import unittest
 
 import pytest_check as check
 
+from msticpy.common.utility import process_chunks
 from msticpy.nbtools import utils
 
 
@@ -90,3 +92,29 @@ def test_format_py_identifier():
     check.equal(utils.valid_pyname("has space"), "has_space")
     check.equal(utils.valid_pyname("has-dash"), "has_dash")
     check.equal(utils.valid_pyname("10.starts,digit$"), "n_10_starts_digit_")
+
+
+def _chunk_sum(items, offset):
+    """Return the chunk items and their sum plus `offset`."""
+    return list(items), sum(items) + offset
+
+
+def test_process_chunks():
+    """Test calling a function for chunks of items."""
+    items = list(range(10))
+    check.equal(process_chunks(_chunk_sum, items, 1), [(items, 46)])
+    # not enough items to use worker processes
+    check.equal(
+        process_chunks(_chunk_sum, items, 1, n_jobs=2, min_items=20), [(items, 46)]
+    )
+    results = process_chunks(_chunk_sum, items, 1, n_jobs=3)
+    check.equal([chunk for chunk, _ in results], [items[:4], items[4:8], items[8:]])
+    check.equal(sum(total for _, total in results), 48)
+    results = process_chunks(_chunk_sum, items, 0, n_jobs=3, min_chunk_size=6)
+    check.equal(results, [(items[:6], 15), (items[6:], 30)])
+    # an existing executor is always used
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        results = process_chunks(
+            _chunk_sum, items, 0, n_jobs=2, min_items=20, executor=executor
+        )
+    check.equal(results, [(items[:5], 10), (items[5:], 35)])
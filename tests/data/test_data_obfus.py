@@ -226,3 +226,71 @@ def test_pandas_accessor():
                 check.not_equal(row[mapped_col], out_df.loc[idx][mapped_col])
             else:
                 check.equal(row[mapped_col], out_df.loc[idx][mapped_col])
+
+
+def test_mask_df_distinct_values():
+    """Test that each distinct value is obfuscated consistently."""
+    win_procs = pd.read_pickle(Path(TEST_DATA_PATH).joinpath("win_proc_test.pkl"))
+    col_map = dict(data_obfus.OBFUS_COL_MAP)
+    col_map.update(
+        {"CommandLine": "str", "NewProcessName": "\\", "SubjectLogonId": "str"}
+    )
+
+    out_df = data_obfus.mask_df(win_procs, column_map=col_map)
+    for col in col_map:
+        if col not in win_procs.columns:
+            continue
+        # identical input values map to identical outputs
+        value_map = pd.DataFrame({"src": win_procs[col], "dest": out_df[col]})
+        check.is_true((value_map.groupby("src")["dest"].nunique() <= 1).all())
+    check.equal(
+        list(out_df["CommandLine"].head(5)),
+        [data_obfus.hash_string(val) for val in win_procs["CommandLine"].head(5)],
+    )
+    check.equal(
+        list(out_df["NewProcessName"].head(5)),
+        [
+            data_obfus.hash_item(val, "\\")
+            for val in win_procs["NewProcessName"].head(5)
+        ],
+    )
+
+    # values that compare equal but have different types are hashed separately
+    mixed_df = pd.DataFrame({"mixed": [1, 1.0, True, "1", None, 1]})
+    mixed_out = data_obfus.mask_df(mixed_df, column_map={"mixed": "str"})
+    check.equal(
+        list(mixed_out["mixed"]),
+        [data_obfus.hash_string(val) for val in mixed_df["mixed"]],
+    )
+
+    par_df = data_obfus.mask_df(win_procs, column_map=col_map, n_jobs=2)
+    check.is_true(par_df.equals(out_df))
+
+
+def _mask_value(value, col_type):
+    """Obfuscate a single value (as mask_df did for each row)."""
+    map_func = data_obfus.MAP_FUNCS.get(col_type)
+    if map_func is not None and callable(map_func):
+        return map_func(value)
+    return data_obfus.hash_item(value, col_type)
+
+
+def test_mask_df_null_values():
+    """Test columns containing null values are masked row by row."""
+    null_df = pd.DataFrame(
+        {
+            "float": [1.5, None, 2.5, 1.5, None],
+            "date": pd.to_datetime(
+                ["2021-01-01", None, "2021-01-02", "2021-01-01", "2021-01-03"]
+            ),
+            "int": [3, 4, 3, 5, 4],
+            "str": ["a", None, "b", "a", float("nan")],
+        }
+    )
+    col_map = {"float": "str", "date": "str", "int": "str", "str": "str"}
+    out_df = data_obfus.mask_df(null_df, column_map=col_map)
+    for col, col_type in col_map.items():
+        check.equal(
+            list(out_df[col]),
+            [_mask_value(val, col_type) for val in null_df[col]],
+        )
@@ -4,14 +4,20 @@
 # license information.
 # --------------------------------------------------------------------------
 """datq query test class."""
+import random
+import re
+import threading
+import time
 import unittest
 import warnings
+from collections import deque
 from datetime import datetime
 from functools import partial
 from pathlib import Path
 from typing import Any, Dict, Iterable, Optional, Tuple, Union
 
 import pandas as pd
+from msticpy.common.exceptions import MsticpyException
 from msticpy.data.data_providers import DriverBase, QueryContainer, QueryProvider
 from msticpy.data.query_source import QuerySource
 
@@ -58,6 +64,59 @@ class UTDataDriver(DriverBase):
         return self.svc_queries
 
 
+class _SlowFlakyDriver(UTDataDriver):
+    """Test driver with query latency that fails the first query attempt."""
+
+    _QUERY_DELAY = 0.1
+
+    def __init__(self, **kwargs):
+        """Initialize new instance."""
+        super().__init__(**kwargs)
+        self._lock = threading.Lock()
+        self.attempts: Dict[str, int] = {}
+        self.fail_query: Optional[str] = None
+        self.no_data_query: Optional[str] = None
+
+    def query(
+        self, query: str, query_source: QuerySource = None, **kwargs
+    ) -> Union[pd.DataFrame, Any]:
+        """Test method."""
+        with self._lock:
+            self.attempts[query] = self.attempts.get(query, 0) + 1
+            attempt = self.attempts[query]
+        time.sleep(self._QUERY_DELAY)
+        if attempt == 1 and query == self.fail_query:
+            raise ConnectionError("Query failed")
+        if query == self.no_data_query:
+            return None
+        return super().query(query, query_source, **kwargs)
+
+
+class _RowCapDriver(UTDataDriver):
+    """Test driver that returns events in the query time range up to a row cap."""
+
+    def __init__(self, events: pd.DataFrame, row_cap: int, max_span: pd.Timedelta):
+        """Initialize new instance."""
+        super().__init__()
+        self.events = events
+        self.row_cap = row_cap
+        self.max_span = max_span
+
+    def query(
+        self, query: str, query_source: QuerySource = None, **kwargs
+    ) -> Union[pd.DataFrame, Any]:
+        """Test method."""
+        del query_source, kwargs
+        start, end = (
+            pd.Timestamp(time_str.rstrip("Z"))
+            for time_str in re.findall(r"datetime\(([^)]+)\)", query)
+        )
+        if end - start > self.max_span:
+            raise TimeoutError("Query timed out")
+        time_gen = self.events["TimeGenerated"]
+        return self.events[(time_gen >= start) & (time_gen <= end)].head(self.row_cap)
+
+
 _TEST_QUERIES = [
     {
         "name": "test_query1",
@@ -381,3 +440,193 @@ class TestDataQuery(unittest.TestCase):
             self.assertIn(e_time.isoformat(sep="T") + "Z", queries[idx])
         self.assertIn(start.isoformat(sep="T") + "Z", queries[0])
         self.assertIn(end.isoformat(sep="T") + "Z", queries[-1])
+
+    def test_split_queries_concurrent(self):
+        """Test split queries executed concurrently with retries."""
+        start = datetime.utcnow() - pd.Timedelta("10H")
+        end = datetime.utcnow() + pd.Timedelta("5min")
+        expected_queries = self.la_provider.all_queries.list_alerts(
+            "print", start=start, end=end, split_query_by="1H"
+        ).split("\n\n")
+
+        driver = _SlowFlakyDriver()
+        driver.connect("testuri")
+        driver.fail_query = expected_queries[1]
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=UserWarning)
+            qry_prov = QueryProvider(data_environment="LogAnalytics", driver=driver)
+        qry_prov._SPLIT_RETRY_DELAY = 0
+
+        exec_start = time.perf_counter()
+        result_df = qry_prov.all_queries.list_alerts(
+            start=start,
+            end=end,
+            split_query_by="1H",
+            max_concurrency=5,
+            max_retries=1,
+        )
+        elapsed = time.perf_counter() - exec_start
+        # results are returned in time order
+        self.assertEqual(list(result_df["query"]), expected_queries)
+        self.assertLess(elapsed, driver._QUERY_DELAY * len(expected_queries))
+
+        stats = qry_prov.split_query_stats
+        self.assertEqual(len(stats), len(expected_queries))
+        self.assertEqual(stats["Attempts"].sum(), len(expected_queries) + 1)
+        self.assertTrue((stats["Rows"] == 1).all())
+        self.assertTrue((stats["Duration"] >= driver._QUERY_DELAY).all())
+        self.assertTrue(stats["Start"].is_monotonic_increasing)
+
+        # no retries by default - the failure is raised
+        driver.attempts.clear()
+        with self.assertRaises(ConnectionError):
+            qry_prov.all_queries.list_alerts(start=start, end=end, split_query_by="1H")
+
+        # non-DataFrame results are passed on (and not retried by default)
+        driver.attempts.clear()
+        driver.fail_query = None
+        driver.no_data_query = expected_queries[2]
+        result_df = qry_prov.all_queries.list_alerts(
+            start=start, end=end, split_query_by="1H", max_concurrency=5
+        )
+        self.assertEqual(
+            list(result_df["query"]),
+            expected_queries[:2] + expected_queries[3:],
+        )
+        self.assertEqual(sum(driver.attempts.values()), len(expected_queries))
+        self.assertEqual(list(qry_prov.split_query_stats["Status"]).count("failed"), 1)
+
+    def test_split_queries_adaptive(self):
+        """Test adaptive split queries with a row-capped driver."""
+        start = pd.Timestamp("2021-03-01")
+        end = start + pd.Timedelta("2D")
+        # sparse background events plus a burst of events in one hour
+        events = pd.DataFrame(
+            {
+                "TimeGenerated": list(pd.date_range(start, end, freq="30min"))
+                + list(
+                    pd.date_range(start + pd.Timedelta("20H"), periods=500, freq="7s")
+                )
+            }
+        )
+        events = events.sort_values("TimeGenerated", ignore_index=True)
+        driver = _RowCapDriver(events, row_cap=50, max_span=pd.Timedelta("1D"))
+        driver.connect("testuri")
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=UserWarning)
+            qry_prov = QueryProvider(data_environment="LogAnalytics", driver=driver)
+
+        # fixed split loses rows
+        with self.assertWarns(UserWarning):
+            result_df = qry_prov.all_queries.list_alerts(
+                start=start, end=end, split_query_by="4H", row_limit=50
+            )
+        self.assertLess(len(result_df), len(events))
+
+        for concurrency in (1, 4):
+            result_df = qry_prov.all_queries.list_alerts(
+                start=start,
+                end=end,
+                split_query_by="4H",
+                row_limit=50,
+                adaptive_split=True,
+                max_concurrency=concurrency,
+                max_retries=0,
+            )
+            self.assertTrue(
+                result_df["TimeGenerated"]
+                .reset_index(drop=True)
+                .equals(events["TimeGenerated"])
+            )
+            stats = qry_prov.split_query_stats
+            self.assertIn("bisected", stats["Status"].values)
+            self.assertNotIn("truncated", stats["Status"].values)
+            # small results cause time ranges to be widened
+            self.assertGreater(
+                (stats["End"] - stats["Start"]).max(), pd.Timedelta("4H")
+            )
+
+        # slices that fail are bisected
+        driver.row_cap = 1000
+        result_df = qry_prov.all_queries.list_alerts(
+            start=start,
+            end=end,
+            split_query_by="2D",
+            adaptive_split=True,
+            row_limit=1000,
+            max_retries=0,
+        )
+        self.assertEqual(len(result_df), len(events))
+        self.assertEqual(qry_prov.split_query_stats["Status"].iloc[0], "bisected")
+        self.assertTrue(pd.isna(qry_prov.split_query_stats["Rows"].iloc[0]))
+
+    def test_split_queries_adaptive_random(self):
+        """Test adaptive split queries with bursts of events at random times."""
+        rng = random.Random(42)
+        start = pd.Timestamp("2021-03-01")
+        end = start + pd.Timedelta("10D")
+        background = list(pd.date_range(start, end, freq="30min"))
+        for burst_idx in range(8):
+            burst_start = start + pd.Timedelta(
+                seconds=rng.randrange(0, 10 * 86400 - 2100)
+            )
+            events = pd.DataFrame(
+                {
+                    "TimeGenerated": background
+                    + list(pd.date_range(burst_start, periods=300, freq="7s"))
+                }
+            ).sort_values("TimeGenerated", ignore_index=True)
+            driver = _RowCapDriver(events, row_cap=50, max_span=pd.Timedelta("2D"))
+            driver.connect("testuri")
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", category=UserWarning)
+                qry_prov = QueryProvider(data_environment="LogAnalytics", driver=driver)
+            concurrency = 1 + burst_idx % 4
+            with self.subTest(burst_start=burst_start, concurrency=concurrency):
+                result_df = qry_prov.all_queries.list_alerts(
+                    start=start,
+                    end=end,
+                    split_query_by="1H",
+                    row_limit=50,
+                    adaptive_split=True,
+                    max_concurrency=concurrency,
+                    max_retries=0,
+                )
+                # no duplicated or missing rows
+                self.assertTrue(
+                    result_df["TimeGenerated"]
+                    .reset_index(drop=True)
+                    .equals(events["TimeGenerated"])
+                )
+                stats = qry_prov.split_query_stats
+                self.assertIn("bisected", stats["Status"].values)
+                self.assertNotIn("truncated", stats["Status"].values)
+                # no time range is queried more than once
+                self.assertFalse(stats.duplicated(["Start", "End"]).any())
+
+    def test_next_split_range(self):
+        """Test only adjacent, mergeable time ranges are combined."""
+        start = pd.Timestamp("2021-03-01")
+        ranges = QueryProvider._calc_split_ranges(
+            start, start + pd.Timedelta("6H"), pd.Timedelta("1H")
+        )
+        first, second = QueryProvider._bisect_range(*ranges[1])
+        # ranges[0] and ranges[3] are in flight
+        pending = deque(
+            [(*first, 1, False), (*second, 1, False)]
+            + [(*q_range, 1, True) for q_range in ranges[2:3] + ranges[4:]]
+        )
+        self.assertEqual(QueryProvider._next_split_range(pending, 4), (*first, 1))
+        self.assertEqual(QueryProvider._next_split_range(pending, 4), (*second, 1))
+        self.assertEqual(QueryProvider._next_split_range(pending, 4), (*ranges[2], 1))
+        self.assertEqual(
+            QueryProvider._next_split_range(pending, 4),
+            (ranges[4][0], ranges[5][1], 2),
+        )
+        self.assertFalse(pending)
+
+        QueryProvider._check_split_coverage(ranges, ranges[::-1])
+        with self.assertRaises(MsticpyException):
+            QueryProvider._check_split_coverage(ranges, ranges[:2] + ranges[3:])
+        with self.assertRaises(MsticpyException):
+            QueryProvider._check_split_coverage(ranges, ranges + [first])
@@ -0,0 +1,157 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# --------------------------------------------------------------------------
+"""Query result cache tests."""
+import time
+import warnings
+from datetime import datetime
+
+import pandas as pd
+import pytest
+import pytest_check as check
+
+from msticpy.data.data_providers import QueryProvider
+from msticpy.data.query_cache import QueryResultCache
+
+from .test_dataqueries import UTDataDriver
+
+__author__ = "Ian Hellen"
+
+# pylint: disable=redefined-outer-name, protected-access
+
+
+class _CountingDriver(UTDataDriver):
+    """Test driver that counts queries."""
+
+    def __init__(self, **kwargs):
+        """Initialize new instance."""
+        super().__init__(**kwargs)
+        self.query_count = 0
+
+    def query(self, query, query_source=None, **kwargs):
+        """Test method."""
+        self.query_count += 1
+        return super().query(query, query_source, **kwargs)
+
+
+@pytest.fixture
+def qry_prov(tmp_path):
+    """Return a QueryProvider with a query cache."""
+    driver = _CountingDriver()
+    driver.connect("testuri")
+    driver.current_connection = "testuri"
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=UserWarning)
+        return QueryProvider(
+            data_environment="LogAnalytics",
+            driver=driver,
+            query_cache=str(tmp_path.joinpath("cache")),
+        )
+
+
+def test_cache_round_trip(tmp_path):
+    """Test storing and retrieving results."""
+    cache = QueryResultCache(path=str(tmp_path))
+    data = pd.DataFrame(
+        {
+            "TimeGenerated": pd.date_range("2021-01-01", periods=5, freq="1H"),
+            "Computer": [f"host{idx}" for idx in range(5)],
+            "Count": range(5),
+        }
+    )
+    dyn_data = data.assign(Props=[{"a": idx, "b": [idx]} for idx in range(5)])
+    key1 = cache.make_key("LogAnalytics", "conn", "query1")
+    key2 = cache.make_key("LogAnalytics", "conn", "query2")
+    check.not_equal(key1, key2)
+    check.not_equal(key1, cache.make_key("LogAnalytics", "conn2", "query1"))
+
+    check.is_none(cache.get(key1))
+    cache.put(key1, data)
+    cache.put(key2, dyn_data)
+    cache.put(cache.make_key("LogAnalytics", "conn", "query3"), "not a DataFrame")
+    check.equal(len(cache), 2)
+    check.is_true(data.equals(cache.get(key1)))
+    # dynamic (dict) columns are stored without conversion
+    check.is_true(dyn_data.equals(cache.get(key2)))
+    check.equal(cache.stats, {"hits": 2, "misses": 1})
+
+    cache.clear()
+    check.equal(len(cache), 0)
+
+
+def test_cache_eviction(tmp_path):
+    """Test least-recently used results are removed."""
+    data = pd.DataFrame({"Value": [str(idx) * 50 for idx in range(2000)]})
+    cache = QueryResultCache(path=str(tmp_path))
+    cache.put("size_test", data)
+    item_size = cache.size
+    cache.clear()
+
+    cache = QueryResultCache(path=str(tmp_path), max_size_mb=item_size * 3.5 / 2**20)
+    for idx in range(3):
+        cache.put(f"key{idx}", data)
+        time.sleep(0.01)
+    # access the first item so that it is the most recently used
+    check.is_not_none(cache.get("key0"))
+    cache.put("key3", data)
+    check.equal(len(cache), 3)
+    check.is_none(cache.get("key1"))
+    check.is_not_none(cache.get("key0"))
+    check.less_equal(cache.size, cache.max_size)
+
+    cache = QueryResultCache(path=str(tmp_path), max_age=pd.Timedelta("1ms"))
+    time.sleep(0.01)
+    check.is_none(cache.get("key0"))
+
+
+def test_query_provider_cache(qry_prov):
+    """Test query functions use the result cache."""
+    driver = qry_prov._query_provider
+    start = datetime(2021, 1, 1)
+    end = datetime(2021, 1, 2)
+
+    result1 = qry_prov.all_queries.list_alerts(start=start, end=end)
+    result2 = qry_prov.all_queries.list_alerts(start=start, end=end)
+    check.equal(driver.query_count, 1)
+    check.is_true(result1.equals(result2))
+    qry_prov.all_queries.list_alerts(start=start, end=end, use_cache=False)
+    check.equal(driver.query_count, 2)
+    qry_prov.all_queries.list_alerts(start=start, end=end + pd.Timedelta("1H"))
+    check.equal(driver.query_count, 3)
+
+    # ad hoc queries and queries that end in the future are not cached
+    qry_prov.exec_query("SecurityAlert | take 10")
+    qry_prov.exec_query("SecurityAlert | take 10")
+    check.equal(driver.query_count, 5)
+    future_end = datetime.utcnow() + pd.Timedelta("1D")
+    qry_prov.all_queries.list_alerts(start=start, end=future_end)
+    qry_prov.all_queries.list_alerts(start=start, end=future_end)
+    check.equal(driver.query_count, 7)
+    check.equal(len(qry_prov.query_cache), 2)
+
+    # split queries cache each time range
+    qry_prov.all_queries.list_alerts(start=start, end=end, split_query_by="6H")
+    check.equal(driver.query_count, 11)
+    result = qry_prov.all_queries.list_alerts(start=start, end=end, split_query_by="6H")
+    check.equal(driver.query_count, 11)
+    check.equal(len(result), 4)
+    check.is_true((qry_prov.split_query_stats["Attempts"] == 0).all())
+
+    # a different connection does not use the cached results
+    driver.connect("testuri2")
+    driver.current_connection = "testuri2"
+    qry_prov.all_queries.list_alerts(start=start, end=end)
+    check.equal(driver.query_count, 12)
+
+    # drivers without a connection identity are not cached
+    driver.current_connection = None
+    qry_prov.all_queries.list_alerts(start=start, end=end)
+    qry_prov.all_queries.list_alerts(start=start, end=end)
+    check.equal(driver.query_count, 14)
+
+    driver.current_connection = "testuri2"
+    qry_prov.query_cache = None
+    qry_prov.all_queries.list_alerts(start=start, end=end)
+    check.equal(driver.query_count, 15)
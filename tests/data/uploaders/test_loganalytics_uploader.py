@@ -5,6 +5,8 @@
 # --------------------------------------------------------------------------
 """Tests for the LogAnlaytics Uploader class."""
 
+import json
+import threading
 from pathlib import Path
 from unittest.mock import patch
 import pytest
@@ -12,6 +14,7 @@ import pytest
 from requests.models import Response
 import pandas as pd
 
+from msticpy.data.uploaders import loganalytics_uploader
 from msticpy.data.uploaders.loganalytics_uploader import LAUploader
 from msticpy.common.exceptions import MsticpyConnectionError
 
@@ -75,3 +78,63 @@ def test_upload_fails(mock_put, la_uploader):
     with pytest.raises(MsticpyConnectionError) as err:
         la_uploader.upload_df(data, "test")
         assert "LogAnalytics data upload failed with code 503" in str(err.value)
+
+
+def _post_responses(status_codes):
+    """Return a requests.post side effect returning `status_codes` then 200."""
+    status_codes = list(status_codes)
+    lock = threading.Lock()
+
+    def _post(uri, data, headers):
+        del uri, data, headers
+        response = Response()
+        with lock:
+            response.status_code = status_codes.pop(0) if status_codes else 200
+        if response.status_code != 200:
+            response.headers["Retry-After"] = "0"
+        return response
+
+    return _post
+
+
+@patch("requests.post")
+def test_batched_upload(mock_post, monkeypatch):
+    """Check DataFrame is uploaded in correctly sized batches."""
+    monkeypatch.setattr(loganalytics_uploader, "_MAX_BATCH_SIZE", 20000)
+    mock_post.side_effect = _post_responses([429])
+    uploader = LAUploader(
+        workspace="1234", workspace_secret="password", max_concurrency=3
+    )
+    data = pd.read_csv(Path(_TEST_DATA).joinpath("syslog_data.csv"))
+    uploader.upload_df(data, "test_table")
+
+    events = []
+    bodies = set()
+    for call in mock_post.call_args_list:
+        uri, body, headers = call.args[0], call.kwargs["data"], call.kwargs["headers"]
+        assert uri == (
+            "https://1234.ods.opinsights.azure.com/api/logs?api-version=2016-04-01"
+        )
+        assert headers["Log-Type"] == "test_table"
+        assert headers["Authorization"].startswith("SharedKey 1234:")
+        assert len(body) <= 20000
+        if body not in bodies:
+            bodies.add(body)
+            events.extend(json.loads(body))
+    # the throttled batch is sent twice
+    assert mock_post.call_count == len(bodies) + 1
+    assert len(bodies) > 1
+    expected = [row.astype(str).to_dict() for _, row in data.iterrows()]
+    assert sorted(events, key=json.dumps) == sorted(expected, key=json.dumps)
+
+
+@patch("requests.post")
+def test_upload_retries_fail(mock_post):
+    """Check upload fails if the API is still throttling after retries."""
+    mock_post.side_effect = _post_responses([429, 503, 503, 503])
+    uploader = LAUploader(workspace="1234", workspace_secret="password")
+    data = pd.read_csv(Path(_TEST_DATA).joinpath("syslog_data.csv"))
+    with pytest.raises(MsticpyConnectionError) as err:
+        uploader.upload_df(data, "test")
+    assert "failed with code 503" in str(err.value)
+    assert mock_post.call_count == uploader.max_retries + 1
@@ -0,0 +1,158 @@
+import math
+import random
+import unittest
+
+import numpy as np
+
+from msticpy.analysis.anomalous_sequence.model import Model
+from msticpy.analysis.anomalous_sequence.utils import (
+    cmds_only,
+    cmds_params_only,
+    cmds_params_values,
+)
+from msticpy.analysis.anomalous_sequence.utils.compiled_model import CompiledModel
+from msticpy.analysis.anomalous_sequence.utils.data_structures import Cmd
+
+
+def _random_sessions(session_type, n_sessions, rng):
+    cmds = ["Set-User", "Set-Mailbox", "New-Mailbox", "Get-User", "Remove-User"]
+    params = ["Identity", "City", "Name", "Force", "AuditEnabled"]
+    sessions = []
+    for _ in range(n_sessions):
+        session = []
+        for _ in range(rng.randint(1, 10)):
+            cmd = rng.choice(cmds)
+            pars = set(rng.sample(params, rng.randint(0, 3)))
+            if session_type == "cmds_only":
+                session.append(cmd)
+            elif session_type == "cmds_params_only":
+                session.append(Cmd(cmd, pars))
+            else:
+                session.append(Cmd(cmd, {par: rng.choice("abc") for par in pars}))
+        sessions.append(session)
+    return sessions
+
+
+class TestCompiledModel(unittest.TestCase):
+    def setUp(self):
+        self.rng = random.Random(42)
+        self.modules = {
+            "cmds_only": cmds_only,
+            "cmds_params_only": cmds_params_only,
+            "cmds_params_values": cmds_params_values,
+        }
+
+    def _get_model(self, session_type):
+        sessions = _random_sessions(session_type, 200, self.rng)
+        modellable_params = None
+        if session_type == "cmds_params_values":
+            modellable_params = {"Identity", "City"}
+        model = Model(sessions=sessions, modellable_params=modellable_params)
+        model.train()
+        prob_kwargs = {}
+        if session_type != "cmds_only":
+            prob_kwargs["param_cond_cmd_probs"] = model.param_cond_cmd_probs
+        if session_type == "cmds_params_values":
+            prob_kwargs["value_cond_param_probs"] = model.value_cond_param_probs
+            prob_kwargs["modellable_params"] = model.modellable_params
+        return model, prob_kwargs
+
+    def test_likelihoods(self):
+        for session_type, module in self.modules.items():
+            model, prob_kwargs = self._get_model(session_type)
+            sessions = _random_sessions(session_type, 50, self.rng)
+            for use_tokens in (True, False):
+                log_liks = model.compiled_model.log_likelihoods(
+                    sessions, use_start_end_tokens=use_tokens
+                )
+                for session, log_lik in zip(sessions, log_liks):
+                    expected = module.compute_likelihood_window(
+                        window=session,
+                        prior_probs=model.prior_probs,
+                        trans_probs=model.trans_probs,
+                        use_start_token=use_tokens,
+                        use_end_token=use_tokens,
+                        start_token=model.start_token,
+                        end_token=model.end_token,
+                        **prob_kwargs,
+                    )
+                    self.assertAlmostEqual(math.exp(log_lik) / expected, 1, places=9)
+
+    def test_rarest_windows(self):
+        for session_type, module in self.modules.items():
+            model, prob_kwargs = self._get_model(session_type)
+            sessions = _random_sessions(session_type, 50, self.rng)
+            for window_len in (2, 3, 4):
+                for use_tokens, use_geo_mean in ((True, False), (False, True)):
+                    windows, log_liks = model.compiled_model.rarest_windows(
+                        sessions,
+                        window_len=window_len,
+                        use_start_end_tokens=use_tokens,
+                        use_geo_mean=use_geo_mean,
+                    )
+                    for session, window, log_lik in zip(sessions, windows, log_liks):
+                        exp_window, exp_lik = module.rarest_window_session(
+                            session=session,
+                            prior_probs=model.prior_probs,
+                            trans_probs=model.trans_probs,
+                            window_len=window_len,
+                            use_start_end_tokens=use_tokens,
+                            start_token=model.start_token,
+                            end_token=model.end_token,
+                            use_geo_mean=use_geo_mean,
+                            **prob_kwargs,
+                        )
+                        self.assertEqual(
+                            [str(cmd) for cmd in window],
+                            [str(cmd) for cmd in exp_window],
+                        )
+                        if np.isnan(exp_lik):
+                            self.assertTrue(np.isnan(log_lik))
+                        else:
+                            self.assertAlmostEqual(
+                                math.exp(log_lik) / exp_lik, 1, places=9
+                            )
+
+    def test_unseen_commands(self):
+        model, _ = self._get_model("cmds_params_values")
+        compiled = model.compiled_model
+        ids, param_liks = compiled.encode(
+            [Cmd("Unseen-Cmd", {"Identity": "a", "Unseen": "b"}), Cmd("Get-User", {})]
+        )
+        self.assertEqual(ids[0], compiled.unk_id)
+        self.assertEqual(compiled.cmds[ids[1]], "Get-User")
+        self.assertLess(param_liks[0], 0)
+        self.assertEqual(param_liks[1], 0)
+
+    def test_long_sessions(self):
+        model = Model(sessions=[["Set-User", "Get-User"] * 5, ["Get-User"] * 3])
+        model.train()
+        sessions = [["Set-User", "Get-User"] * 2000]
+        model.sessions = sessions
+        model.compute_likelihoods_of_sessions(use_start_end_tokens=True)
+        model.compute_geomean_lik_of_sessions()
+        # the product of the probabilities underflows but the
+        # log likelihood and the geometric mean do not
+        self.assertEqual(model.session_likelihoods[0], 0)
+        self.assertTrue(np.isfinite(model.session_log_likelihoods[0]))
+        self.assertGreater(model.session_geomean_likelihoods[0], 0.1)
+
+    def test_compiled_model_tokens(self):
+        model, _ = self._get_model("cmds_only")
+        compiled = CompiledModel(
+            prior_probs=model.prior_probs,
+            trans_probs=model.trans_probs,
+            start_token=model.start_token,
+            end_token=model.end_token,
+            unk_token=model.unk_token,
+        )
+        self.assertEqual(compiled.log_trans.shape, (len(compiled.cmds),) * 2)
+        windows, log_liks = compiled.rarest_windows(
+            [["Set-User"]], window_len=3, use_start_end_tokens=True
+        )
+        self.assertEqual(windows, [[]])
+        self.assertTrue(np.isnan(log_liks[0]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,12 @@
+import os
+import tempfile
 import unittest
+from unittest import mock
+
+import numpy as np
 
 from msticpy.analysis.anomalous_sequence.utils.data_structures import Cmd
+from msticpy.analysis.anomalous_sequence import model as model_module
 from msticpy.analysis.anomalous_sequence.model import Model
 from msticpy.common.exceptions import MsticpyException
 
@@ -169,6 +175,102 @@ class TestModel(unittest.TestCase):
         self.assertTrue(3 in model.rare_window_likelihoods_geo)
         self.assertTrue(3 in model.rare_windows_geo)
 
+    @mock.patch.object(model_module, "_MIN_PARALLEL_SESSIONS", 4)
+    def test_parallel(self):
+        for sessions in (self.sessions1, self.sessions2, self.sessions3):
+            sessions = sessions * 10
+            serial_model = Model(sessions=sessions)
+            serial_model.train()
+            serial_model.compute_scores(use_start_end_tokens=True)
+            par_model = Model(sessions=sessions, n_jobs=2)
+            par_model.train()
+            par_model.compute_scores(use_start_end_tokens=True)
+
+            self.assertEqual(par_model.seq1_counts, serial_model.seq1_counts)
+            self.assertEqual(par_model.seq2_counts, serial_model.seq2_counts)
+            self.assertEqual(par_model.param_counts, serial_model.param_counts)
+            self.assertEqual(par_model.value_counts, serial_model.value_counts)
+            self.assertEqual(
+                par_model.modellable_params, serial_model.modellable_params
+            )
+            self.assertTrue(
+                np.allclose(
+                    par_model.session_likelihoods, serial_model.session_likelihoods
+                )
+            )
+            for window_len in (2, 3):
+                self.assertTrue(
+                    np.allclose(
+                        par_model.rare_window_likelihoods[window_len],
+                        serial_model.rare_window_likelihoods[window_len],
+                    )
+                )
+                self.assertEqual(
+                    [
+                        [str(cmd) for cmd in window]
+                        for window in par_model.rare_windows[window_len]
+                    ],
+                    [
+                        [str(cmd) for cmd in window]
+                        for window in serial_model.rare_windows[window_len]
+                    ],
+                )
+
+    def test_save_load(self):
+        for sessions in (self.sessions1, self.sessions2, self.sessions3):
+            model = Model(sessions=sessions)
+            model.train()
+            model.compute_scores(use_start_end_tokens=True)
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                path = os.path.join(tmp_dir, "model.npz")
+                model.save(path)
+                loaded = Model.load(path)
+            self.assertEqual(loaded.session_type, model.session_type)
+            self.assertEqual(loaded.prior_probs, model.prior_probs)
+            self.assertEqual(loaded.trans_probs, model.trans_probs)
+            self.assertEqual(loaded.param_cond_cmd_probs, model.param_cond_cmd_probs)
+            self.assertEqual(
+                loaded.value_cond_param_probs, model.value_cond_param_probs
+            )
+            self.assertEqual(loaded.modellable_params, model.modellable_params)
+            loaded.sessions = sessions
+            loaded.compute_scores(use_start_end_tokens=True)
+            self.assertTrue(
+                np.allclose(loaded.session_likelihoods, model.session_likelihoods)
+            )
+            self.assertTrue(
+                np.allclose(
+                    loaded.rare_window_likelihoods[3],
+                    model.rare_window_likelihoods[3],
+                )
+            )
+
+        model = Model(sessions=self.sessions1)
+        self.assertRaises(MsticpyException, lambda: model.save("model.npz"))
+
+    def test_partial_fit(self):
+        for sessions in (self.sessions1, self.sessions2, self.sessions3):
+            new_sessions = [sessions[1], sessions[1][:1]]
+            model = Model(sessions=sessions)
+            model.train()
+            model.partial_fit(new_sessions)
+            expected = Model(sessions=sessions + new_sessions)
+            expected.train()
+
+            self.assertEqual(model.sessions, new_sessions)
+            self.assertEqual(model.seq1_counts, expected.seq1_counts)
+            self.assertEqual(model.seq2_counts, expected.seq2_counts)
+            self.assertEqual(model.param_counts, expected.param_counts)
+            self.assertEqual(model.value_counts, expected.value_counts)
+            self.assertEqual(model.prior_probs, expected.prior_probs)
+            self.assertEqual(model.trans_probs, expected.trans_probs)
+            self.assertEqual(model.modellable_params, expected.modellable_params)
+
+        model = Model(sessions=self.sessions1)
+        model.train()
+        self.assertRaises(MsticpyException, lambda: model.partial_fit(self.sessions2))
+        self.assertEqual(model.sessions, self.sessions1)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -258,6 +258,85 @@ class TestSessionize(unittest.TestCase):
 
         assert_frame_equal(actual, self.df3_sessionized, check_dtype=False)
 
+    def test_create_session_col_random(self):
+        rng = np.random.default_rng(42)
+        n_events = 2000
+        data = pd.DataFrame(
+            {
+                "UserId": rng.choice(["u1", "u2", "u3", None], size=n_events),
+                "ClientIP": rng.choice(["ip1", "ip2"], size=n_events),
+                "time": pd.to_datetime("2020-01-03", utc=True)
+                + pd.to_timedelta(rng.integers(0, 60 * 24, size=n_events), unit="min"),
+                "operation": rng.choice(["A", "B", "C"], size=n_events),
+            }
+        )
+        data.loc[rng.random(n_events) < 0.01, "time"] = pd.NaT
+        actual = sessionize.create_session_col(
+            data=data,
+            user_identifier_cols=["UserId", "ClientIP"],
+            time_col="time",
+            max_session_time_mins=30,
+            max_event_separation_mins=5,
+        )
+
+        # compare with a row by row calculation on the sorted output
+        expected = []
+        ses_ind, ses_start, prev = 0, None, None
+        for row in actual.fillna({"UserId": "dummy"}).itertuples():
+            if prev is not None and (
+                (row.UserId, row.ClientIP) != (prev.UserId, prev.ClientIP)
+                or row.time - prev.time > pd.Timedelta(5, "min")
+                or row.time - ses_start > pd.Timedelta(30, "min")
+            ):
+                ses_ind += 1
+                ses_start = row.time
+            if prev is None:
+                ses_start = row.time
+            expected.append(ses_ind)
+            prev = row
+        self.assertEqual(list(actual["session_ind"]), expected)
+        self.assertEqual(len(actual), n_events)
+        self.assertGreater(actual["session_ind"].nunique(), 100)
+
+    def test_streaming_sessionizer(self):
+        rng = np.random.default_rng(1)
+        n_events = 3000
+        data = pd.DataFrame(
+            {
+                "UserId": rng.choice(["u1", "u2", "u3", None], size=n_events),
+                "time": pd.to_datetime("2020-01-03", utc=True)
+                + pd.to_timedelta(
+                    np.sort(rng.integers(0, 60 * 24 * 2, size=n_events)), unit="min"
+                ),
+                "operation": rng.choice(["A", "B", "C"], size=n_events),
+            }
+        )
+        params = dict(
+            user_identifier_cols=["UserId"],
+            time_col="time",
+            max_session_time_mins=30,
+            max_event_separation_mins=5,
+            event_col="operation",
+        )
+        expected = sessionize.sessionize_data(data=data, **params)
+
+        sessionizer = sessionize.StreamingSessionizer(**params)
+        results = []
+        for start in range(0, n_events, 250):
+            results.append(sessionizer.add_batch(data.iloc[start : start + 250]))
+            # only the events of the open sessions are kept
+            self.assertLessEqual(sessionizer.open_events, 100)
+        results.append(sessionizer.flush())
+        self.assertEqual(sessionizer.open_events, 0)
+        self.assertTrue(sessionizer.flush().empty)
+
+        sort_cols = ["UserId", "time_min"]
+        actual = pd.concat(results, ignore_index=True)
+        assert_frame_equal(
+            actual.sort_values(sort_cols).reset_index(drop=True),
+            expected.sort_values(sort_cols).reset_index(drop=True),
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -5,6 +5,7 @@
 # --------------------------------------------------------------------------
 """Base64unpack test class."""
 import unittest
+from unittest import mock
 import os
 from os import path
 import pandas as pd
@@ -101,6 +102,31 @@ class TestB64Unpack(unittest.TestCase):
         except FileNotFoundError as ex:
             self.fail(msg="Exception {}".format(str(ex)))
 
+    def test_df_distinct_values(self):
+        FILE_NAME = path.join(_TEST_DATA, "base64msg.txt")
+        with open(FILE_NAME, "r") as f_handle:
+            input_txt = f_handle.read()
+        undecodable = "A" * 10 + "bcdefghijklmnopqrstuvwxyz0123"
+        input_df = pd.DataFrame(
+            data=[undecodable + " " + input_txt, "no b64", input_txt] * 4,
+            columns=["input"],
+        )
+        result_df = b64.unpack_df(data=input_df, column="input")
+        # each row is decoded independently of the other rows
+        first_rows = result_df[result_df["src_index"] == 0]
+        self.assertEqual(first_rows.shape, (8, 15))
+        for src_index in range(0, 12, 3):
+            rows = result_df[result_df["src_index"] == src_index]
+            self.assertEqual(list(rows["reference"]), list(first_rows["reference"]))
+        self.assertNotIn(1, set(result_df["src_index"]))
+
+        with mock.patch.object(b64, "_MIN_PARALLEL_VALUES", 2):
+            par_df = b64.unpack_df(data=input_df, column="input", n_jobs=2)
+        pd.testing.assert_frame_equal(par_df, result_df)
+
+        empty_df = b64.unpack_df(data=input_df.iloc[[1]], column="input")
+        self.assertEqual(empty_df.shape, (0, 12))
+
 
 if __name__ == "__main__":
     unittest.main()
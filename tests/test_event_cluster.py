@@ -7,6 +7,7 @@
 import unittest
 import json
 import os
+from math import log10
 
 import pandas as pd
 
@@ -89,6 +90,35 @@ class TestEventCluster(unittest.TestCase):
             test_df.apply(lambda x: delim_hash(x.input), axis=1).iloc[0], 2337396062
         )
 
+    def test_vectorized_features(self):
+        input_df = self.input_df.copy()
+        input_df.loc[0, "CommandLine"] = "caf\u00e9.exe /q \U0001f600"
+        input_df.loc[1, "CommandLine"] = ""
+        out_df = add_process_features(input_frame=input_df, path_separator="\\")
+
+        for _, row in out_df.iterrows():
+            self.assertEqual(row.processName, row.NewProcessName.split("\\")[-1])
+            self.assertEqual(row.pathScore, char_ord_score(row.NewProcessName))
+            self.assertEqual(row.pathHash, crc32_hash(row.NewProcessName))
+            self.assertEqual(
+                row.pathLogScore, log10(row.pathScore) if row.pathScore else 0
+            )
+            self.assertEqual(row.commandlineLen, len(row.CommandLine))
+            self.assertEqual(
+                row.commandlineLogLen,
+                log10(row.commandlineLen) if row.commandlineLen else 0,
+            )
+            self.assertEqual(row.commandlineTokensFull, delim_count(row.CommandLine))
+            self.assertEqual(row.commandlineScore, char_ord_score(row.CommandLine))
+            self.assertEqual(row.commandlineTokensHash, delim_hash(row.CommandLine))
+
+        scores = char_ord_score_df(data=out_df, column="CommandLine", scale=2)
+        hashes = crc32_hash_df(data=out_df, column="CommandLine")
+        self.assertTrue(scores.index.equals(out_df.index))
+        for cmd_line, score, hash_val in zip(out_df.CommandLine, scores, hashes):
+            self.assertEqual(score, sum(ord(char) for char in cmd_line) / 2)
+            self.assertEqual(hash_val, crc32_hash(cmd_line))
+
     def test_clustering(self):
         out_df = add_process_features(input_frame=self.input_df, path_separator="\\")
 
@@ -125,3 +155,32 @@ class TestEventCluster(unittest.TestCase):
         self.assertEqual(out_df3["ClusterId"].max(), 31)
         self.assertEqual(out_df3["ClusterSize"].min(), 1)
         self.assertEqual(len(out_df3[out_df3["ClusterId"] == -1]), 89)
+
+    def test_clustering_aggregate_duplicates(self):
+        out_df = add_process_features(input_frame=self.input_df, path_separator="\\")
+        cluster_columns = ["pathHash", "commandlineTokensHash", "isSystemSession"]
+        results = [
+            dbcluster_events(
+                data=out_df,
+                cluster_columns=cluster_columns,
+                time_column="TimeGenerated",
+                max_cluster_distance=0.001,
+                min_cluster_samples=2,
+                aggregate_duplicates=aggregate,
+            )
+            for aggregate in (True, False)
+        ]
+        (agg_df, agg_dbscan, _), (full_df, full_dbscan, x_norm) = results
+
+        pd.testing.assert_frame_equal(agg_df, full_df)
+        self.assertEqual(len(agg_dbscan.labels_), len(x_norm))
+        self.assertTrue((agg_dbscan.labels_ == full_dbscan.labels_).all())
+        self.assertTrue(
+            (agg_dbscan.core_sample_indices_ == full_dbscan.core_sample_indices_).all()
+        )
+        for _, row in agg_df[agg_df["Clustered"]].iterrows():
+            members = out_df[agg_dbscan.labels_ == row.ClusterId]
+            self.assertEqual(row.ClusterSize, len(members))
+            self.assertEqual(row.FirstEventTime, members.TimeGenerated.min())
+            self.assertEqual(row.LastEventTime, members.TimeGenerated.max())
+        self.assertTrue((agg_df[~agg_df["Clustered"]]["ClusterSize"] == 1).all())
@@ -3,16 +3,24 @@
 # Licensed under the MIT License. See License.txt in the project root for
 # license information.
 # --------------------------------------------------------------------------
+import json
 import os
+import threading
 from pathlib import Path
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlparse
 
 import nbformat
 import notebook
+import pandas as pd
 import pytest
 import pytest_check as check
 
+from geoip2.errors import AddressNotFoundError
+from requests.models import Response
 from nbconvert.preprocessors import CellExecutionError, ExecutePreprocessor
-from msticpy.sectools.geoip import GeoLiteLookup, IPStackLookup
+from msticpy.sectools import geoip
+from msticpy.sectools.geoip import GeoIpLookup, GeoLiteLookup, IPStackLookup
 
 _NB_FOLDER = "docs/notebooks"
 _NB_NAME = "GeoIPLookups.ipynb"
@@ -61,3 +69,212 @@ def test_geoiplite_download():
             for file in tgt_folder.glob("*"):
                 file.unlink()
             tgt_folder.rmdir()
+
+
+class _GeoLiteReader:
+    """GeoLite2 database reader stand-in."""
+
+    def __init__(self):
+        self.lookups = []
+
+    def city(self, ip_address):
+        """Return a location for addresses in 8.8.0.0/16 or 2001:4860::/32."""
+        self.lookups.append(ip_address)
+        if not ip_address.startswith(("8.8.", "2001:4860:")):
+            raise AddressNotFoundError(ip_address)
+        last_part = int(ip_address.replace(":", ".").split(".")[-1] or 0)
+        raw = {
+            "country": {"iso_code": "US", "names": {"en": "United States"}},
+            "location": {"latitude": 37.751, "longitude": -97.822 + last_part},
+        }
+        if last_part % 2:
+            raw["subdivisions"] = [{"names": {"en": "Washington"}}]
+            raw["city"] = {"names": {"en": "Redmond"}}
+        return type("City", (), {"raw": raw})
+
+
+def test_geolite_lookup_ips():
+    """Test GeoLite DataFrame lookups."""
+    iplocation = GeoLiteLookup.__new__(GeoLiteLookup)
+    iplocation._reader = _GeoLiteReader()
+    ips = ["8.8.8.8", "8.8.4.4", "10.0.0.1", "1.1.1.1", "2001:4860::8889", "bad-ip"]
+    data = pd.DataFrame({"ip": ips * 10 + [None]})
+
+    result = iplocation.lookup_ips(data, "ip")
+    # same results as looking up the addresses one at a time
+    pd.testing.assert_frame_equal(
+        result, GeoIpLookup.lookup_ips(iplocation, data.dropna(), "ip")
+    )
+    check.equal(len(result), 30)
+    # each public address is only looked up once
+    check.equal(
+        sorted(iplocation._reader.lookups[:4]),
+        ["1.1.1.1", "2001:4860::8889", "8.8.4.4", "8.8.8.8"],
+    )
+
+    iplocation._reader.lookups.clear()
+    merged = iplocation.df_lookup_ip(data, "ip")
+    check.equal(len(merged), len(data))
+    check.equal(len(iplocation._reader.lookups), 4)
+    check.equal(merged["City"].iloc[3 * 6 + 4], "Redmond")
+    check.is_true(merged["CountryCode"].iloc[2:4].isna().all())
+
+    # IPv4 addresses embedded in IPv4-mapped, Teredo and 6to4 addresses
+    iplocation._reader.lookups.clear()
+    embedded_ips = {
+        "::ffff:8.8.8.8": "8.8.8.8",
+        "2001:0:4136:e378:8000:63bf:f7f7:f7f7": "8.8.8.8",
+        "2002:808:404::1": "8.8.4.4",
+        "::ffff:10.0.0.1": None,
+        "2002:a00:1::1": None,
+    }
+    result = iplocation.lookup_ips(pd.DataFrame({"ip": list(embedded_ips)}), "ip")
+    check.equal(len(result), 3)
+    check.equal(list(result["IpAddress"]), list(embedded_ips)[:3])
+    check.equal(
+        sorted(iplocation._reader.lookups),
+        sorted(ip for ip in embedded_ips.values() if ip),
+    )
+
+
+class _MMDBReader:
+    """geoip2 database Reader stand-in."""
+
+    def __init__(self, fileish, mode=0):
+        if mode == geoip.maxminddb.MODE_MMAP_EXT and not self.has_extension:
+            raise ValueError("MODE_MMAP_EXT requires the C extension")
+        self.fileish = fileish
+        self.mode = mode
+        self.closed = False
+
+    has_extension = True
+
+    def close(self):
+        """Close the reader."""
+        self.closed = True
+
+
+def test_geolite_shared_readers(tmp_path, monkeypatch):
+    """Test sharing GeoLite DB readers."""
+    monkeypatch.setattr(geoip.geoip2.database, "Reader", _MMDBReader)
+    db_path = tmp_path.joinpath("GeoLite2-City.mmdb")
+    db_path.write_bytes(b"mmdb")
+
+    key1, reader1 = geoip._open_shared_reader(str(db_path), "mmap")
+    key2, reader2 = geoip._open_shared_reader(str(db_path), "mmap")
+    check.is_true(reader1 is reader2)
+    check.equal(reader1.mode, geoip.maxminddb.MODE_MMAP_EXT)
+    key3, reader3 = geoip._open_shared_reader(str(db_path), "memory")
+    check.is_false(reader3 is reader1)
+
+    geoip._release_shared_reader(key1)
+    check.is_false(reader1.closed)
+    geoip._release_shared_reader(key2)
+    check.is_true(reader1.closed)
+    check.is_true(key1 not in geoip._SHARED_READERS)
+    geoip._release_shared_reader(key3)
+    check.is_true(reader3.closed)
+
+    # fall back to the pure Python reader if the C extension is not available
+    monkeypatch.setattr(_MMDBReader, "has_extension", False)
+    key4, reader4 = geoip._open_shared_reader(str(db_path), "mmap")
+    check.equal(reader4.mode, geoip.maxminddb.MODE_MMAP)
+    with pytest.raises(ValueError):
+        geoip._open_shared_reader(str(db_path), "mmap_ext")
+    geoip._release_shared_reader(key4)
+    check.equal(len(geoip._SHARED_READERS), 0)
+
+
+class _IPStackResponses:
+    """IPStack API responses for a mocked requests.Session.get."""
+
+    def __init__(self, bulk_supported=True):
+        """Initialize new instance."""
+        self.bulk_supported = bulk_supported
+        self.requests_received = []
+        self._lock = threading.Lock()
+
+    def __call__(self, url):
+        """Record the request and return a result for each address."""
+        parsed_url = urlparse(url)
+        ip_list = parsed_url.path.strip("/").split(",")
+        with self._lock:
+            self.requests_received.append(
+                (ip_list, parse_qs(parsed_url.query)["access_key"][0])
+            )
+        if len(ip_list) > 1 and not self.bulk_supported:
+            result = {
+                "success": False,
+                "error": {"code": 303, "type": "batch_not_supported_on_plan"},
+            }
+        else:
+            result = [
+                {
+                    "ip": ip_addr,
+                    "type": "ipv4",
+                    "country_code": "US",
+                    "country_name": "United States",
+                    "region_name": "Washington",
+                    "city": f"City-{ip_addr}",
+                    "latitude": 47.6,
+                    "longitude": -122.3,
+                }
+                for ip_addr in ip_list
+            ]
+            if len(result) == 1:
+                result = result[0]
+        response = Response()
+        response.status_code = 200
+        response._content = json.dumps(result).encode()
+        return response
+
+
+@pytest.mark.parametrize("bulk_lookup", [False, True])
+@patch("requests.Session.get")
+def test_ipstack_lookup(mock_get, bulk_lookup):
+    """Test concurrent and batched IPStack lookups."""
+    mock_get.side_effect = ipstack_responses = _IPStackResponses()
+    ip_addrs = [f"10.0.{idx // 250}.{idx % 250}" for idx in range(120)]
+    ipstack = IPStackLookup(
+        api_key="123456", bulk_lookup=bulk_lookup, max_concurrency=4
+    )
+
+    results, ip_entities = ipstack.lookup_ip(ip_addr_list=ip_addrs * 2)
+
+    received = ipstack_responses.requests_received
+    requested_ips = [ip_addr for ip_list, _ in received for ip_addr in ip_list]
+    # each address is only requested once
+    check.equal(sorted(requested_ips), sorted(ip_addrs))
+    check.is_true(all(key == "123456" for _, key in received))
+    if bulk_lookup:
+        check.equal(sorted(len(ip_list) for ip_list, _ in received), [20, 50, 50])
+    else:
+        check.equal(len(received), len(ip_addrs))
+    # results are returned in the same order as the input
+    check.equal([result["ip"] for result, _ in results], ip_addrs)
+    check.equal([ip_ent.Address for ip_ent in ip_entities], ip_addrs)
+    check.equal(ip_entities[5].Location.City, f"City-{ip_addrs[5]}")
+
+
+@patch("requests.Session.get")
+def test_ipstack_rate_limit(mock_get):
+    """Test the rate limiter is shared by all lookups."""
+    mock_get.side_effect = _IPStackResponses()
+    ipstack = IPStackLookup(api_key="123456", max_concurrency=2, rate_limit=1000)
+    rate_limiter = ipstack._rate_limiter
+    with patch.object(
+        rate_limiter, "acquire", wraps=rate_limiter.acquire
+    ) as mock_acquire:
+        ipstack.lookup_ip(ip_addr_list=["10.0.0.1", "10.0.0.2", "10.0.0.3"])
+        ipstack.lookup_ip(ip_address="10.0.0.4")
+    check.is_true(ipstack._rate_limiter is rate_limiter)
+    check.equal(mock_acquire.call_count, 4)
+
+
+@patch("requests.Session.get")
+def test_ipstack_bulk_not_supported(mock_get):
+    """Test bulk lookup rejected by IPStack."""
+    mock_get.side_effect = _IPStackResponses(bulk_supported=False)
+    ipstack = IPStackLookup(api_key="123456", bulk_lookup=True)
+    with pytest.raises(PermissionError):
+        ipstack.lookup_ip(ip_addr_list=["10.0.0.1", "10.0.0.2"])
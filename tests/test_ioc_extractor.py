@@ -1,9 +1,13 @@
+import io
+import tempfile
 import unittest
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
 import pandas as pd
 
 # Test code
-from msticpy.sectools.iocextract import IoCExtract
+from msticpy.sectools.iocextract import IoCExtract, IoCStreamSummary
 
 TEST_CASES = {
     "ipv4_test": r"c:\one\path\or\another\myprocess -ip4:206.123.1.123",
@@ -195,6 +199,142 @@ class TestIoCExtractor(unittest.TestCase):
         self.assertEqual(output_df[output_df["IoCType"] == "sha1_hash"].shape[0], 0)
         self.assertEqual(output_df[output_df["IoCType"] == "sha256_hash"].shape[0], 0)
 
+    def test_prefilter_results_identical(self):
+        no_prefilter = IoCExtract(use_prefilter=False)
+        ioc_types = list(self.extractor.ioc_types)
+        test_strings = list(TEST_CASES.values()) + [
+            "no iocs here",
+            "ftp://user@10.1.2.3:21/path%2Fto%2Ffile.txt",
+            "host\\share\\file.dll and ::1 and a.b.c.d.e",
+            "4:5:6 1.2 .abc 00236A2AE558018ED13B5222EF1BD987",
+        ]
+        for test_str in test_strings:
+            self.assertEqual(
+                self.extractor.extract(test_str, ioc_types=ioc_types),
+                no_prefilter.extract(test_str, ioc_types=ioc_types),
+                test_str,
+            )
+
+    def test_prefilter_custom_types(self):
+        self.extractor.add_ioc_type("custom_guid", r"[a-f0-9]{8}-[a-f0-9]{4}")
+        self.assertNotIn("custom_guid", self.extractor._prefilters)
+        self.assertIn("ipv4", self.extractor._prefilters)
+        results = self.extractor.extract("id: 1234abcd-12ab", ioc_types=["custom_guid"])
+        self.assertEqual(results["custom_guid"], {"1234abcd-12ab"})
+        del self.extractor._content_regex["custom_guid"]
+
+    def test_dataframe_duplicate_values(self):
+        test_values = list(TEST_CASES.values())
+        input_df = pd.DataFrame(
+            {
+                "input": test_values * 3,
+                "input2": list(reversed(test_values)) * 3,
+            },
+            index=[f"row{idx}" for idx in range(len(test_values) * 3)],
+        )
+        input_df.loc["row1", "input2"] = None
+        output_df = input_df.mp_ioc.extract(
+            columns=["input", "input2"], include_paths=True
+        )
+
+        # results should match a row-by-row scan of each column
+        ioc_types = self.extractor._get_ioc_types_to_use(None, include_paths=True)
+        expected = []
+        for idx, row in input_df.iterrows():
+            for col in ["input", "input2"]:
+                if row[col] is None:
+                    continue
+                results = self.extractor.extract(row[col], ioc_types=ioc_types)
+                expected.extend(
+                    (ioc_type, obs, idx, row[col])
+                    for ioc_type, obs_set in results.items()
+                    for obs in obs_set
+                )
+        self.assertEqual(len(output_df), len(expected))
+        self.assertEqual(
+            sorted(expected), sorted(output_df.itertuples(index=False, name=None))
+        )
+        # output is in input row order
+        row_order = {idx: pos for pos, idx in enumerate(input_df.index)}
+        src_pos = output_df["SourceIndex"].map(row_order)
+        self.assertTrue(src_pos.is_monotonic_increasing)
+
+    def test_dataframe_parallel(self):
+        extractor = IoCExtract()
+        extractor.add_ioc_type(
+            ioc_type="win_named_pipe", ioc_regex=r"(?P<pipe>\\\\\.\\pipe\\[^\s\\]+)"
+        )
+        test_values = [
+            f"{value} {idx}" for idx in range(50) for value in TEST_CASES.values()
+        ]
+        test_values.append(r"Client connected to \\.\pipe\mspipe1")
+        input_df = pd.DataFrame({"input": test_values})
+        serial_df = extractor.extract_df(input_df, columns=["input"])
+        self.assertIn("win_named_pipe", serial_df["IoCType"].values)
+
+        extractor._MIN_PARALLEL_VALUES = 100
+        par_df = extractor.extract_df(input_df, columns=["input"], n_jobs=2)
+        self.assertTrue(serial_df.equals(par_df))
+
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            exec_df = extractor.extract_df(
+                input_df, columns=["input"], executor=executor
+            )
+        self.assertTrue(serial_df.equals(exec_df))
+
+    def test_extract_stream(self):
+        lines = [value.replace("\n", " ") for value in TEST_CASES.values()] * 3
+        expected = self.extractor.extract_df(
+            pd.DataFrame({"Input": lines}), columns="Input"
+        )
+        summary = IoCStreamSummary()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = Path(tmp_dir).joinpath("test.log")
+            file_path.write_text("\n".join(lines), encoding="utf-8")
+            batches = list(
+                self.extractor.extract_stream(
+                    str(file_path), batch_size=4, summary=summary
+                )
+            )
+        self.assertEqual(len(batches), 9)
+        result_df = pd.concat(batches, ignore_index=True)
+        self.assertTrue(expected.equals(result_df))
+
+        summary_df = summary.to_df()
+        self.assertEqual(
+            len(summary_df), len(expected[["IoCType", "Observable"]].drop_duplicates())
+        )
+        self.assertEqual(summary_df["Count"].sum(), len(expected))
+        self.assertTrue(
+            (summary_df["LastSourceIndex"] > summary_df["FirstSourceIndex"]).all()
+        )
+
+        # binary file-like object
+        bin_io = io.BytesIO("\n".join(lines).encode("utf-8"))
+        result_df = pd.concat(self.extractor.extract_stream(bin_io), ignore_index=True)
+        self.assertTrue(expected.equals(result_df))
+
+        # iterator of records
+        records = ({"msg": line, "other": 1} for line in lines)
+        result_df = pd.concat(
+            self.extractor.extract_stream(records, columns="msg"), ignore_index=True
+        )
+        self.assertTrue(expected.equals(result_df))
+
+    def test_extract_stream_long_lines(self):
+        ips = [f"10.{idx // 250}.{idx % 250}.1" for idx in range(500)]
+        long_line = " ".join(ips)
+        for source in (
+            io.StringIO(f"first line\n{long_line}"),
+            ["first line", long_line],
+        ):
+            results = pd.concat(
+                self.extractor.extract_stream(source, max_line_length=100),
+                ignore_index=True,
+            )
+            self.assertEqual(sorted(results["Observable"]), sorted(ips))
+            self.assertTrue((results["SourceIndex"] == 1).all())
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -140,6 +140,101 @@ def test_tree_utils_lx():
     assert ptutil.infer_schema(p_tree_l) == ptutil.LX_EVENT_SCH
 
 
+def test_build_tree_paths():
+    p_tree = ptutil.build_process_tree(testdf_win, show_progress=False)
+    p_tree_np = ptutil.build_process_tree(
+        testdf_win, show_progress=False, add_path=False
+    )
+    assert "path" not in p_tree_np.columns
+    assert p_tree["parent_index"].equals(p_tree_np["parent_index"])
+    assert ptutil.build_process_paths(p_tree_np).equals(p_tree["path"])
+
+    # the path is the parent path + the process source_index
+    non_roots = p_tree[p_tree["parent_index"].notna()]
+    parents = p_tree.set_index("source_index").loc[non_roots["parent_index"]]
+    assert (
+        parents["path"].to_numpy() + "/" + non_roots["source_index"].to_numpy()
+        == non_roots["path"].to_numpy()
+    ).all()
+
+
+def test_build_tree_orphans():
+    # k6 has a missing parent, k8 and k9 are parents of each other
+    parent_keys = [None, "k0", "k1", None, "k3", "k0", "missing", "k6", "k9", "k8"]
+    input_tree = pd.DataFrame(
+        {
+            "parent_key": parent_keys,
+            "source_index": [str(idx) for idx in range(10)],
+            "IsRoot": [key is None for key in parent_keys],
+        },
+        index=pd.Index([f"k{idx}" for idx in range(10)], name="proc_key"),
+    )
+    progress = ptutil.Progress(completed_len=10, visible=False)
+    p_tree = ptutil._build_proc_tree(input_tree.copy(), progress)
+    assert list(p_tree["path"]) == [
+        "0",
+        "0/1",
+        "0/1/2",
+        "3",
+        "3/4",
+        "0/5",
+        "6",
+        "7",
+        "8",
+        "9",
+    ]
+    assert list(p_tree["parent_index"].fillna("")) == [
+        "",
+        "0",
+        "1",
+        "",
+        "3",
+        "0",
+        "",
+        "",
+        "",
+        "",
+    ]
+    p_tree = ptutil._build_proc_tree(input_tree.copy(), progress, max_depth=1)
+    assert list(p_tree["path"])[:3] == ["0", "0/1", "2"]
+
+
+def test_tree_index():
+    """Test navigation using the process tree index."""
+    p_tree = ptutil.build_process_tree(testdf_win, show_progress=False)
+    p_tree_idx = ptutil.build_process_tree(
+        testdf_win, show_progress=False, add_index=True
+    )
+    tree_index = p_tree_idx.attrs["process_tree_index"]
+    assert isinstance(tree_index, ptutil.ProcessTreeIndex)
+    assert tree_index.matches(p_tree_idx)
+    assert "process_tree_index" not in p_tree.attrs
+
+    for proc_key in p_tree.index[::10]:
+        for nav_func, kwargs in (
+            (ptutil.get_children, {}),
+            (ptutil.get_descendents, {}),
+            (ptutil.get_descendents, {"max_levels": 2, "include_source": False}),
+            (ptutil.get_ancestors, {}),
+        ):
+            expected = nav_func(p_tree, proc_key, **kwargs)
+            result = nav_func(p_tree_idx, proc_key, **kwargs)
+            assert list(result.index) == list(expected.index)
+        root = ptutil.get_root(p_tree_idx, proc_key)
+        assert root.name == ptutil.get_root(p_tree, proc_key).name
+
+    # the index is not used for subsets of the tree
+    root_key = ptutil.get_roots(p_tree_idx).index[0]
+    child_key = ptutil.get_children(p_tree, root_key, include_source=False).index[0]
+    sub_tree = p_tree_idx[p_tree_idx.index != child_key]
+    assert not tree_index.matches(sub_tree)
+    sub_children = ptutil.get_children(sub_tree, root_key, include_source=False)
+    assert child_key not in sub_children.index
+    assert len(sub_children) == (
+        len(ptutil.get_children(p_tree, root_key, include_source=False)) - 1
+    )
+
+
 _NB_FOLDER = "docs/notebooks"
 _NB_NAME = "ProcessTree.ipynb"
 
@@ -0,0 +1,144 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# --------------------------------------------------------------------------
+"""TI result cache tests."""
+import time
+
+import pytest
+import pytest_check as check
+
+from msticpy.sectools.tilookup import TILookup
+from msticpy.sectools.tiproviders import (
+    MemoryTIResultCache,
+    SqliteTIResultCache,
+)
+from msticpy.sectools.tiproviders.http_base import HttpProvider, IoCLookupParams
+from msticpy.sectools.tiproviders.ti_provider_base import TISeverity
+
+__author__ = "Ian Hellen"
+
+# pylint: disable=redefined-outer-name, protected-access
+
+_IOC_IPS = [f"104.215.148.{idx}" for idx in range(1, 21)]
+
+
+class _CountingSession:
+    """Mock requests session that counts requests."""
+
+    def __init__(self):
+        self.requests = 0
+
+    def get(self, *args, **kwargs):
+        """Return mock response."""
+        del args
+        self.requests += 1
+
+        class _MockResponse:
+            status_code = 200
+
+            @staticmethod
+            def json():
+                return {"url": kwargs["url"]}
+
+        return _MockResponse()
+
+
+class _StubProvider(HttpProvider):
+    """Stub HTTP TI Provider."""
+
+    _BASE_URL = "https://stub.ti.local"
+    _IOC_QUERIES = {"ipv4": IoCLookupParams(path="/ip/{observable}")}
+
+    def __init__(self, **kwargs):
+        """Initialize the provider."""
+        super().__init__(**kwargs)
+        self._requests_session = _CountingSession()
+
+    def parse_results(self, response):
+        """Return the details of the response."""
+        return True, TISeverity.information, response.raw_result
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def ti_cache(request, tmp_path):
+    """Return cache instances."""
+    if request.param == "memory":
+        return MemoryTIResultCache(max_size=10)
+    return SqliteTIResultCache(path=str(tmp_path.joinpath("ti.db")), max_size=10)
+
+
+def test_cache_lookups(ti_cache):
+    """Test cached lookups do not re-query the provider."""
+    provider = _StubProvider()
+    provider.result_cache = ti_cache
+    results = provider.lookup_iocs(data=_IOC_IPS[:5])
+    check.equal(provider._requests_session.requests, 5)
+    cached_results = provider.lookup_iocs(data=_IOC_IPS[:5])
+    check.equal(provider._requests_session.requests, 5)
+    check.equal(list(cached_results["Ioc"]), list(results["Ioc"]))
+    check.equal(list(cached_results["Details"]), list(results["Details"]))
+    check.equal(ti_cache.stats["_StubProvider"], {"hits": 5, "misses": 5})
+
+
+def test_cache_lru_eviction(ti_cache):
+    """Test that the cache is size-bounded with LRU eviction."""
+    provider = _StubProvider()
+    provider.result_cache = ti_cache
+    provider.lookup_iocs(data=_IOC_IPS[:10])
+    # refresh the first item then add one more
+    provider.lookup_ioc(_IOC_IPS[0])
+    time.sleep(0.01)
+    provider.lookup_ioc(_IOC_IPS[10])
+    check.equal(len(ti_cache), 10)
+    provider._requests_session.requests = 0
+    provider.lookup_ioc(_IOC_IPS[0])
+    check.equal(provider._requests_session.requests, 0)
+    provider.lookup_ioc(_IOC_IPS[1])
+    check.equal(provider._requests_session.requests, 1)
+
+
+def test_cache_ttl(ti_cache):
+    """Test per-provider time-to-live."""
+    ti_cache.provider_ttl["_StubProvider"] = 0.2
+    provider = _StubProvider()
+    provider.result_cache = ti_cache
+    provider.lookup_ioc(_IOC_IPS[0])
+    provider.lookup_ioc(_IOC_IPS[0])
+    check.equal(provider._requests_session.requests, 1)
+    time.sleep(0.3)
+    provider.lookup_ioc(_IOC_IPS[0])
+    check.equal(provider._requests_session.requests, 2)
+
+    ti_cache.clear()
+    check.equal(len(ti_cache), 0)
+
+
+def test_sqlite_cache_persists(tmp_path):
+    """Test results are available to a new cache instance."""
+    cache_path = str(tmp_path.joinpath("ti.db"))
+    provider = _StubProvider()
+    provider.result_cache = SqliteTIResultCache(path=cache_path)
+    provider.lookup_iocs(data=_IOC_IPS)
+    provider.result_cache.close()
+
+    ti_lookup = TILookup(primary_providers=[_StubProvider()], cache=cache_path)
+    results = ti_lookup.lookup_iocs(data=_IOC_IPS)
+    check.equal(len(results), len(_IOC_IPS))
+    new_provider = ti_lookup.loaded_providers["_StubProvider"]
+    check.equal(new_provider._requests_session.requests, 0)
+    stats = ti_lookup.cache_stats
+    check.equal(stats.loc["_StubProvider", "hits"], len(_IOC_IPS))
+    check.equal(stats.loc["_StubProvider", "misses"], 0)
+
+    ti_lookup.clear_cache()
+    check.equal(len(ti_lookup.cache), 0)
+
+    # removing the shared cache reverts to per-provider memory caches
+    ti_lookup.cache = None
+    check.is_none(ti_lookup.cache)
+    check.is_instance(new_provider.result_cache, MemoryTIResultCache)
+    ti_lookup.lookup_iocs(data=_IOC_IPS)
+    ti_lookup.lookup_iocs(data=_IOC_IPS)
+    check.equal(new_provider._requests_session.requests, len(_IOC_IPS))
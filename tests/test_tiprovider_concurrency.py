@@ -0,0 +1,177 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# --------------------------------------------------------------------------
+"""TIProvider concurrent lookup tests using a mocked requests session."""
+import threading
+import time
+from unittest import mock
+
+import pytest
+import pytest_check as check
+
+from msticpy.common.rate_limiter import RateLimiter
+from msticpy.sectools.tilookup import TILookup
+from msticpy.sectools.tiproviders.http_base import HttpProvider, IoCLookupParams
+from msticpy.sectools.tiproviders.ti_provider_base import TISeverity
+
+__author__ = "Ian Hellen"
+
+# pylint: disable=protected-access
+
+_STUB_DELAY = 0.02
+_IOC_IPS = [f"104.215.148.{idx}" for idx in range(1, 41)]
+
+
+class _StubResponse:
+    """Stub requests response."""
+
+    def __init__(self, json_data, status_code):
+        self.json_data = json_data
+        self.status_code = status_code
+
+    def json(self):
+        """Return the response data."""
+        return self.json_data
+
+
+class _StubSession:
+    """Stub requests session - records the number of concurrent requests."""
+
+    def __init__(self):
+        self.request_count = 0
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def get(self, *args, **kwargs):
+        """Return the requested observable after a delay."""
+        url = kwargs.get("url", args[0] if args else "")
+        with self._lock:
+            self.request_count += 1
+            self._in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+        time.sleep(_STUB_DELAY)
+        with self._lock:
+            self._in_flight -= 1
+        return _StubResponse({"observable": url.rsplit("/", maxsplit=1)[-1]}, 200)
+
+
+class _StubProvider(HttpProvider):
+    """Stub HTTP TI Provider."""
+
+    _BASE_URL = "https://ti.example.com"
+    _IOC_QUERIES = {"ipv4": IoCLookupParams(path="/ip/{observable}")}
+
+    def parse_results(self, response):
+        """Return the details of the response."""
+        return True, TISeverity.information, response.raw_result
+
+
+def _create_provider(session=None, **kwargs):
+    provider = _StubProvider(**kwargs)
+    provider._requests_session = session or _StubSession()
+    # always send requests to the session
+    provider.result_cache = None
+    return provider
+
+
+def test_concurrent_lookup_order():
+    """Test concurrent lookups return the same results in input order."""
+    serial_df = _create_provider().lookup_iocs(data=_IOC_IPS)
+    conc_df = _create_provider().lookup_iocs(data=_IOC_IPS, max_concurrency=8)
+    check.equal(len(conc_df), len(_IOC_IPS))
+    check.equal(list(conc_df["Ioc"]), _IOC_IPS)
+    check.equal(list(conc_df["Ioc"]), list(serial_df["Ioc"]))
+    check.is_true(all(conc_df["Result"]))
+    check.equal(
+        [det["observable"] for det in conc_df["Details"]],
+        [det["observable"] for det in serial_df["Details"]],
+    )
+
+
+def test_concurrent_lookup_overlap():
+    """Test lookups only overlap if concurrency is enabled."""
+    session = _StubSession()
+    _create_provider(session).lookup_iocs(data=_IOC_IPS)
+    check.equal(session.request_count, len(_IOC_IPS))
+    check.equal(session.max_in_flight, 1)
+
+    session = _StubSession()
+    _create_provider(session, MaxConcurrency=10).lookup_iocs(data=_IOC_IPS)
+    check.equal(session.request_count, len(_IOC_IPS))
+    check.greater(session.max_in_flight, 1)
+    check.less_equal(session.max_in_flight, 10)
+
+
+def test_rate_limited_lookup():
+    """Test that the provider rate limiter is used across calls."""
+    provider = _create_provider(RateLimit=1000)
+    check.equal(provider.rate_limit, 1000)
+    rate_limiter = provider._rate_limiter
+    with mock.patch.object(
+        rate_limiter, "acquire", wraps=rate_limiter.acquire
+    ) as mock_acquire:
+        results = provider.lookup_iocs(data=_IOC_IPS[:15], max_concurrency=15)
+        provider.lookup_iocs(data=_IOC_IPS[15:20])
+        check.equal(len(results), 15)
+        check.equal(mock_acquire.call_count, 20)
+        # a rate_limit parameter applies to that call only
+        provider.lookup_iocs(data=_IOC_IPS[20:25], rate_limit=500)
+        check.equal(mock_acquire.call_count, 20)
+
+
+def test_rate_limiter_params():
+    """Test RateLimiter parameter handling."""
+    check.is_false(RateLimiter().enabled)
+    check.equal(RateLimiter(rate=2.5).burst, 3)
+    with pytest.raises(ValueError):
+        RateLimiter(rate=0)
+    with pytest.raises(ValueError):
+        RateLimiter(rate=1, burst=0)
+
+
+class _FailingProvider(_StubProvider):
+    """Stub provider that raises an exception."""
+
+    def lookup_iocs(self, data, obs_col=None, ioc_type_col=None, **kwargs):
+        """Raise an error."""
+        raise ConnectionError("Provider unavailable")
+
+
+class _SlowProvider(_StubProvider):
+    """Stub provider that takes too long to respond."""
+
+    def lookup_iocs(self, data, obs_col=None, ioc_type_col=None, **kwargs):
+        """Wait before returning results."""
+        time.sleep(2)
+        return super().lookup_iocs(data, obs_col, ioc_type_col, **kwargs)
+
+
+def test_tilookup_parallel_providers():
+    """Test parallel lookup across providers with failures and timeouts."""
+    session = _StubSession()
+    ti_lookup = TILookup(primary_providers=[_create_provider(session)])
+    ti_lookup._providers.clear()
+    for idx in range(3):
+        ti_lookup.add_provider(_create_provider(session), name=f"Stub{idx}")
+
+    serial_df = ti_lookup.lookup_iocs(data=_IOC_IPS[:10])
+    check.equal(session.max_in_flight, 1)
+    par_df = ti_lookup.lookup_iocs(data=iter(_IOC_IPS[:10]), parallel=True)
+    check.equal(len(par_df), 30)
+    check.equal(list(par_df["Provider"]), list(serial_df["Provider"]))
+    check.equal(list(par_df["Ioc"]), list(serial_df["Ioc"]))
+    # the providers' requests overlap
+    check.greater(session.max_in_flight, 1)
+
+    ti_lookup.add_provider(_FailingProvider(), name="Failing")
+    ti_lookup.add_provider(_SlowProvider(), name="Slow")
+    with pytest.warns(UserWarning) as warn_rec:
+        part_df = ti_lookup.lookup_iocs(data=_IOC_IPS[:10], parallel=True, timeout=1.5)
+    warn_text = " ".join(str(warning.message) for warning in warn_rec)
+    check.is_in("Failing", warn_text)
+    check.is_in("Slow", warn_text)
+    check.equal(len(part_df), 30)
+    check.equal(set(part_df["Provider"]), {"Stub0", "Stub1", "Stub2"})
@@ -0,0 +1,504 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# --------------------------------------------------------------------------
+"""Performance benchmarks for msticpy components."""
+import argparse
+import random
+import sys
+import time
+from typing import Callable, Dict, List
+
+VERSION = "1.0.0"
+
+__version__ = VERSION
+__author__ = "Ian Hellen"
+
+
+_LOG_TEMPLATES = [
+    "Accepted connection from {ip} port {port} to {dom}",
+    "GET {url} HTTP/1.1 200 {port}",
+    "Process created: C:\\Windows\\System32\\{name}.exe -k {hash32}",
+    "User {name} logged on from workstation {name}-PC",
+    "/usr/bin/{name} --config /etc/{name}/{name}.conf",
+    "Dropped packet src=[{ip6}] dst={ip} proto=TCP",
+    "File {hash64} quarantined by engine version {port}.{port}",
+    "Job {name} completed in {port} ms with status ok",
+    "Heartbeat received from agent {name} version {port}",
+]
+_WORDS = ["alpha", "bravo", "charlie", "delta", "echo", "svchost", "sshd", "nginx"]
+_TLDS = ["com", "net", "org", "co.uk", "io"]
+
+
+def _rand_hex(length: int) -> str:
+    return "".join(random.choice("0123456789abcdef") for _ in range(length))
+
+
+def _rand_log_line() -> str:
+    name = random.choice(_WORDS)
+    dom = f"{random.choice(_WORDS)}.{random.choice(_WORDS)}.{random.choice(_TLDS)}"
+    ip_addr = ".".join(str(random.randint(1, 254)) for _ in range(4))
+    return random.choice(_LOG_TEMPLATES).format(
+        ip=ip_addr,
+        ip6=":".join(_rand_hex(4) for _ in range(8)),
+        port=random.randint(1, 65535),
+        dom=dom,
+        url=f"https://{dom}/{name}?id={random.randint(1, 1000)}%20{name}",
+        name=name,
+        hash32=_rand_hex(32),
+        hash64=_rand_hex(64),
+    )
+
+
+def _time_it(func: Callable, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def bench_ioc_extract(lines: int):
+    """Compare IoCExtract scans with and without pattern prefilters."""
+    from msticpy.sectools.iocextract import IoCExtract
+
+    log_lines = [_rand_log_line() for _ in range(lines)]
+    results: Dict[str, List] = {}
+    for name, extractor in (
+        ("no prefilter", IoCExtract(use_prefilter=False)),
+        ("prefilter", IoCExtract(use_prefilter=True)),
+    ):
+        elapsed, results[name] = _time_it(
+            lambda ext: [ext.extract(src=line) for line in log_lines], extractor
+        )
+        print(f"IoCExtract ({name}): {lines} lines in {elapsed:.2f}s")
+    print("Identical results:", results["no prefilter"] == results["prefilter"])
+
+
+def bench_ioc_extract_df(lines: int):
+    """Compare serial and multi-process IoCExtract DataFrame scans."""
+    import pandas as pd
+
+    from msticpy.sectools.iocextract import IoCExtract
+
+    data = pd.DataFrame({"log": [_rand_log_line() for _ in range(lines)]})
+    extractor = IoCExtract()
+    results: Dict[str, pd.DataFrame] = {}
+    for name, n_jobs in (("serial", None), ("n_jobs=-1", -1)):
+        elapsed, results[name] = _time_it(
+            extractor.extract_df, data, columns=["log"], n_jobs=n_jobs
+        )
+        print(f"IoCExtract.extract_df ({name}): {lines} lines in {elapsed:.2f}s")
+    print("Identical results:", results["serial"].equals(results["n_jobs=-1"]))
+
+
+def _create_session_col_loop(
+    data,
+    user_identifier_cols,
+    time_col,
+    max_session_time_mins,
+    max_event_separation_mins,
+):
+    """Row-by-row implementation of create_session_col (msticpy v1.0)."""
+    import pandas as pd
+
+    max_sep = pd.to_timedelta(max_event_separation_mins, unit="min")
+    max_ses = pd.to_timedelta(max_session_time_mins, unit="min")
+    df_with_sesind = data.sort_values(user_identifier_cols + [time_col]).reset_index(
+        drop=True
+    )
+    df_with_sesind.loc[0, "cml_time"] = pd.to_timedelta(0)
+    df_with_sesind.loc[0, "session_ind"] = 0
+    ses_ind = 0
+    for i in range(1, len(df_with_sesind)):
+        cur = df_with_sesind.iloc[i]
+        prev = df_with_sesind.iloc[i - 1]
+        new_flag = any(cur[col] != prev[col] for col in user_identifier_cols)
+        dif = cur[time_col] - prev[time_col]
+        cml = prev["cml_time"] + dif
+        if new_flag or dif > max_sep or cml > max_ses:
+            ses_ind += 1
+            cml = pd.to_timedelta(0)
+        df_with_sesind.loc[i, "cml_time"] = cml
+        df_with_sesind.loc[i, "session_ind"] = ses_ind
+    return df_with_sesind.drop(columns="cml_time")
+
+
+def bench_sessionize(lines: int):
+    """Compare vectorized and row-by-row sessionization."""
+    import pandas as pd
+
+    from msticpy.analysis.anomalous_sequence.sessionize import create_session_col
+
+    events = pd.DataFrame(
+        {
+            "UserId": [random.choice(_WORDS) for _ in range(lines)],
+            "ClientIP": [f"10.0.0.{random.randint(1, 4)}" for _ in range(lines)],
+            "TimeGenerated": pd.to_datetime("2021-01-01", utc=True)
+            + pd.to_timedelta(
+                [random.randint(0, 7 * 24 * 3600) for _ in range(lines)], unit="s"
+            ),
+            "Operation": [random.choice(_WORDS) for _ in range(lines)],
+        }
+    )
+    params = dict(
+        user_identifier_cols=["UserId", "ClientIP"],
+        time_col="TimeGenerated",
+        max_session_time_mins=20,
+        max_event_separation_mins=2,
+    )
+    # the row-by-row version is very slow - only run it on a sample
+    loop_rows = min(lines, 20000)
+    sample = events.head(loop_rows)
+    loop_time, loop_df = _time_it(_create_session_col_loop, sample, **params)
+    vect_time, vect_df = _time_it(create_session_col, sample, **params)
+    print(f"create_session_col (loop): {loop_rows} rows in {loop_time:.2f}s")
+    print(f"create_session_col (vectorized): {loop_rows} rows in {vect_time:.2f}s")
+    print(
+        "Identical session_ind:",
+        list(loop_df["session_ind"]) == list(vect_df["session_ind"]),
+    )
+    if lines > loop_rows:
+        vect_time, _ = _time_it(create_session_col, events, **params)
+        print(f"create_session_col (vectorized): {lines} rows in {vect_time:.2f}s")
+
+
+def bench_anom_seq_model(lines: int):
+    """Compare per-window and compiled anomalous sequence model scoring."""
+    import math
+
+    from msticpy.analysis.anomalous_sequence.model import Model
+    from msticpy.analysis.anomalous_sequence.utils import cmds_params_only
+    from msticpy.analysis.anomalous_sequence.utils.data_structures import Cmd
+
+    params = ["Identity", "Force", "City", "Name", "AuditEnabled"]
+    sessions = []
+    n_cmds = 0
+    while n_cmds < lines:
+        session = [
+            Cmd(random.choice(_WORDS), set(random.sample(params, 2)))
+            for _ in range(random.randint(1, 50))
+        ]
+        n_cmds += len(session)
+        sessions.append(session)
+    model = Model(sessions=sessions)
+    elapsed, _ = _time_it(model.train)
+    print(f"Model.train: {n_cmds} commands in {elapsed:.2f}s")
+
+    def _score_per_window():
+        return [
+            cmds_params_only.rarest_window_session(
+                session=ses,
+                prior_probs=model.prior_probs,
+                trans_probs=model.trans_probs,
+                param_cond_cmd_probs=model.param_cond_cmd_probs,
+                window_len=3,
+                use_start_end_tokens=True,
+                start_token=model.start_token,
+                end_token=model.end_token,
+            )
+            for ses in sessions
+        ]
+
+    loop_time, loop_res = _time_it(_score_per_window)
+    print(f"rarest windows (per-window): {n_cmds} commands in {loop_time:.2f}s")
+    comp_time, _ = _time_it(
+        model.compute_rarest_windows, window_len=3, use_start_end_tokens=True
+    )
+    print(f"rarest windows (compiled): {n_cmds} commands in {comp_time:.2f}s")
+    print(
+        "Identical results:",
+        all(
+            math.isclose(lik, comp_lik, rel_tol=1e-9)
+            or (math.isnan(lik) and math.isnan(comp_lik))
+            for (_, lik), comp_lik in zip(loop_res, model.rare_window_likelihoods[3])
+        ),
+    )
+
+    par_model = Model(sessions=sessions, n_jobs=-1)
+    par_time, _ = _time_it(lambda: (par_model.train(), par_model.compute_scores(True)))
+    print(f"train + compute_scores (n_jobs=-1): {n_cmds} commands in {par_time:.2f}s")
+    print(
+        "Identical parallel counts:",
+        par_model.seq2_counts == model.seq2_counts
+        and par_model.cmd_param_counts == model.cmd_param_counts,
+    )
+
+
+def _add_process_features_apply(input_frame, path_separator: str):
+    """Row-by-row process features (the previous implementation)."""
+    from math import log10
+
+    from msticpy.analysis.eventcluster import (
+        char_ord_score,
+        crc32_hash,
+        delim_count,
+        delim_hash,
+    )
+
+    output_df = input_frame.copy()
+    output_df["processName"] = output_df.apply(
+        lambda x: x.NewProcessName.split(path_separator)[-1], axis=1
+    )
+    output_df["pathScore"] = output_df.apply(
+        lambda x: char_ord_score(x.NewProcessName), axis=1
+    )
+    output_df["pathLogScore"] = output_df.apply(
+        lambda x: log10(x.pathScore) if x.pathScore else 0, axis=1
+    )
+    output_df["pathHash"] = output_df.apply(
+        lambda x: crc32_hash(x.NewProcessName), axis=1
+    )
+    output_df["commandlineLen"] = output_df.apply(lambda x: len(x.CommandLine), axis=1)
+    output_df["commandlineLogLen"] = output_df.apply(
+        lambda x: log10(x.commandlineLen) if x.commandlineLen else 0, axis=1
+    )
+    output_df["commandlineTokensFull"] = output_df.apply(
+        lambda x: delim_count(x.CommandLine), axis=1
+    )
+    output_df["commandlineScore"] = output_df.apply(
+        lambda x: char_ord_score(x.CommandLine), axis=1
+    )
+    output_df["commandlineTokensHash"] = output_df.apply(
+        lambda x: delim_hash(x.CommandLine), axis=1
+    )
+    return output_df
+
+
+def _rand_process_events(lines: int):
+    """Return a DataFrame of random process events."""
+    import pandas as pd
+
+    procs = [f"C:\\Windows\\System32\\{name}.exe" for name in _WORDS + ["cmd", "wmic"]]
+    # a mix of repeated and (mostly) unique command lines
+    cmd_lines = [_rand_log_line() for _ in range(min(lines, 5000))]
+    return pd.DataFrame(
+        {
+            "NewProcessName": [random.choice(procs) for _ in range(lines)],
+            "CommandLine": [
+                random.choice(cmd_lines) if random.random() < 0.8 else _rand_log_line()
+                for _ in range(lines)
+            ],
+            "SubjectLogonId": [
+                random.choice(["0x3e7", "0x1234"]) for _ in range(lines)
+            ],
+            "TimeGenerated": pd.to_datetime("2021-01-01", utc=True)
+            + pd.to_timedelta(
+                [random.randint(0, 7 * 24 * 3600) for _ in range(lines)], unit="s"
+            ),
+        }
+    )
+
+
+def bench_process_features(lines: int):
+    """Compare vectorized and row-by-row process feature extraction."""
+    from msticpy.analysis.eventcluster import add_process_features
+
+    events = _rand_process_events(lines)
+    # the row-by-row version is slow - only run it on a sample
+    loop_rows = min(lines, 200000)
+    sample = events.head(loop_rows)
+    loop_time, loop_df = _time_it(_add_process_features_apply, sample, "\\")
+    vect_time, vect_df = _time_it(add_process_features, sample, "\\")
+    print(f"add_process_features (apply): {loop_rows} rows in {loop_time:.2f}s")
+    print(f"add_process_features (vectorized): {loop_rows} rows in {vect_time:.2f}s")
+    print("Identical features:", loop_df.equals(vect_df[loop_df.columns]))
+    if lines > loop_rows:
+        vect_time, _ = _time_it(add_process_features, events, "\\")
+        print(f"add_process_features (vectorized): {lines} rows in {vect_time:.2f}s")
+
+
+def bench_dbcluster(lines: int):
+    """Compare clustering all rows with clustering unique feature vectors."""
+    from msticpy.analysis.eventcluster import add_process_features, dbcluster_events
+
+    events = add_process_features(_rand_process_events(lines), path_separator="\\")
+    params = dict(
+        cluster_columns=["pathHash", "commandlineTokensHash", "isSystemSession"],
+        time_column="TimeGenerated",
+        max_cluster_distance=0.001,
+        min_cluster_samples=2,
+    )
+    # clustering all rows needs a lot of memory - only run it on a sample
+    full_rows = min(lines, 50000)
+    sample = events.head(full_rows)
+    full_time, (full_df, _, _) = _time_it(
+        dbcluster_events, sample, aggregate_duplicates=False, **params
+    )
+    agg_time, (agg_df, _, _) = _time_it(dbcluster_events, sample, **params)
+    print(f"dbcluster_events (all rows): {full_rows} rows in {full_time:.2f}s")
+    print(f"dbcluster_events (aggregated): {full_rows} rows in {agg_time:.2f}s")
+    print("Identical clusters:", full_df.equals(agg_df))
+    if lines > full_rows:
+        agg_time, (agg_df, _, _) = _time_it(dbcluster_events, events, **params)
+        print(
+            f"dbcluster_events (aggregated): {lines} rows in {agg_time:.2f}s",
+            f"({len(agg_df)} output rows)",
+        )
+
+
+def _mask_df_apply(data, column_map):
+    """Row-by-row DataFrame obfuscation (the previous implementation)."""
+    from msticpy.data.data_obfus import MAP_FUNCS, hash_item
+
+    out_df = data.copy()
+    for col_name, col_type in column_map.items():
+        map_func = MAP_FUNCS.get(col_type)
+        if callable(map_func):
+            out_df[col_name] = out_df.apply(
+                lambda x, col=col_name, func=map_func: func(x[col]), axis=1
+            )
+        else:
+            out_df[col_name] = out_df.apply(
+                lambda x, col=col_name, c_type=col_type: hash_item(x[col], c_type),
+                axis=1,
+            )
+    return out_df
+
+
+def bench_mask_df(lines: int):
+    """Compare row-by-row and distinct-value DataFrame obfuscation."""
+    from msticpy.data.data_obfus import mask_df
+
+    events = _rand_process_events(lines)
+    events["Account"] = [
+        random.choice(["SYSTEM", "alice@contoso.com", "contoso/bob", "carol"])
+        for _ in range(lines)
+    ]
+    events["IpAddress"] = [
+        random.choice(["10.0.0.1", "192.168.1.20", "8.8.8.8", "::1"])
+        for _ in range(lines)
+    ]
+    column_map = {
+        "NewProcessName": "\\",
+        "CommandLine": "str",
+        "SubjectLogonId": "str",
+        "Account": "acct",
+        "IpAddress": "ip",
+    }
+    # the row-by-row version is slow - only run it on a sample
+    loop_rows = min(lines, 100000)
+    sample = events.head(loop_rows)
+    loop_time, loop_df = _time_it(_mask_df_apply, sample, column_map)
+    vect_time, vect_df = _time_it(
+        mask_df, sample, column_map=column_map, use_default=False
+    )
+    print(f"mask_df (apply): {loop_rows} rows in {loop_time:.2f}s")
+    print(f"mask_df (distinct values): {loop_rows} rows in {vect_time:.2f}s")
+    print("Identical results:", loop_df.equals(vect_df))
+    if lines > loop_rows:
+        vect_time, _ = _time_it(
+            mask_df, events, column_map=column_map, use_default=False
+        )
+        print(f"mask_df (distinct values): {lines} rows in {vect_time:.2f}s")
+
+
+class _DelayedResponse:
+    """Requests response stand-in for TI lookups."""
+
+    status_code = 200
+
+    def __init__(self, observable: str):
+        self.observable = observable
+
+    def json(self):
+        """Return the response data."""
+        return {"observable": self.observable}
+
+
+class _DelayedSession:
+    """Requests session stand-in with a fixed delay for each request."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+
+    def get(self, *args, **kwargs):
+        """Return the requested observable after `delay` seconds."""
+        url = kwargs.get("url", args[0] if args else "")
+        time.sleep(self.delay)
+        return _DelayedResponse(url.rsplit("/", maxsplit=1)[-1])
+
+
+def bench_ti_lookup(lines: int):
+    """Compare serial and concurrent TI provider lookups."""
+    import pandas as pd
+
+    from msticpy.sectools.tiproviders.http_base import HttpProvider, IoCLookupParams
+    from msticpy.sectools.tiproviders.ti_provider_base import TISeverity
+
+    class _DelayedProvider(HttpProvider):
+        """HTTP TI provider that uses a delayed session."""
+
+        _BASE_URL = "https://ti.example.com"
+        _IOC_QUERIES = {"ipv4": IoCLookupParams(path="/ip/{observable}")}
+
+        def parse_results(self, response):
+            """Return the details of the response."""
+            return True, TISeverity.information, response.raw_result
+
+    # each request takes `delay` seconds - limit the number of lookups
+    delay = 0.01
+    n_iocs = min(lines, 1000)
+    iocs = [
+        ".".join(str(random.randint(1, 254)) for _ in range(4)) for _ in range(n_iocs)
+    ]
+    results: Dict[str, pd.DataFrame] = {}
+    for name, max_concurrency in (("serial", 1), ("max_concurrency=8", 8)):
+        provider = _DelayedProvider()
+        # pylint: disable=protected-access
+        provider._requests_session = _DelayedSession(delay)
+        # send every lookup to the session
+        provider.result_cache = None
+        elapsed, results[name] = _time_it(
+            provider.lookup_iocs, data=iocs, max_concurrency=max_concurrency
+        )
+        print(
+            f"lookup_iocs ({name}): {n_iocs} IoCs in {elapsed:.2f}s",
+            f"({delay * 1000:.0f}ms per request)",
+        )
+    columns = ["Ioc", "Result", "Details"]
+    print(
+        "Identical results:",
+        results["serial"][columns]
+        .astype(str)
+        .equals(results["max_concurrency=8"][columns].astype(str)),
+    )
+
+
+_BENCHMARKS: Dict[str, Callable[[int], None]] = {
+    "ioc_extract": bench_ioc_extract,
+    "ioc_extract_df": bench_ioc_extract_df,
+    "sessionize": bench_sessionize,
+    "anom_seq_model": bench_anom_seq_model,
+    "process_features": bench_process_features,
+    "dbcluster": bench_dbcluster,
+    "mask_df": bench_mask_df,
+    "ti_lookup": bench_ti_lookup,
+}
+
+
+def _add_script_args():
+    parser = argparse.ArgumentParser(description=f"msticpy benchmarks. v.{VERSION}")
+    parser.add_argument(
+        "benchmark", choices=sorted(_BENCHMARKS), help="The benchmark to run."
+    )
+    parser.add_argument(
+        "--lines",
+        "-n",
+        type=int,
+        default=1_000_000,
+        required=False,
+        help="Number of input records to generate.",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=42, required=False, help="Random seed."
+    )
+    return parser
+
+
+# pylint: disable=invalid-name
+if __name__ == "__main__":
+    arg_parser = _add_script_args()
+    args = arg_parser.parse_args()
+    random.seed(args.seed)
+    _BENCHMARKS[args.benchmark](args.lines)
+    sys.exit(0)